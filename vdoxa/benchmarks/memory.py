@@ -0,0 +1,221 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Benchmark for the peak memory of trimming long videos.
+
+Synthetic videos of the same resolution but increasing durations are
+generated (see `vdoxa.benchmarks.synthetic`) & every case trims each of
+them in a fresh interpreter with the memory budget set. The process tree
+of the interpreter is sampled from outside while it runs, reporting:
+
+  self: Peak resident set size of the interpreter.
+  ffmpeg: Peak resident set size of the largest FFmpeg process.
+  total: Peak proportional set size (PSS) of the whole tree, pages shared
+         by the forked pool workers are counted once.
+
+The benchmark fails if the peak total or FFmpeg memory of any case grows
+by more than the tolerance from the shortest to the longest video, or if
+the total goes above the budget. Memory should depend on the resolution,
+not on the duration. The shortest video should still be long enough for
+the parts to fill up the encoder's lookahead, the peaks grow till then.
+It also runs as a part of `vdoxa.benchmarks.suite`.
+
+Usage:
+  python -m vdoxa.benchmarks.memory [--resolution <WxH>]
+                                    [--durations <secs,...>]
+                                    [--max-memory <size>]
+                                    [--tolerance <fraction>]
+                                    [--cache <directory>]
+
+Note:
+  Processes are sampled through `/proc`, hence the benchmark only runs
+  on Linux.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from vdoxa.benchmarks.synthetic import cached_video
+from vdoxa.utils.common import parse_size
+from vdoxa.utils.file_ops import get_directory_name
+
+# Code trimming the video `source` into the directory `output`.
+CASES = {
+  'split': 'from vdoxa.core.trim import trim_num_parts\n'
+           'trim_num_parts(source, 2)',
+  'trim_video': 'from vdoxa.core.trim import trim_video\n'
+                'os.makedirs(output, exist_ok=True)\n'
+                'trim_video(source, os.path.join(output, "cut.mp4"), 0, '
+                'None)',
+  'jobs': 'from vdoxa.core.trim import trim_num_parts\n'
+          'trim_num_parts(source, 4, jobs=4)',
+  'scenes': 'from vdoxa.core.scenes import detect_scenes\n'
+            'detect_scenes(source)',
+}
+
+# Secs between the samples of the process tree.
+INTERVAL = 0.02
+
+_RUN = """import contextlib, os, shutil
+from vdoxa.utils.memory import limit
+source, output = {source!r}, {output!r}
+limit({budget!r})
+with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null), \\
+     contextlib.redirect_stderr(null):
+{code}
+shutil.rmtree(output, ignore_errors=True)
+"""
+
+
+def _status(pid: int, *fields: str) -> Dict[str, int]:
+  """Return the memory fields (in bytes) of a `/proc` status like file."""
+  values = {}
+  for name in ('status', 'smaps_rollup'):
+    try:
+      with open(f'/proc/{pid}/{name}', 'r') as file:
+        for line in file:
+          key, _, value = line.partition(':')
+          if key in fields and value.strip().endswith('kB'):
+            values.setdefault(key, int(value.split()[0]) * 1024)
+    except OSError:
+      pass
+  return values
+
+
+def _tree(pid: int) -> List[Tuple[int, str]]:
+  """Return pid & name of the process & all it's descendants."""
+  tree, pending = [], [pid]
+  while pending:
+    current = pending.pop()
+    try:
+      with open(f'/proc/{current}/comm', 'r') as file:
+        tree.append((current, file.read().strip()))
+      tasks = os.listdir(f'/proc/{current}/task')
+    except OSError:
+      continue
+    for task in tasks:
+      try:
+        with open(f'/proc/{current}/task/{task}/children', 'r') as file:
+          pending.extend(map(int, file.read().split()))
+      except OSError:
+        pass
+  return tree
+
+
+def measure(code: str, source: str, budget: int) -> Dict[str, int]:
+  """Return peak memory (in bytes) of the process trimming the source.
+
+  Raises:
+    subprocess.CalledProcessError: If the trim fails.
+  """
+  output = get_directory_name(source)
+  indented = '\n'.join(f'  {line}' for line in code.splitlines())
+  script = _RUN.format(source=source, output=output, budget=budget,
+                       code=indented)
+  process = subprocess.Popen([sys.executable, '-c', script])
+  peaks = dict.fromkeys(('self', 'ffmpeg', 'total'), 0)
+  while process.poll() is None:
+    total = 0
+    for pid, name in _tree(process.pid):
+      values = _status(pid, 'VmHWM', 'VmRSS', 'Pss')
+      total += values.get('Pss', values.get('VmRSS', 0))
+      if pid == process.pid:
+        peaks['self'] = max(peaks['self'], values.get('VmHWM', 0))
+      elif name.startswith('ffmpeg'):
+        peaks['ffmpeg'] = max(peaks['ffmpeg'], values.get('VmHWM', 0))
+    peaks['total'] = max(peaks['total'], total)
+    time.sleep(INTERVAL)
+  if process.returncode != 0:
+    raise subprocess.CalledProcessError(process.returncode, process.args)
+  return peaks
+
+
+def check(resolution: str = '1280x720',
+          durations: Sequence[float] = (10.0, 40.0),
+          max_memory: str = '1G',
+          tolerance: float = 0.1,
+          cache: Optional[str] = None) -> Dict[str, Dict]:
+  """Run every case against the videos & return the peaks of each.
+
+  Args:
+    resolution: Size (default: 1280x720) of the videos like `WxH`.
+    durations: Lengths (default: 10 & 40 secs) of the videos.
+    max_memory: Memory budget (default: 1G) of the trims.
+    tolerance: Allowed growth (default: 0.1) of the peaks as a fraction
+               of the shortest video's.
+    cache: Directory (default: `~/.cache/vdoxa/benchmarks`) where the
+           generated videos are kept.
+
+  Returns:
+    Peaks (in bytes) per video, growth & whether it passed per case, no
+    cases if `/proc` is unavailable.
+  """
+  if not os.path.isdir('/proc/self/task'):
+    print('? Memory benchmark needs /proc (Linux), skipping it.')
+    return {}
+  cache = cache or os.path.join(os.path.expanduser('~'), '.cache', 'vdoxa',
+                                'benchmarks')
+  size = tuple(map(int, resolution.split('x')))
+  durations = sorted(durations)
+  budget = parse_size(max_memory)
+  sources = [cached_video(cache, size, duration, 25, 50)
+             for duration in durations]
+  results = {}
+  for name, code in CASES.items():
+    peaks = []
+    for duration, source in zip(durations, sources):
+      peak = measure(code, source, budget)
+      peaks.append(peak)
+      print(f'{name:<12} {duration:>8g} s {peak["total"] / 1024 ** 2:8.1f} MB '
+            f'total, {peak["self"] / 1024 ** 2:8.1f} MB self, '
+            f'{peak["ffmpeg"] / 1024 ** 2:8.1f} MB FFmpeg')
+    growth = {key: peaks[-1][key] / peaks[0][key] - 1
+              for key in ('total', 'ffmpeg') if peaks[0][key]}
+    highest = max(peak['total'] for peak in peaks)
+    ok = (all(value <= tolerance for value in growth.values()) and
+          highest <= budget)
+    results[name] = {'peaks': peaks, 'growth': growth, 'ok': ok}
+    print(f'{name:<12} growth: ' + ', '.join(
+        f'{value * 100:+.1f}% {key}' for key, value in growth.items()) +
+        f' (tolerance: {tolerance * 100:.0f}%) peak: '
+        f'{highest / 1024 ** 2:.1f} MB (budget: {budget / 1024 ** 2:.0f} '
+        f'MB) [{"OK" if ok else "FAIL"}]')
+  return results
+
+
+def main() -> None:
+  """Run the memory benchmark & exit with 1 if memory grows."""
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--resolution', default='1280x720', type=str)
+  parser.add_argument('--durations', default='10,40', type=str)
+  parser.add_argument('--max-memory', default='1G', type=str)
+  parser.add_argument('--tolerance', default=0.1, type=float)
+  parser.add_argument('--cache', type=str,
+                      default=os.path.join(os.path.expanduser('~'), '.cache',
+                                           'vdoxa', 'benchmarks'))
+  args = parser.parse_args()
+  results = check(args.resolution,
+                  list(map(float, args.durations.split(','))),
+                  args.max_memory, args.tolerance, args.cache)
+  sys.exit(0 if all(result['ok'] for result in results.values()) else 1)
+
+
+if __name__ == '__main__':
+  main()
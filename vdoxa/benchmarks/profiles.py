@@ -0,0 +1,85 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Benchmark for the encoding profiles.
+
+Every profile trims the same reference clip & the wall time along with
+the size of the output is reported. If no clip is provided, a reference
+clip with moving test pattern & a sine tone is generated using FFmpeg.
+
+Usage:
+  python -m vdoxa.benchmarks.profiles [--path <reference clip>]
+                                      [--duration <secs>]
+                                      [--output <results.json>]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from vdoxa.core.trim import trim_video
+from vdoxa.utils.ffmpeg import run
+from vdoxa.vars.profiles import PROFILES
+
+
+def reference_clip(file: str, duration: float, size: str = '1280x720') -> str:
+  """Generate reference clip with a test pattern & a sine tone."""
+  run(['-v', 'error', '-y',
+       '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=30:duration={duration}',
+       '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+       '-c:v', 'libx264', '-preset', 'veryfast', '-g', '60',
+       '-c:a', 'aac', '-shortest', file])
+  return file
+
+
+def benchmark(source: str, directory: str) -> List[Dict[str, Any]]:
+  """Trim the source using every profile & return the measurements."""
+  results = []
+  for profile in PROFILES:
+    file = os.path.join(directory, f'{profile}.mp4')
+    start = time.perf_counter()
+    trim_video(source, file, 0, None, profile=profile)
+    results.append({'profile': profile,
+                    'seconds': round(time.perf_counter() - start, 3),
+                    'bytes': os.path.getsize(file)})
+  return results
+
+
+def main() -> None:
+  """Run the profiles benchmark & print the results."""
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--path', default=None, type=str)
+  parser.add_argument('--duration', default=20.0, type=float)
+  parser.add_argument('--output', default=None, type=str)
+  args = parser.parse_args()
+  with tempfile.TemporaryDirectory(prefix='vdoxa-') as directory:
+    source = args.path or reference_clip(os.path.join(directory, 'ref.mp4'),
+                                         args.duration)
+    results = benchmark(source, directory)
+  for result in results:
+    print(f'{result["profile"]:<12} {result["seconds"]:8.2f} s '
+          f'{result["bytes"] / 1024 ** 2:10.2f} MiB')
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump({'source': args.path or 'generated', 'results': results},
+                file, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,82 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Micro-benchmark for rescaling the frames.
+
+Compares `rescale` against the reusable `Rescaler` on random frames.
+Time per frame and the ratio to `rescale` are reported for each of them.
+Both should take about the same time as the resize dominates, reusing
+the buffers bounds the memory but doesn't make rescaling faster.
+
+Usage:
+  python -m vdoxa.benchmarks.rescale [--frames <number>]
+                                     [--size <width>x<height>]
+                                     [--width <width>]
+                                     [--repeat <number>]
+"""
+
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+
+from vdoxa.utils.opencv import Rescaler, rescale
+
+
+def measure(function: Callable, frames: np.ndarray, repeat: int) -> float:
+  """Return best time (in secs) per frame taken by function."""
+  function(frames[:2])
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(frames)
+    timings.append(time.perf_counter() - start)
+  return min(timings) / len(frames)
+
+
+def main() -> None:
+  """Run the rescale benchmark & print the results."""
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--frames', default=200, type=int)
+  parser.add_argument('--size', default='1920x1080', type=str)
+  parser.add_argument('--width', default=160, type=int)
+  parser.add_argument('--repeat', default=5, type=int)
+  args = parser.parse_args()
+  frame_width, frame_height = map(int, args.size.split('x'))
+  frames = np.random.randint(0, 256, (args.frames, frame_height,
+                                      frame_width, 3), np.uint8)
+  rescaler = Rescaler(width=args.width)
+
+  def per_frame_rescale(frames: np.ndarray) -> None:
+    for frame in frames:
+      rescale(frame, width=args.width)
+
+  def per_frame_rescaler(frames: np.ndarray) -> None:
+    for frame in frames:
+      rescaler(frame)
+
+  cases = {'rescale': per_frame_rescale, 'Rescaler': per_frame_rescaler}
+  baseline = None
+  for name, function in cases.items():
+    elapsed = measure(function, frames, args.repeat)
+    baseline = baseline or elapsed
+    print(f'{name:<16} {elapsed * 1e6:10.1f} us/frame '
+          f'{baseline / elapsed:6.2f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,94 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Benchmark for the start up time of the vdoXA CLI.
+
+Each case is run in a fresh interpreter & the median wall time is
+compared against a fixed budget. The benchmark also fails if any of the
+heavy dependencies get imported just for building the parser.
+
+Usage:
+  python -m vdoxa.benchmarks.startup [--runs <number>]
+                                     [--import-budget <secs>]
+                                     [--help-budget <secs>]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+# Modules which should only be imported when a trim actually runs.
+HEAVY_MODULES = ('moviepy', 'numpy', 'imageio', 'cv2', 'questionary')
+
+CASES = {
+  'import vdoxa.parser': 'import vdoxa.parser',
+  'vdoxa -h': 'import sys; sys.argv = ["vdoxa", "-h"]; '
+              'from vdoxa.parser import main; main()',
+}
+
+# `vdoxa -h` exits after printing the help, hence the code is wrapped to
+# report the loaded heavy modules even after it exits.
+_CHECK = """import json, sys
+try:
+  exec({code!r})
+except SystemExit:
+  pass
+loaded = {{name.split('.')[0] for name in sys.modules}} & set({heavy!r})
+print(json.dumps(sorted(loaded)), file=sys.stderr)
+"""
+
+
+def measure(code: str, runs: int) -> Tuple[float, List[str]]:
+  """Return median wall time (in secs) & heavy modules loaded by code."""
+  timings = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+    timings.append(time.perf_counter() - start)
+  check = _CHECK.format(code=code, heavy=HEAVY_MODULES)
+  process = subprocess.run([sys.executable, '-c', check],
+                           stdout=subprocess.DEVNULL,
+                           stderr=subprocess.PIPE, text=True)
+  loaded = json.loads(process.stderr.strip().splitlines()[-1] or '[]')
+  return statistics.median(timings), loaded
+
+
+def main() -> None:
+  """Run the start up benchmark & exit with 1 if it's over budget."""
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--runs', default=15, type=int)
+  parser.add_argument('--import-budget', default=0.25, type=float)
+  parser.add_argument('--help-budget', default=0.35, type=float)
+  args = parser.parse_args()
+  budgets = dict(zip(CASES, (args.import_budget, args.help_budget)))
+  failed = False
+  for name, code in CASES.items():
+    median, loaded = measure(code, args.runs)
+    ok = median <= budgets[name] and not loaded
+    failed = failed or not ok
+    print(f'{name:<20} {median * 1000:8.1f} ms (budget: '
+          f'{budgets[name] * 1000:.0f} ms) heavy imports: '
+          f'{", ".join(loaded) or "none"} [{"OK" if ok else "FAIL"}]')
+  sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+  main()
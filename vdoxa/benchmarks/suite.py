@@ -0,0 +1,278 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Benchmark suite for trimming synthetic videos.
+
+A matrix of resolutions, durations, frame rates & GOP sizes is generated
+locally (see `vdoxa.benchmarks.synthetic`) and cached, so repeated runs
+work offline and use the very same inputs. Every video is trimmed by
+`trim_num_parts` in each of the modes & part counts, cut once the way
+`trim_by` does using `trim_video` and has it's frames rescaled. The best
+of the repeated runs is reported. The memory growth check of
+`vdoxa.benchmarks.memory` then runs on short videos of the first
+resolution, unless skipped.
+
+Results are saved as JSON along with the git commit, the machine & the
+versions of the dependencies. A saved file can be used as the baseline
+of a later run, which then fails if any case gets slower than allowed.
+The suite also fails if the peak memory grows with the duration.
+
+Usage:
+  python -m vdoxa.benchmarks.suite [--resolutions <WxH,...>]
+                                   [--durations <secs,...>]
+                                   [--fps <fps,...>]
+                                   [--gops <frames,...>]
+                                   [--parts <number,...>]
+                                   [--jobs <number>]
+                                   [--repeat <number>]
+                                   [--cache <directory>]
+                                   [--output <results.json>]
+                                   [--baseline <baseline.json>]
+                                   [--tolerance <fraction>]
+                                   [--memory-durations <secs,...>]
+                                   [--skip-memory]
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from vdoxa.benchmarks import memory
+from vdoxa.benchmarks.synthetic import cached_video
+from vdoxa.core.trim import trim_num_parts, trim_video
+from vdoxa.utils.ffmpeg import run
+from vdoxa.utils.file_ops import get_directory_name
+from vdoxa.utils.opencv import rescale
+
+# Trim modes of `trim_num_parts` & their keyword arguments.
+MODES = {
+  'encode': {},
+  'copy': {'copy': True},
+  'audio-copy': {'audio': 'copy'},
+  'jobs': {},
+}
+
+RESCALE_FRAMES = 100
+
+
+def environment() -> Dict[str, Any]:
+  """Return details needed to compare the results across commits."""
+  root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+  def git(*args: str) -> Optional[str]:
+    try:
+      return subprocess.run(['git', '-C', root, *args], capture_output=True,
+                            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+      return None
+
+  try:
+    import moviepy
+    moviepy_version = moviepy.__version__
+  except (ImportError, AttributeError):
+    moviepy_version = None
+  status = git('status', '--porcelain', '--untracked-files=no')
+  return {
+    'commit': git('rev-parse', 'HEAD'),
+    'dirty': bool(status) if status is not None else None,
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'processor': platform.processor() or platform.machine(),
+    'cpu_count': os.cpu_count(),
+    'ffmpeg': run(['-version']).splitlines()[0],
+    'opencv': cv2.__version__,
+    'numpy': np.__version__,
+    'moviepy': moviepy_version,
+  }
+
+
+def best_of(function: Callable[[], None],
+            repeat: int,
+            cleanup: Callable[[], None]) -> Tuple[float, float]:
+  """Return the best & the median wall time (in secs) of the function."""
+  timings = []
+  for _ in range(repeat):
+    cleanup()
+    # MoviePy reports it's progress on the terminal, which isn't timed.
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null), \
+         contextlib.redirect_stderr(null):
+      start = time.perf_counter()
+      function()
+      timings.append(time.perf_counter() - start)
+  cleanup()
+  return min(timings), statistics.median(timings)
+
+
+def rescale_frames(source: str, width: int = 160) -> Callable[[], None]:
+  """Return function rescaling the first frames of the source."""
+  capture = cv2.VideoCapture(source)
+  frames = []
+  while len(frames) < RESCALE_FRAMES:
+    grabbed, frame = capture.read()
+    if not grabbed:
+      break
+    frames.append(frame)
+  capture.release()
+
+  def function() -> None:
+    for frame in frames:
+      rescale(frame, width=width)
+  return function
+
+
+def cases(source: str,
+          duration: float,
+          parts: List[int],
+          jobs: int) -> List[Tuple[str, Optional[int], Callable[[], None]]]:
+  """Return name, number of parts & function of every case."""
+  output = os.path.join(get_directory_name(source), 'cut.mp4')
+  functions = []
+  for mode, num_parts in itertools.product(MODES, parts):
+    if mode == 'jobs' and jobs <= 1:
+      continue
+    kwargs = dict(MODES[mode], jobs=jobs if mode == 'jobs' else 1)
+    functions.append((f'trim_num_parts:{mode}', num_parts,
+                      lambda num_parts=num_parts, kwargs=kwargs:
+                      trim_num_parts(source, num_parts, **kwargs)))
+
+  def trim_by() -> None:
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    trim_video(source, output, duration / 4, duration * 3 / 4)
+
+  functions.append(('trim_by', None, trim_by))
+  functions.append(('rescale', None, rescale_frames(source)))
+  return functions
+
+
+def benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+  """Run every case against every video of the matrix."""
+  results = []
+  sizes = [tuple(map(int, size.split('x')))
+           for size in args.resolutions.split(',')]
+  matrix = itertools.product(sizes, map(float, args.durations.split(',')),
+                             map(int, args.fps.split(',')),
+                             map(int, args.gops.split(',')))
+  parts = [int(value) for value in args.parts.split(',')]
+  for size, duration, fps, gop in matrix:
+    source = cached_video(args.cache, size, duration, fps, gop)
+    directory = get_directory_name(source)
+
+    def cleanup() -> None:
+      if os.path.isdir(directory):
+        shutil.rmtree(directory)
+
+    for name, num_parts, function in cases(source, duration, parts,
+                                           args.jobs):
+      best, median = best_of(function, args.repeat, cleanup)
+      result = {'video': os.path.basename(source),
+                'resolution': f'{size[0]}x{size[1]}', 'duration': duration,
+                'fps': fps, 'gop': gop, 'case': name, 'parts': num_parts,
+                'seconds': round(best, 4), 'median': round(median, 4)}
+      results.append(result)
+      print(f'{result["video"]:<36} {name:<26} {num_parts or "-":>5} '
+            f'{best:8.3f} s')
+  return results
+
+
+def key(result: Dict[str, Any]) -> Tuple[str, str, Optional[int]]:
+  """Return key identifying the case across runs."""
+  return result['video'], result['case'], result['parts']
+
+
+def compare(results: List[Dict[str, Any]],
+            baseline: str,
+            tolerance: float) -> bool:
+  """Compare results against the baseline & return True if none regressed.
+
+  Args:
+    results: Results of this run.
+    baseline: Path of the JSON results of an earlier run.
+    tolerance: Allowed slowdown as a fraction of the baseline time.
+  """
+  with open(baseline, 'r') as file:
+    previous = json.load(file)
+  reference = {key(result): result for result in previous['results']}
+  print(f'\nCompared with {baseline} (commit: '
+        f'{previous["environment"]["commit"]}):')
+  passed = True
+  for result in results:
+    before = reference.get(key(result))
+    if before is None:
+      continue
+    ratio = result['seconds'] / before['seconds']
+    regressed = ratio > 1 + tolerance
+    passed = passed and not regressed
+    print(f'{result["video"]:<36} {result["case"]:<26} '
+          f'{result["parts"] or "-":>5} {before["seconds"]:8.3f} s -> '
+          f'{result["seconds"]:8.3f} s {ratio:6.2f}x '
+          f'[{"SLOWER" if regressed else "OK"}]')
+  return passed
+
+
+def main() -> None:
+  """Run the benchmark suite, save & compare the results."""
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--resolutions', default='640x360,1280x720', type=str)
+  parser.add_argument('--durations', default='10', type=str)
+  parser.add_argument('--fps', default='25', type=str)
+  parser.add_argument('--gops', default='25,250', type=str)
+  parser.add_argument('--parts', default='4', type=str)
+  parser.add_argument('--jobs', default=2, type=int)
+  parser.add_argument('--repeat', default=3, type=int)
+  parser.add_argument('--cache', type=str,
+                      default=os.path.join(os.path.expanduser('~'), '.cache',
+                                           'vdoxa', 'benchmarks'))
+  parser.add_argument('--output', default=None, type=str)
+  parser.add_argument('--baseline', default=None, type=str)
+  parser.add_argument('--tolerance', default=0.2, type=float)
+  parser.add_argument('--memory-durations', default='20,40', type=str)
+  parser.add_argument('--skip-memory', action='store_true')
+  args = parser.parse_args()
+  results = benchmark(args)
+  peaks = {}
+  if not args.skip_memory:
+    print()
+    peaks = memory.check(args.resolutions.split(',')[0],
+                         list(map(float, args.memory_durations.split(','))),
+                         cache=args.cache)
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump({'environment': environment(), 'matrix': {
+                  'resolutions': args.resolutions, 'durations': args.durations,
+                  'fps': args.fps, 'gops': args.gops, 'parts': args.parts,
+                  'jobs': args.jobs, 'repeat': args.repeat},
+                 'results': results, 'memory': peaks}, file, indent=2)
+    print(f'\nResults are written to {args.output}.')
+  if args.baseline and not compare(results, args.baseline, args.tolerance):
+    sys.exit(1)
+  if not all(peak['ok'] for peak in peaks.values()):
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
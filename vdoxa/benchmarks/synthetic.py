@@ -0,0 +1,141 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for generating synthetic videos for the benchmarks.
+
+Frames are drawn with NumPy from a seeded generator & written using
+`cv2.VideoWriter`, so the same parameters always produce the same
+pictures without needing any sample footage or network access. Every
+few seconds the background changes (a hard cut) and a box moves across
+the frame to give the encoder some motion to work on.
+
+OpenCV doesn't let us pick the keyframe interval, hence the frames are
+written as MJPEG first & re-encoded by FFmpeg to H.264 with a fixed GOP
+size and a sine tone as audio, like a camera recording would have.
+"""
+
+import os
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+from vdoxa.utils.ffmpeg import run
+from vdoxa.utils.file_ops import temporary
+
+
+def _background(rng: np.random.Generator,
+                width: int,
+                height: int) -> np.ndarray:
+  """Return smooth random texture used as background of a scene."""
+  coarse = rng.integers(0, 256, (9, 16, 3), dtype=np.uint8)
+  return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def synthetic_video(file: str,
+                    width: int = 640,
+                    height: int = 360,
+                    duration: float = 10.0,
+                    fps: int = 25,
+                    gop: int = 50,
+                    seed: int = 0,
+                    scene_length: float = 4.0) -> str:
+  """Generate a deterministic H.264 test video with audio.
+
+  Args:
+    file: Path of the video file to be written.
+    width: Width (default: 640) of the frames.
+    height: Height (default: 360) of the frames.
+    duration: Length (default: 10.0) of the video in secs.
+    fps: Frame rate (default: 25) of the video.
+    gop: Number of frames (default: 50) between the keyframes.
+    seed: Seed (default: 0) of the random generator.
+    scene_length: Secs (default: 4.0) after which the scene changes.
+
+  Returns:
+    Path of the generated video.
+
+  Raises:
+    RuntimeError: If OpenCV can't open the MJPEG writer.
+  """
+  raw = os.path.splitext(temporary(file, 'raw'))[0] + '.avi'
+  writer = cv2.VideoWriter(raw, cv2.VideoWriter_fourcc(*'MJPG'), fps,
+                           (width, height))
+  if not writer.isOpened():
+    raise RuntimeError(f'OpenCV can\'t write MJPEG video to {raw}.')
+  rng = np.random.default_rng(seed)
+  box = max(8, min(width, height) // 6)
+  frames_per_scene = max(1, int(round(scene_length * fps)))
+  frame = np.empty((height, width, 3), np.uint8)
+  try:
+    for idx in range(int(round(duration * fps))):
+      if idx % frames_per_scene == 0:
+        background = _background(rng, width, height)
+        color = tuple(int(value) for value in rng.integers(0, 256, 3))
+      np.copyto(frame, background)
+      # Box bounces horizontally, crossing the frame once per second.
+      phase = (idx % (2 * fps)) / fps
+      x = int((phase if phase <= 1 else 2 - phase) * (width - box))
+      y = (height - box) // 2
+      cv2.rectangle(frame, (x, y), (x + box, y + box), color, -1)
+      writer.write(frame)
+  finally:
+    writer.release()
+  try:
+    run(['-v', 'error', '-y', '-i', raw,
+         '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+         '-map', '0:v', '-map', '1:a',
+         '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+         '-g', gop, '-keyint_min', gop, '-sc_threshold', 0,
+         '-c:a', 'aac', '-shortest', file])
+  finally:
+    os.remove(raw)
+  return file
+
+
+def video_name(size: Tuple[int, int],
+               duration: float,
+               fps: int,
+               gop: int,
+               seed: int = 0) -> str:
+  """Return file name identifying the synthetic video parameters."""
+  width, height = size
+  secs = f'{duration:g}'.replace('.', 'p')
+  return f'syn_{width}x{height}_{secs}s_{fps}fps_g{gop}_s{seed}.mp4'
+
+
+def cached_video(directory: str,
+                 size: Tuple[int, int],
+                 duration: float,
+                 fps: int,
+                 gop: int,
+                 seed: int = 0) -> str:
+  """Return path of the synthetic video, generating it if missing.
+
+  Args:
+    directory: Directory where the generated videos are kept.
+    size: Width & height of the frames.
+    duration: Length of the video in secs.
+    fps: Frame rate of the video.
+    gop: Number of frames between the keyframes.
+    seed: Seed (default: 0) of the random generator.
+  """
+  os.makedirs(directory, exist_ok=True)
+  file = os.path.join(directory, video_name(size, duration, fps, gop, seed))
+  if not os.path.isfile(file):
+    width, height = size
+    synthetic_video(file, width, height, duration, fps, gop, seed)
+  return file
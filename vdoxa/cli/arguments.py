@@ -25,13 +25,26 @@ between them.
 Examples:
   * vdoxa trim --path <these come here> --parts <and here>
   * vdoxa trim auto --parts <these come here>
+  * vdoxa trim auto --segment-length <these come here>
   * vdoxa trim custom --by <these come here>
+  * vdoxa trim cut --start <these come here> --output <and here>
+  * vdoxa trim batch --manifest <these come here>
+  * vdoxa trim scenes --threshold <these come here>
+  * vdoxa trim motion --padding <these come here>
+  * vdoxa trim motion --hysteresis <these come here>
+  * vdoxa trim faces --model <these come here>
+  * vdoxa serve --socket <these come here>
+  * vdoxa join <these come here> --output <and here>
 """
 
 import argparse
 import logging
 from typing import Optional, Union
 
+from vdoxa.vars.profiles import (AUDIO_MODES, DEFAULT_AUDIO_MODE,
+                                 DEFAULT_STREAM_FORMAT, PROFILES,
+                                 STREAM_FORMATS)
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -63,6 +76,228 @@ def pass_video_by_arg(parser: Union[argparse.ArgumentParser,
                       help=help, type=str, metavar='<trim by>')
 
 
+def pass_video_copy_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str) -> None:
+  """Pass argument to copy the video packets without re-encoding."""
+  parser.add_argument('--copy', action='store_true', help=help)
+
+
+def pass_video_jobs_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str,
+                        default: Optional[int] = 1) -> None:
+  """Pass argument for number of parts to be encoded in parallel."""
+  parser.add_argument('--jobs', default=default,
+                      help=help, type=int, metavar='<number>')
+
+
+def pass_manifest_arg(parser: Union[argparse.ArgumentParser,
+                                    argparse._ActionsContainer],
+                      help: str,
+                      default: Optional[str] = None,
+                      required: Optional[bool] = True) -> None:
+  """Pass argument for the manifest of cuts."""
+  parser.add_argument('--manifest', default=default, required=required,
+                      help=help, type=str, metavar='<path>')
+
+
+def pass_results_arg(parser: Union[argparse.ArgumentParser,
+                                   argparse._ActionsContainer],
+                     help: str,
+                     default: Optional[str] = None) -> None:
+  """Pass argument for the results manifest."""
+  parser.add_argument('--results', default=default,
+                      help=help, type=str, metavar='<path>')
+
+
+def pass_threshold_arg(parser: Union[argparse.ArgumentParser,
+                                     argparse._ActionsContainer],
+                       help: str,
+                       default: Optional[float] = 0.15) -> None:
+  """Pass argument for the detection threshold."""
+  parser.add_argument('--threshold', default=default,
+                      help=help, type=float, metavar='<number>')
+
+
+def pass_stride_arg(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    default: Optional[int] = 2) -> None:
+  """Pass argument for analysing every n-th frame."""
+  parser.add_argument('--stride', default=default,
+                      help=help, type=int, metavar='<number>')
+
+
+def pass_method_arg(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    default: Optional[str] = 'histogram') -> None:
+  """Pass argument for the frame differencing method."""
+  parser.add_argument('--method', default=default, choices=['histogram',
+                                                           'pixel'],
+                      help=help, type=str, metavar='<method>')
+
+
+def pass_padding_arg(parser: Union[argparse.ArgumentParser,
+                                   argparse._ActionsContainer],
+                     help: str,
+                     default: Optional[float] = 1.0) -> None:
+  """Pass argument for padding the detected intervals."""
+  parser.add_argument('--padding', default=default,
+                      help=help, type=float, metavar='<secs>')
+
+
+def pass_hysteresis_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str,
+                        default: Optional[float] = 0.5) -> None:
+  """Pass argument for the release level of the threshold."""
+  parser.add_argument('--hysteresis', default=default,
+                      help=help, type=float, metavar='<fraction>')
+
+
+def pass_face_model_args(parser: Union[argparse.ArgumentParser,
+                                       argparse._ActionsContainer]) -> None:
+  """Pass arguments for the Caffe face detector files."""
+  parser.add_argument('--prototxt', required=True, type=str, metavar='<path>',
+                      help='Path of the face detector deploy.prototxt file.')
+  parser.add_argument('--model', required=True, type=str, metavar='<path>',
+                      help='Path of the face detector .caffemodel file.')
+
+
+def pass_batch_size_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str,
+                        default: Optional[int] = 16) -> None:
+  """Pass argument for number of frames processed at once."""
+  parser.add_argument('--batch-size', default=default,
+                      help=help, type=int, metavar='<number>')
+
+
+def pass_profile_arg(parser: Union[argparse.ArgumentParser,
+                                   argparse._ActionsContainer],
+                     help: str,
+                     default: Optional[str] = None) -> None:
+  """Pass argument for the encoding profile."""
+  parser.add_argument('--profile', default=default, choices=list(PROFILES),
+                      help=help, type=str, metavar='<profile>')
+
+
+def pass_audio_arg(parser: Union[argparse.ArgumentParser,
+                                 argparse._ActionsContainer],
+                   help: str,
+                   default: str = DEFAULT_AUDIO_MODE) -> None:
+  """Pass argument for handling the audio track."""
+  parser.add_argument('--audio', default=default, choices=AUDIO_MODES,
+                      help=help, type=str, metavar='<mode>')
+
+
+def pass_metrics_arg(parser: Union[argparse.ArgumentParser,
+                                   argparse._ActionsContainer],
+                     help: str,
+                     default: Optional[str] = None) -> None:
+  """Pass argument for the metrics output."""
+  parser.add_argument('--metrics', default=default,
+                      help=help, type=str, metavar='<path>')
+
+
+def pass_cache_args(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    size_help: str,
+                    default_size: str = '10G') -> None:
+  """Pass arguments for the output cache."""
+  parser.add_argument('--cache', action='store_true', help=help)
+  parser.add_argument('--cache-size', default=default_size, type=str,
+                      metavar='<size>', help=size_help)
+
+
+def pass_max_memory_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str,
+                        default: Optional[str] = None) -> None:
+  """Pass argument for the memory budget."""
+  parser.add_argument('--max-memory', default=default,
+                      help=help, type=str, metavar='<size>')
+
+
+def pass_socket_arg(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    default: Optional[str] = None) -> None:
+  """Pass argument for path of the Unix socket."""
+  parser.add_argument('--socket', default=default,
+                      help=help, type=str, metavar='<path>')
+
+
+def pass_port_arg(parser: Union[argparse.ArgumentParser,
+                                argparse._ActionsContainer],
+                  help: str,
+                  default: Optional[int] = None) -> None:
+  """Pass argument for the localhost TCP port."""
+  parser.add_argument('--port', default=default,
+                      help=help, type=int, metavar='<number>')
+
+
+def pass_workers_arg(parser: Union[argparse.ArgumentParser,
+                                   argparse._ActionsContainer],
+                     help: str,
+                     default: Optional[int] = None) -> None:
+  """Pass argument for number of worker processes."""
+  parser.add_argument('--workers', default=default,
+                      help=help, type=int, metavar='<number>')
+
+
+def pass_join_files_arg(parser: Union[argparse.ArgumentParser,
+                                      argparse._ActionsContainer],
+                        help: str) -> None:
+  """Pass argument for the video files to be joined."""
+  parser.add_argument('files', nargs='+', help=help, type=str,
+                      metavar='<path>')
+
+
+def pass_output_arg(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    required: bool = True,
+                    default: Optional[str] = None) -> None:
+  """Pass argument for path of the output video."""
+  parser.add_argument('--output', required=required, default=default,
+                      help=help, type=str, metavar='<path>')
+
+
+def pass_range_args(parser: Union[argparse.ArgumentParser,
+                                  argparse._ActionsContainer],
+                    help: str,
+                    end_help: str) -> None:
+  """Pass arguments for the range of the video to be cut."""
+  parser.add_argument('--start', default=0.0, type=float,
+                      metavar='<secs>', help=help)
+  parser.add_argument('--end', default=None, type=float,
+                      metavar='<secs>', help=end_help)
+
+
+def pass_stream_format_arg(parser: Union[argparse.ArgumentParser,
+                                         argparse._ActionsContainer],
+                           help: str,
+                           default: str = DEFAULT_STREAM_FORMAT) -> None:
+  """Pass argument for the container of the streamed output."""
+  parser.add_argument('--format', default=default, choices=STREAM_FORMATS,
+                      help=help, type=str, metavar='<format>')
+
+
+def pass_segment_args(parser: Union[argparse.ArgumentParser,
+                                    argparse._ActionsContainer],
+                      help: str,
+                      index_help: str) -> None:
+  """Pass arguments for cutting the video into fixed length segments."""
+  parser.add_argument('--segment-length', default=None, type=str,
+                      metavar='<length>', help=help)
+  parser.add_argument('--segment-index', default=None, type=str,
+                      metavar='<path>', help=index_help)
+
+
 def add_logging_options(parser: Union[argparse.ArgumentParser,
                                       argparse._ActionsContainer]) -> None:
   """Adds logging options to the parser object."""
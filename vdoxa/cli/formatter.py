@@ -22,7 +22,7 @@ sections.
 """
 
 import argparse
-import os
+import shutil
 import textwrap
 
 
@@ -42,7 +42,7 @@ class VdoXAHelpFormatter(argparse.RawTextHelpFormatter):
   def _split_lines(self, text, width):
     """Unwraps the lines to width of the terminal."""
     text = self._whitespace_matcher.sub(' ', text).strip()
-    return textwrap.wrap(text, round(os.get_terminal_size().columns / 1.3))
+    return textwrap.wrap(text, round(shutil.get_terminal_size().columns / 1.3))
 
   # You can find the reference code here:
   # https://stackoverflow.com/questions/13423540/argparse-subparser-hide-metavar-in-command-listing
@@ -26,27 +26,220 @@ Examples:
   * vdoxa trim <these come here>
   * vdoxa trim auto <these come here>
   * vdoxa trim custom <these come here>
+  * vdoxa trim cut <these come here>
+  * vdoxa trim batch <these come here>
+  * vdoxa trim scenes <these come here>
+  * vdoxa trim motion <these come here>
+  * vdoxa trim faces <these come here>
 """
 
 import argparse
 
-from vdoxa.cli.arguments import (pass_video_by_arg, pass_video_parts_arg,
-                                 pass_video_path_arg)
+from vdoxa.cli.arguments import (pass_audio_arg, pass_batch_size_arg,
+                                 pass_cache_args, pass_face_model_args,
+                                 pass_hysteresis_arg, pass_join_files_arg,
+                                 pass_manifest_arg,
+                                 pass_max_memory_arg, pass_method_arg,
+                                 pass_metrics_arg, pass_output_arg,
+                                 pass_padding_arg, pass_port_arg,
+                                 pass_profile_arg, pass_range_args,
+                                 pass_results_arg, pass_segment_args,
+                                 pass_socket_arg, pass_stream_format_arg,
+                                 pass_stride_arg, pass_threshold_arg,
+                                 pass_video_by_arg, pass_video_copy_arg,
+                                 pass_video_jobs_arg, pass_video_parts_arg,
+                                 pass_video_path_arg, pass_workers_arg)
+
+copy_help = ('Copy the video packets without re-encoding them. Cuts are '
+             'snapped to the nearest keyframe.')
+profile_help = ('Encoding profile: default, fast-proxy, archive, copy or '
+                'smart. Profiles set codec, preset, CRF, threads, pixel '
+                'format and audio handling. Smart cuts at exact frames, '
+                're-encoding only the partial GOPs at the ends.')
+audio_help = ('Audio handling: encode (as per the profile), copy (remux the '
+              'audio packets), drop (video only) or only (extract just the '
+              'audio).')
+metrics_help = ('Append per part timings, frames per second, bytes and process '
+                'peak memory as JSON lines to this file; - for stdout.')
+cache_help = ('Reuse parts trimmed earlier with the same source, range and '
+              'settings from the output cache (VDOXA_CACHE_DIR) & cache the '
+              'new ones.')
+cache_size_help = ('Size of the output cache like 512M or 10G, least '
+                   'recently used parts are evicted above it.')
+segment_help = ('Cut the video into segments of this length like 60s, 2m or '
+                '250f (frames) in a single pass instead of a number of parts. '
+                'With --copy, segments start at the first keyframe after '
+                'each boundary.')
+segment_index_help = ('Path of the segment index listing file, start and end '
+                      'of every segment (default: segments.csv in the output '
+                      'directory); JSON if it ends with .json.')
+max_memory_help = ('Memory budget like 512M or 1G. Parallel jobs, encoder '
+                   'threads & lookahead, decoded frame queues and audio '
+                   'buffers are sized to fit in it.')
+jobs_help = ('Number of parts to encode in parallel. Each worker gets an '
+             'equal share of the CPU cores.')
 
 
 def trim_args(parser: argparse.ArgumentParser):
   """Parses arguments for `trim` command."""
   pass_video_path_arg(parser, help='Path of the video file.')
   pass_video_parts_arg(parser, help='Number of parts to split the video in.')
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=jobs_help)
+  pass_segment_args(parser, help=segment_help,
+                    index_help=segment_index_help)
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
 
 
 def trim_auto_args(parser: argparse.ArgumentParser):
   """Parses arguments for `trim auto` command."""
   pass_video_path_arg(parser, help='Path of the video file.')
   pass_video_parts_arg(parser, help='Number of parts to split the video in.')
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=jobs_help)
+  pass_segment_args(parser, help=segment_help,
+                    index_help=segment_index_help)
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
 
 
 def trim_custom_args(parser: argparse.ArgumentParser):
   """Parses arguments for `trim custom` command."""
   pass_video_path_arg(parser, help='Path of the video file.')
   pass_video_by_arg(parser, help='Trim video by a deciding factor.')
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=('Number of chunks of the cut to encode '
+                                    'in parallel.'))
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
+
+
+def trim_cut_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `trim cut` command."""
+  pass_video_path_arg(parser, help='Path of the video file.')
+  pass_range_args(parser, help='Starting point of the cut in secs.',
+                  end_help='Ending point of the cut in secs (default: till '
+                           'the end).')
+  pass_output_arg(parser, required=False, default='-',
+                  help=('File or named pipe to stream the cut to as it\'s '
+                        'muxed (default: - for stdout).'))
+  pass_stream_format_arg(parser, help=('Container of the stream: mp4 '
+                                       '(fragmented) or mpegts.'))
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=('Append the timings & bytes of the cut as '
+                                 'a JSON line to this file.'))
+
+
+def trim_batch_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `trim batch` command."""
+  pass_manifest_arg(parser, help=('Path of the JSON lines manifest with one '
+                                  'cut (source, start, end, output) per '
+                                  'line.'))
+  pass_results_arg(parser, help=('Path of the results manifest (default: '
+                                 '<manifest>.results.jsonl).'))
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=('Number of workers trimming the cuts in '
+                                    'parallel, cuts of a source are split '
+                                    'between them.'))
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
+
+
+def trim_scenes_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `trim scenes` command."""
+  pass_video_path_arg(parser, help='Path of the video file.')
+  pass_threshold_arg(parser, help=('Difference score between 0 and 1 above '
+                                   'which a frame starts a new shot.'))
+  pass_stride_arg(parser, help='Compare every n-th frame only.')
+  pass_method_arg(parser, help=('Frame differencing method, histogram or '
+                                'pixel.'))
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=jobs_help)
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
+
+
+def trim_motion_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `trim motion` command."""
+  pass_video_path_arg(parser, help='Path of the video file.')
+  pass_threshold_arg(parser, default=0.01,
+                     help=('Fraction of foreground pixels above which a '
+                           'frame has motion. Motion stops once it drops '
+                           'below the --hysteresis fraction of it.'))
+  pass_stride_arg(parser, default=5, help='Analyse every n-th frame only.')
+  pass_padding_arg(parser, help=('Seconds of footage kept before & after '
+                                 'every segment with motion.'))
+  pass_hysteresis_arg(parser, help=('Fraction of the threshold below which '
+                                    'motion stops, keeps motion hovering '
+                                    'around the threshold in one segment.'))
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=jobs_help)
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
+
+
+def trim_faces_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `trim faces` command."""
+  pass_video_path_arg(parser, help='Path of the video file.')
+  pass_face_model_args(parser)
+  pass_threshold_arg(parser, default=0.5,
+                     help='Minimum confidence of a face detection.')
+  pass_stride_arg(parser, default=10, help='Analyse every n-th frame only.')
+  pass_batch_size_arg(parser, help=('Number of frames passed through the '
+                                    'face detector at once.'))
+  pass_padding_arg(parser, help=('Seconds of footage kept before & after '
+                                 'every segment with faces.'))
+  pass_manifest_arg(parser, required=False,
+                    help=('Write the time ranges with faces to this '
+                          'manifest instead of trimming them.'))
+  pass_video_copy_arg(parser, help=copy_help)
+  pass_profile_arg(parser, help=profile_help)
+  pass_audio_arg(parser, help=audio_help)
+  pass_video_jobs_arg(parser, help=jobs_help)
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=max_memory_help)
+  pass_metrics_arg(parser, help=metrics_help)
+
+
+def serve_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `serve` command."""
+  pass_socket_arg(parser, help=('Path of the Unix socket to listen on '
+                                '(default: ~/.cache/vdoxa/vdoxa.sock).'))
+  pass_port_arg(parser, help=('Listen on this localhost TCP port instead of '
+                              'the Unix socket.'))
+  pass_workers_arg(parser, help=('Number of warm worker processes, defaults '
+                                 'to the number of CPU cores.'))
+  pass_cache_args(parser, help=cache_help, size_help=cache_size_help)
+  pass_max_memory_arg(parser, help=('Memory budget like 4G shared by all the '
+                                    'workers, see trim --help.'))
+
+
+def join_args(parser: argparse.ArgumentParser):
+  """Parses arguments for `join` command."""
+  pass_join_files_arg(parser, help=('Video files (or directories of parts) '
+                                    'to join, in order.'))
+  pass_output_arg(parser, help='Path of the joined video file.')
+  pass_profile_arg(parser, help=('Encoding profile for the inputs which '
+                                 'have to be re-encoded to match the others.'))
@@ -25,8 +25,14 @@ epilog = ('For specific information about a particular command, run "vdoxa '
 # Trim subparser object.
 trim_usage = ('vdoxa trim [options] --path <local video path> --num_parts '
               '<num> ...\n  '
+              'vdoxa trim [options] --path <local video path> --copy ...\n  '
               'vdoxa trim [options] auto --path <local video path> ...\n  '
               'vdoxa trim [options] custom --by <trim by> ...\n  '
+              'vdoxa trim [options] cut --start <secs> --end <secs> ...\n  '
+              'vdoxa trim [options] batch --manifest <cuts.jsonl> ...\n  '
+              'vdoxa trim [options] scenes --path <local video path> ...\n  '
+              'vdoxa trim [options] motion --path <local video path> ...\n  '
+              'vdoxa trim [options] faces --path <local video path> ...\n  '
               'vdoxa trim [options] <no arguments> ...\n  ')
 trim_help = ('Trims the video for further processing into small chunks. '
              'These videos can be trimmed either by selecting portions of it '
@@ -41,13 +47,17 @@ trim_description = ('Description:\n  Getting started for vdoXA:\n\n  '
 # Trim auto subparser object.
 auto_usage = ('vdoxa trim auto --path <local video path> --parts '
               '<num of parts> ...\n  '
+              'vdoxa trim auto --path <local video path> --segment-length '
+              '<length> ...\n  '
               'vdoxa trim auto --path <local video path> ...\n')
 auto_help = ('Trims the video for further processing into small chunks. '
              'These videos can be trimmed automatically in "n" number of '
              'equal parts. These trimmed videos will be unpacked in '
              '"~/.<video file>/" directory (same directory with file name)')
 auto_description = ('Description:\n  Similar to "vdoxa trim":\n\n  '
-                    '- Trims video automatically in equal parts.\n\n')
+                    '- Trims video automatically in equal parts.\n  '
+                    '- Trims video in segments of fixed length with an '
+                    'index.\n\n')
 
 # Trim custom subparser object.
 custom_usage = ('vdoxa trim custom --by <trim by> ...\n  ')
@@ -59,3 +69,86 @@ custom_help = ('Trims the video for further processing into small chunks. '
 custom_description = ('Description:\n  Trims video according to needs:\n\n  '
                       '- Trims video for a selected portion by minutes or by '
                       'seconds.\n\n')
+
+# Trim cut subparser object.
+cut_usage = ('vdoxa trim cut --path <local video path> --start <secs> --end '
+             '<secs> ...\n  '
+             'vdoxa trim cut --path <local video path> --start <secs> '
+             '--output <path> --format mpegts ...\n')
+cut_help = ('Cuts a single portion of the video & streams it to stdout (or a '
+            'file or named pipe) as fragmented MP4 or MPEG-TS while it\'s '
+            'being muxed, so that it can be piped straight into another '
+            'program.')
+cut_description = ('Description:\n  Streams a portion of the video:\n\n  '
+                   '- Pipes the cut into uploaders & players without '
+                   'writing it to the disk.\n\n')
+
+# Trim batch subparser object.
+batch_usage = ('vdoxa trim batch --manifest <cuts.jsonl> ...\n  '
+               'vdoxa trim batch --manifest <cuts.jsonl> --jobs <num> '
+               '--results <results.jsonl> ...\n')
+batch_help = ('Trims all the cuts listed in a JSON lines manifest. Cuts are '
+              'grouped by the source video so that each video is opened only '
+              'once & the videos are trimmed on a pool of workers. Status and '
+              'timings of every cut are written to a results manifest.')
+batch_description = ('Description:\n  Trims videos listed in a manifest:\n\n  '
+                     '- Trims thousands of cuts across many videos in a '
+                     'single run.\n\n')
+
+# Trim scenes subparser object.
+scenes_usage = ('vdoxa trim scenes --path <local video path> ...\n  '
+                'vdoxa trim scenes --path <local video path> --threshold '
+                '<score> --stride <num> ...\n')
+scenes_help = ('Trims the video at the shot boundaries. Shot boundaries are '
+               'found by comparing color histograms or pixels of downscaled '
+               'frames. These trimmed videos will be unpacked in '
+               '"~/.<video file>/" directory (same directory with file name)')
+scenes_description = ('Description:\n  Trims video shot by shot:\n\n  '
+                       '- Trims video at the detected shot boundaries.\n\n')
+
+# Trim motion subparser object.
+motion_usage = ('vdoxa trim motion --path <local video path> ...\n  '
+                'vdoxa trim motion --path <local video path> --threshold '
+                '<fraction> --padding <secs> ...\n')
+motion_help = ('Trims only the portions of the video with motion. Static '
+               'footage is dropped using background subtraction on '
+               'downscaled frames. These trimmed videos will be unpacked in '
+               '"~/.<video file>/" directory (same directory with file name)')
+motion_description = ('Description:\n  Trims video with motion:\n\n  '
+                      '- Drops static footage, keeps segments with motion.'
+                      '\n\n')
+
+# Trim faces subparser object.
+faces_usage = ('vdoxa trim faces --path <local video path> --prototxt '
+               '<deploy.prototxt> --model <model.caffemodel> ...\n  '
+               'vdoxa trim faces --path <local video path> --prototxt '
+               '<deploy.prototxt> --model <model.caffemodel> --manifest '
+               '<faces.jsonl> ...\n')
+faces_help = ('Trims the portions of the video with faces. Faces are '
+              'detected using the OpenCV DNN face detector on CPU. The '
+              'portions can be trimmed directly or written to a manifest for '
+              '"vdoxa trim batch".')
+faces_description = ('Description:\n  Extracts highlights with faces:\n\n  '
+                     '- Trims video where faces are present.\n\n')
+
+# Serve subparser object.
+serve_usage = ('vdoxa serve [options] ...\n  '
+               'vdoxa serve [options] --socket <path> --workers <num> ...\n  '
+               'vdoxa serve [options] --port <num> ...\n')
+serve_help = ('Serves trim jobs from a pool of warm workers. Jobs are sent '
+              'as JSON lines over a Unix socket or a localhost TCP port & '
+              'their progress and results are streamed back as JSON lines.')
+serve_description = ('Description:\n  Keeps vdoXA warm for other '
+                     'programs:\n\n  '
+                     '- Trims short cuts without paying for the startup of '
+                     'every run.\n\n')
+
+# Join subparser object.
+join_usage = ('vdoxa join <path> <path> ... --output <path> ...\n  '
+              'vdoxa join <directory of parts> --output <path> ...\n')
+join_help = ('Joins videos end to end without re-encoding them. Only the '
+             'videos whose streams don\'t match the others are re-encoded '
+             'before joining.')
+join_description = ('Description:\n  Reassembles trimmed parts:\n\n  '
+                    '- Joins parts losslessly, re-encoding only the '
+                    'incompatible ones.\n\n')
@@ -0,0 +1,223 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for trimming videos listed in a manifest.
+
+The manifest is a JSON lines file with one cut per line:
+
+  {"source": "a.mp4", "start": 0, "end": 30, "output": "a_0.mp4"}
+
+Start and end are in secs. Output is optional and defaults to the
+numbered file used by the other trim commands.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from moviepy.editor import VideoFileClip as vfc
+
+from vdoxa.core.parallel import encoder_threads, run_in_pool
+from vdoxa.core.trim import decodes, trim_video
+from vdoxa.probe import probe_many
+from vdoxa.utils import memory
+from vdoxa.utils.encoding import is_copy, trim_settings
+from vdoxa.utils.file_ops import filename
+from vdoxa.utils.index import keyframe_index
+from vdoxa.utils.journal import Ledger
+from vdoxa.utils.metrics import emit
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(manifest: str) -> List[Dict[str, Any]]:
+  """Read and validate the rows of the manifest.
+
+  Args:
+    manifest: Path of the JSON lines manifest.
+
+  Raises:
+    ValueError: If a row is missing source, start or end.
+  """
+  rows = []
+  with open(manifest, 'r') as file:
+    for line_no, line in enumerate(file, 1):
+      if not line.strip():
+        continue
+      row = json.loads(line)
+      missing = [key for key in ('source', 'start', 'end') if key not in row]
+      if missing:
+        raise ValueError(f'Row {line_no} of {manifest} is missing: '
+                         f'{", ".join(missing)}.')
+      row['start'], row['end'] = float(row['start']), float(row['end'])
+      rows.append(row)
+  return rows
+
+
+def _append(results: str, result: Dict[str, Any]) -> None:
+  """Append the result of a cut to the results manifest.
+
+  Rows are written with a single call to an append only file, hence the
+  rows of groups trimmed in parallel don't interleave.
+  """
+  with open(results, 'a') as file:
+    file.write(json.dumps({key: value for key, value in result.items()
+                           if key != 'index'}) + '\n')
+
+
+def trim_group(source: str,
+               rows: Sequence[Dict[str, Any]],
+               copy: bool = False,
+               threads: Optional[int] = None,
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE,
+               results: Optional[str] = None) -> List[Dict[str, Any]]:
+  """Trim all the cuts of a single source.
+
+  The source is opened (or it's keyframes looked up) once & every cut
+  is trimmed by `trim_video` from it. Failures (including a missing
+  source) are recorded per cut instead of aborting the whole group. Cuts completed by an earlier run
+  or found in the output cache are reused, see `Ledger`.
+
+  Args:
+    source: Path of the video file.
+    rows: Manifest rows of the source.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    threads: Number of threads (default: None) per encoder.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the cuts.
+    results: Path (default: None) of the results manifest every result
+             is appended to as soon as the cut is done.
+
+  Returns:
+    Result records, one per row, in the same order as the rows. Each
+    of them carries the metrics record of the cut, None if the cut was
+    reused or failed.
+  """
+  records = []
+  copy = copy or is_copy(profile)
+  ledger = Ledger(source, trim_settings(copy, profile, audio))
+  clip, key_frames = None, None
+  try:
+    for row in rows:
+      start, end, output = row['start'], row['end'], row.get('output')
+      result = dict(row, output=output, status='ok', error=None, reused=None)
+      started = time.perf_counter()
+      record = None
+      try:
+        # Numbered outputs create the directory next to the source.
+        if not os.path.isfile(source):
+          raise FileNotFoundError(f'Source {source} doesn\'t exist.')
+        if output is None:
+          output = result['output'] = filename(source, row['index'])
+        if ledger.done(output, start, end):
+          result['reused'] = 'journal'
+        elif ledger.fetch(output, start, end):
+          result['reused'] = 'cache'
+        else:
+          if decodes(copy, profile, audio):
+            if clip is None:
+              clip = vfc(source, audio=audio == 'encode',
+                         **memory.clip_params())
+          elif audio != 'only' and key_frames is None:
+            key_frames = keyframe_index(source).times
+          record = trim_video(source, output, start, end, copy, key_frames,
+                              threads, profile, audio, clip)
+          ledger.complete(output, start, end)
+          if record['mode'] == 'copy':
+            result.update(start=record['start'], end=record['end'])
+      except Exception as error:
+        logger.debug('Failed to trim %s.', output, exc_info=True)
+        result.update(status='failed', error=str(error))
+      result['seconds'] = round(time.perf_counter() - started, 3)
+      result['metrics'] = record
+      if results:
+        _append(results, result)
+      records.append(result)
+  finally:
+    if clip is not None:
+      clip.close()
+  return records
+
+
+def trim_batch(manifest: str,
+               results: Optional[str] = None,
+               jobs: int = 1,
+               copy: bool = False,
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE) -> str:
+  """Trim all the cuts listed in the manifest.
+
+  Rows are grouped by the source so that each file is opened once and
+  the groups are trimmed on a bounded pool of workers. Groups larger
+  than an equal share of the cuts per worker are split into chunks, so
+  the cuts of a few long sources are trimmed in parallel too, each chunk
+  opening the source once.
+
+  Args:
+    manifest: Path of the JSON lines manifest.
+    results: Path (default: `<manifest>.results.jsonl`) of the results
+             manifest with per cut status & timings. Results are
+             appended as the cuts finish, `row` is the line number (from
+             0) of the cut in the manifest.
+    jobs: Number of workers (default: 1) trimming in parallel.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the cuts.
+
+  Returns:
+    Path of the results manifest.
+  """
+  results = results or f'{os.path.splitext(manifest)[0]}.results.jsonl'
+  groups = OrderedDict()
+  for row_no, row in enumerate(read_manifest(manifest)):
+    group = groups.setdefault(row['source'], [])
+    group.append(dict(row, row=row_no, index=len(group)))
+  if jobs > 1 and memory.budget() is not None:
+    # Sized for the largest of the sources, any of them may run at once.
+    sizes = [info.size for info in probe_many(list(groups)) if info]
+    jobs = memory.jobs_within(jobs, max(sizes, key=memory.frame_bytes,
+                                        default=None))
+  # Results of an earlier run are replaced, not appended to.
+  open(results, 'w').close()
+  chunk = -(-sum(len(rows) for rows in groups.values()) // jobs)
+  tasks = [(source, rows[offset:offset + chunk], copy,
+            encoder_threads(jobs), profile, audio, results)
+           for source, rows in groups.items()
+           for offset in range(0, len(rows), chunk)]
+
+  def finished(group: List[Dict[str, Any]]) -> None:
+    for record in group:
+      if record['metrics'] is not None:
+        emit(record['metrics'])
+
+  if jobs > 1:
+    records = run_in_pool(trim_group, tasks, jobs, callback=finished)
+  else:
+    records = [trim_group(*task) for task in tasks]
+    for group in records:
+      finished(group)
+  records = [record for group in records for record in group]
+  failed = sum(record['status'] != 'ok' for record in records)
+  print(f'Completed {len(records) - failed} of {len(records)} cuts from '
+        f'{len(groups)} sources. Results are written to {results}.')
+  return results
@@ -0,0 +1,197 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for trimming the portions of video with faces.
+
+Faces are detected using the OpenCV DNN face detector (Caffe model,
+`res10_300x300_ssd_iter_140000.caffemodel` with it's `deploy.prototxt`)
+on CPU. Every `stride`-th frame is sampled and the samples are passed
+through the network in batches using `cv2.dnn.blobFromImages`.
+"""
+
+import json
+import logging
+import time
+from typing import Any, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from vdoxa.core.trim import trim_ranges
+from vdoxa.utils.common import merge_intervals
+from vdoxa.utils.opencv import FrameReader
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+logger = logging.getLogger(__name__)
+
+# Input size & mean values the Caffe face model was trained with.
+BLOB_SIZE = (300, 300)
+BLOB_MEAN = (104.0, 177.0, 123.0)
+
+
+def load_detector(prototxt: str, model: str) -> cv2.dnn.Net:
+  """Load the Caffe face detector to run on CPU."""
+  net = cv2.dnn.readNetFromCaffe(prototxt, model)
+  net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+  net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+  return net
+
+
+def faces_present(net: cv2.dnn.Net,
+                  frames: Union[List[np.ndarray], np.ndarray],
+                  confidence: float = 0.5) -> np.ndarray:
+  """Return boolean array telling which of the frames have faces.
+
+  Args:
+    net: Face detector network.
+    frames: Batch of BGR frames.
+    confidence: Minimum confidence (default: 0.5) of a detection.
+  """
+  net.setInput(cv2.dnn.blobFromImages(frames, 1.0, BLOB_SIZE, BLOB_MEAN))
+  # Detections are rows of (image id, label, confidence, box) for the
+  # whole batch.
+  detections = net.forward().reshape(-1, 7)
+  ids = detections[detections[:, 2] >= confidence, 0].astype(np.intp)
+  present = np.zeros(len(frames), dtype=bool)
+  present[ids[(ids >= 0) & (ids < len(frames))]] = True
+  return present
+
+
+def detect_faces(source: Any,
+                 prototxt: str,
+                 model: str,
+                 stride: int = 10,
+                 batch_size: int = 16,
+                 confidence: float = 0.5,
+                 padding: float = 1.0) -> Tuple[List[Tuple[float, float]],
+                                                float]:
+  """Detect the intervals of the video with faces.
+
+  Args:
+    source: Path of the video file.
+    prototxt: Path of the `deploy.prototxt` file.
+    model: Path of the `.caffemodel` file.
+    stride: Analyse every n-th (default: 10) frame only.
+    batch_size: Number of sampled frames (default: 16) passed through
+                the network at once.
+    confidence: Minimum confidence (default: 0.5) of a detection.
+    padding: Time (default: 1.0) in secs added on both the sides of the
+             intervals.
+
+  Returns:
+    Tuple of merged (start, end) intervals with faces & video duration.
+  """
+  net = load_detector(prototxt, model)
+  intervals, batch, times = [], None, []
+  sampled, elapsed = 0, 0.0
+
+  def flush() -> None:
+    nonlocal sampled, elapsed
+    started = time.perf_counter()
+    present = faces_present(net, batch[:len(times)], confidence)
+    elapsed += time.perf_counter() - started
+    sampled += len(times)
+    for timestamp, face in zip(times, present):
+      if not face:
+        continue
+      # Consecutive samples with faces extend the previous interval.
+      if intervals and timestamp - intervals[-1][1] <= step + 1e-6:
+        intervals[-1] = (intervals[-1][0], timestamp)
+      else:
+        intervals.append((timestamp, timestamp))
+    times.clear()
+
+  # Frames are resized to the network input size while decoding, hence
+  # `blobFromImages` doesn't need to resize them again.
+  with FrameReader(source, stride=stride, width=BLOB_SIZE[0],
+                   height=BLOB_SIZE[1]) as reader:
+    step = stride / reader.fps
+    for _, timestamp, frame in reader:
+      if batch is None:
+        batch = np.empty((batch_size, *frame.shape), frame.dtype)
+      np.copyto(batch[len(times)], frame)
+      times.append(timestamp)
+      if len(times) == batch_size:
+        flush()
+    if times:
+      flush()
+  if sampled:
+    print(f'? Face detection ran at {round(sampled / elapsed, 2)} frames per '
+          f'second on CPU ({sampled} frames in batches of {batch_size}).')
+  duration = reader.frames_read / reader.fps
+  # Every sample with a face stands for the frames till the next sample.
+  intervals = [(start, min(end + step, duration)) for start, end in intervals]
+  return merge_intervals(intervals, padding, duration), duration
+
+
+def write_manifest(source: Any,
+                   ranges: List[Tuple[float, float]],
+                   manifest: str) -> None:
+  """Write the ranges as a manifest usable by `vdoxa trim batch`."""
+  with open(manifest, 'w') as file:
+    for start, end in ranges:
+      file.write(json.dumps({'source': source, 'start': round(start, 3),
+                             'end': round(end, 3)}) + '\n')
+
+
+def trim_faces(source: Any,
+               prototxt: str,
+               model: str,
+               stride: int = 10,
+               batch_size: int = 16,
+               confidence: float = 0.5,
+               padding: float = 1.0,
+               manifest: Optional[str] = None,
+               copy: bool = False,
+               jobs: int = 1,
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE) -> List[str]:
+  """Trim the portions of video which contain faces.
+
+  Args:
+    source: Path of the video file.
+    prototxt: Path of the `deploy.prototxt` file.
+    model: Path of the `.caffemodel` file.
+    stride: Analyse every n-th (default: 10) frame only.
+    batch_size: Number of sampled frames (default: 16) passed through
+                the network at once.
+    confidence: Minimum confidence (default: 0.5) of a detection.
+    padding: Time (default: 1.0) in secs added on both the sides of the
+             intervals.
+    manifest: Path (default: None) of the manifest to write the ranges
+              to instead of trimming them.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    jobs: Number of parts (default: 1) to be encoded in parallel.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the parts.
+
+  Returns:
+    Paths of the trimmed video files.
+  """
+  ranges, duration = detect_faces(source, prototxt, model, stride,
+                                  batch_size, confidence, padding)
+  present = sum(end - start for start, end in ranges)
+  print(f'? Found {len(ranges)} segments with faces, {round(present, 2)} of '
+        f'{round(duration, 2)} secs.')
+  if manifest:
+    write_manifest(source, ranges, manifest)
+    print(f'? Ranges are written to {manifest}.')
+    return []
+  if not ranges:
+    return []
+  return trim_ranges(source, ranges, copy=copy, jobs=jobs,
+                     profile=profile, audio=audio)
@@ -0,0 +1,218 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for joining the trimmed parts back together.
+
+Parts with the same stream parameters are joined by FFmpeg's concat
+demuxer, which copies the packets as they are. The most common set of
+parameters among the inputs is taken as the reference & only the
+streams of the inputs which differ from it are re-encoded (to match
+the reference) before joining. Hence, joining the parts of a split
+costs I/O rather than CPU.
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from vdoxa.probe import MediaInfo, probe
+from vdoxa.utils.encoding import get_profile
+from vdoxa.utils.ffmpeg import concat_copy, run
+from vdoxa.utils.file_ops import atomic_output, temporary
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi', '.ts')
+
+# FFmpeg encoders producing the streams of the decoders reported by
+# FFprobe, codecs missing here are encoded using the same name.
+ENCODERS = {
+  'h264': 'libx264',
+  'hevc': 'libx265',
+  'vp8': 'libvpx',
+  'vp9': 'libvpx-vp9',
+  'mp3': 'libmp3lame',
+  'opus': 'libopus',
+  'vorbis': 'libvorbis',
+}
+
+# Encoder profiles matching the H.264 & HEVC profiles reported by FFprobe.
+ENCODER_PROFILES = {
+  'Constrained Baseline': 'baseline',
+  'Baseline': 'baseline',
+  'Main': 'main',
+  'High': 'high',
+  'High 10': 'high10',
+  'High 4:2:2': 'high422',
+  'High 4:4:4 Predictive': 'high444',
+  'Main 10': 'main10',
+}
+
+
+def _natural(path: str) -> List[Any]:
+  """Return sort key ordering `demo_2.mp4` before `demo_10.mp4`."""
+  return [int(token) if token.isdigit() else token
+          for token in re.split(r'(\d+)', path)]
+
+
+def expand(paths: Sequence[str]) -> List[str]:
+  """Return video files, replacing directories by the videos inside.
+
+  Videos in a directory are in natural order of their names, which is
+  the order `trim_num_parts` writes them in. Hidden & partially written
+  files are skipped.
+  """
+  files = []
+  for path in paths:
+    if not os.path.isdir(path):
+      files.append(path)
+      continue
+    names = [name for name in os.listdir(path)
+             if name.lower().endswith(VIDEO_EXTENSIONS) and
+             not name.startswith('.') and 'TEMP_VDOXA_' not in name and
+             'TEMP_MPY_' not in name]
+    files.extend(os.path.join(path, name) for name in
+                 sorted(names, key=_natural))
+  return files
+
+
+def video_params(info: MediaInfo) -> Optional[Tuple[Any, ...]]:
+  """Return parameters the video streams must share to be joined."""
+  if info.video is None:
+    return None
+  return tuple(info.video[key] for key in ('codec', 'profile', 'width',
+                                           'height', 'pix_fmt', 'fps'))
+
+
+def audio_params(info: MediaInfo) -> Optional[Tuple[Any, ...]]:
+  """Return parameters the audio streams must share to be joined."""
+  if info.audio is None:
+    return None
+  return tuple(info.audio[key] for key in ('codec', 'sample_rate',
+                                           'channels'))
+
+
+def conform(source: str,
+            file: str,
+            info: MediaInfo,
+            reference: MediaInfo,
+            profile: Optional[str] = None) -> None:
+  """Rewrite the source with the stream parameters of the reference.
+
+  Streams already matching the reference are copied, only the others
+  are re-encoded. A missing audio stream is filled with silence and an
+  extra one is dropped.
+
+  Args:
+    source: Path of the incompatible video file.
+    file: Path of the conformed output file.
+    info: Metadata of the source.
+    reference: Metadata of the inputs the source should match.
+    profile: Name of the encoding profile (default: default) used for
+             preset & quality of the re-encoded streams.
+  """
+  settings = get_profile(profile)
+  args = ['-v', 'error', '-y', '-i', source]
+  video, audio = reference.video, reference.audio
+  if audio is not None and info.audio is None:
+    args += ['-f', 'lavfi', '-t', info.duration,
+             '-i', f'anullsrc=r={audio["sample_rate"]}:'
+                   f'cl={audio["channel_layout"] or "stereo"}']
+  args += ['-map', '0:v:0']
+  if video_params(info) == video_params(reference):
+    args += ['-c:v', 'copy']
+  else:
+    args += ['-c:v', ENCODERS.get(video['codec'], video['codec']),
+             '-vf', f'scale={video["width"]}:{video["height"]}',
+             '-r', video['fps']]
+    if video['pix_fmt']:
+      args += ['-pix_fmt', video['pix_fmt']]
+    if (video['codec'] in ('h264', 'hevc') and
+        video['profile'] in ENCODER_PROFILES):
+      args += ['-profile:v', ENCODER_PROFILES[video['profile']]]
+    if video['codec'] == 'h264':
+      args += ['-preset', settings['preset'] or 'medium']
+      args += ['-crf', settings['crf']] if settings['crf'] is not None else []
+  if audio is None:
+    args += ['-an']
+  elif info.audio is None:
+    args += ['-map', '1:a:0', '-c:a', ENCODERS.get(audio['codec'],
+                                                  audio['codec'])]
+  else:
+    args += ['-map', '0:a:0']
+    if audio_params(info) == audio_params(reference):
+      args += ['-c:a', 'copy']
+    else:
+      args += ['-c:a', ENCODERS.get(audio['codec'], audio['codec']),
+               '-ar', audio['sample_rate'], '-ac', audio['channels']]
+  run(args + [file])
+
+
+def join_files(paths: Sequence[str],
+               output: str,
+               profile: Optional[str] = None) -> Dict[str, Any]:
+  """Join the videos end to end into a single file.
+
+  Args:
+    paths: Paths of the video files (or directories of them) in the
+           order they are joined in.
+    output: Path of the joined video file.
+    profile: Name of the encoding profile (default: default) used for
+             re-encoding the incompatible inputs.
+
+  Returns:
+    Summary of the join with the inputs that were remuxed as they are
+    and the ones that had to be re-encoded.
+
+  Raises:
+    ValueError: If there are no video files to join.
+  """
+  files = expand(paths)
+  if not files:
+    raise ValueError('No video files to join.')
+  infos = [probe(file) for file in files]
+  params = [(video_params(info), audio_params(info)) for info in infos]
+  # Most common parameters need the least re-encoding, ties go to the
+  # earliest input.
+  counts = Counter(params)
+  reference = infos[max(range(len(params)),
+                        key=lambda idx: (counts[params[idx]], -idx))]
+  wanted = (video_params(reference), audio_params(reference))
+  inputs, temps, conformed = [], [], []
+  try:
+    for idx, (file, info) in enumerate(zip(files, infos)):
+      if params[idx] == wanted:
+        inputs.append(file)
+        continue
+      logger.debug('Parameters of %s are %s instead of %s.', file,
+                   params[idx], wanted)
+      temp = temporary(output, f'join{idx}')
+      temps.append(temp)
+      conform(file, temp, info, reference, profile)
+      inputs.append(temp)
+      conformed.append(file)
+    with atomic_output(output) as partial:
+      concat_copy(inputs, partial)
+  finally:
+    for temp in temps:
+      if os.path.isfile(temp):
+        os.remove(temp)
+  remuxed = len(files) - len(conformed)
+  print(f'? Joined {len(files)} files into {output} ({remuxed} remuxed, '
+        f'{len(conformed)} re-encoded).')
+  return {'output': output, 'files': files, 'reencoded': conformed}
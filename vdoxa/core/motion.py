@@ -0,0 +1,136 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for trimming only the portions of video with motion.
+
+Motion is detected by running background subtraction on every
+`stride`-th downscaled frame. A frame is considered active once the
+fraction of foreground pixels rises above the threshold & stays active
+till it drops below the release level, a fraction (default: half) of the
+threshold. The gap between the two (hysteresis) keeps motion hovering
+around the threshold from being cut into many short intervals. Active
+intervals are then padded and merged before trimming.
+"""
+
+import logging
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from vdoxa.core.trim import trim_ranges
+from vdoxa.utils.common import merge_intervals
+from vdoxa.utils.opencv import FrameReader
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+logger = logging.getLogger(__name__)
+
+# Number of sampled frames used only for learning the background.
+WARMUP_FRAMES = 10
+# Fraction of the threshold below which the motion stops.
+DEFAULT_HYSTERESIS = 0.5
+
+
+def detect_activity(source: Any,
+                    threshold: float = 0.01,
+                    stride: int = 5,
+                    width: int = 160,
+                    padding: float = 1.0,
+                    hysteresis: float = DEFAULT_HYSTERESIS
+                    ) -> Tuple[List[Tuple[float, float]], float]:
+  """Detect the intervals of the video with motion.
+
+  Args:
+    source: Path of the video file.
+    threshold: Fraction of foreground pixels (default: 0.01) above
+               which a frame is considered active.
+    stride: Analyse every n-th (default: 5) frame only.
+    width: Width (default: 160) the frames are downscaled to.
+    padding: Time (default: 1.0) in secs added on both the sides of the
+             active intervals.
+    hysteresis: Fraction of the threshold (default: 0.5) below which an
+                active frame becomes inactive again; 1 disables the
+                hysteresis.
+
+  Returns:
+    Tuple of merged active (start, end) intervals & video duration.
+
+  Raises:
+    ValueError: If the hysteresis isn't between 0 (exclusive) and 1.
+  """
+  if not 0 < hysteresis <= 1:
+    raise ValueError('Hysteresis should be a fraction of the threshold '
+                     f'between 0 & 1, got {hysteresis}.')
+  release = threshold * hysteresis
+  subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+  intervals, start, blurred, mask = [], None, None, None
+  with FrameReader(source, stride=stride, width=width) as reader:
+    for sampled, (_, time, frame) in enumerate(reader, 1):
+      blurred = cv2.GaussianBlur(frame, (5, 5), 0, dst=blurred)
+      mask = subtractor.apply(blurred, fgmask=mask)
+      if sampled <= WARMUP_FRAMES:
+        continue
+      active = np.count_nonzero(mask) / float(mask.size)
+      if start is None and active >= threshold:
+        start = time
+      elif start is not None and active < release:
+        intervals.append((start, time))
+        start = None
+  duration = reader.frames_read / reader.fps
+  if start is not None:
+    intervals.append((start, duration))
+  logger.debug('Found %d active intervals in %s.', len(intervals), source)
+  return merge_intervals(intervals, padding, duration), duration
+
+
+def trim_motion(source: Any,
+                threshold: float = 0.01,
+                stride: int = 5,
+                padding: float = 1.0,
+                copy: bool = False,
+                jobs: int = 1,
+                profile: Optional[str] = None,
+                audio: str = DEFAULT_AUDIO_MODE,
+                hysteresis: float = DEFAULT_HYSTERESIS) -> List[str]:
+  """Trim only the portions of video which contain motion.
+
+  Args:
+    source: Path of the video file.
+    threshold: Fraction of foreground pixels (default: 0.01) above
+               which a frame is considered active.
+    stride: Analyse every n-th (default: 5) frame only.
+    padding: Time (default: 1.0) in secs added on both the sides of the
+             active intervals.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    jobs: Number of parts (default: 1) to be encoded in parallel.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the parts.
+    hysteresis: Fraction of the threshold (default: 0.5) below which
+                the motion stops.
+
+  Returns:
+    Paths of the trimmed video files.
+  """
+  ranges, duration = detect_activity(source, threshold, stride,
+                                     padding=padding, hysteresis=hysteresis)
+  active = sum(end - start for start, end in ranges)
+  print(f'? Found {len(ranges)} segments with motion, {round(active, 2)} of '
+        f'{round(duration, 2)} secs will be trimmed.')
+  if not ranges:
+    return []
+  return trim_ranges(source, ranges, copy=copy, jobs=jobs,
+                     profile=profile, audio=audio)
@@ -0,0 +1,126 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for running the encoding jobs in a process pool."""
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from typing import Any, Callable, List, Optional, Sequence
+
+from vdoxa.utils import memory
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerLost(RuntimeError):
+  """Raised when a worker exits (killed or crashed) midway."""
+
+
+def encoder_threads(jobs: int) -> int:
+  """Return number of encoder threads each worker is allowed to use.
+
+  The available cores are shared equally between the workers so that
+  the machine isn't oversubscribed by `jobs` encoders each spawning a
+  thread per core.
+
+  Args:
+    jobs: Number of workers running in parallel.
+  """
+  return max(1, (os.cpu_count() or 1) // max(1, jobs))
+
+
+def _init_worker(workers: int = 1) -> None:
+  """Ignore interrupts in workers, the parent process handles them.
+
+  Workers share the memory budget of the parent equally.
+  """
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  memory.share(workers)
+
+
+def run_in_pool(function: Callable,
+                tasks: Sequence[Sequence[Any]],
+                jobs: int,
+                callback: Optional[Callable[[Any], None]] = None) -> List[Any]:
+  """Run function for every task in a pool of worker processes.
+
+  Args:
+    function: Picklable function to be executed by the workers.
+    tasks: Positional arguments of the function, one per task.
+    jobs: Number of worker processes.
+    callback: Function (default: None) called in the parent process
+              with the result of every task as soon as it finishes. If it
+              raises, the workers are terminated & the error is raised.
+
+  Returns:
+    List of results in the same order as the tasks.
+
+  Raises:
+    KeyboardInterrupt: If interrupted, after terminating all workers.
+    WorkerLost: If a worker exits midway (for example, killed when out
+                of memory), after terminating all workers.
+  """
+  workers = min(jobs, len(tasks)) or 1
+  before = {process.pid for process in multiprocessing.active_children()}
+  pool = multiprocessing.Pool(workers, _init_worker, (workers,))
+  # Pool replaces an exited worker but drops it's task silently, so the
+  # workers are watched & the run fails instead of waiting forever.
+  started = {process.pid for process in multiprocessing.active_children()
+             } - before
+  # Pool's own callbacks run in it's result handler thread, where an
+  # exception is swallowed & the result never becomes ready. They only
+  # report the finished task here, the callback runs in this thread.
+  finished = queue.Queue()
+
+  def report(idx: int) -> Callable[[Any], None]:
+    return lambda _: finished.put(idx)
+
+  try:
+    results = [pool.apply_async(function, task, callback=report(idx),
+                                error_callback=report(idx))
+               for idx, task in enumerate(tasks)]
+    for done, _ in enumerate(results):
+      while True:
+        try:
+          # Waiting with a timeout keeps the parent responsive to Ctrl-C.
+          idx = finished.get(timeout=0.5)
+          break
+        except queue.Empty:
+          alive = {process.pid
+                   for process in multiprocessing.active_children()}
+          lost = started - alive
+          if lost:
+            raise WorkerLost(f'Worker {min(lost)} exited midway, '
+                             f'{len(results) - done} of '
+                             f'{len(results)} tasks are unfinished.')
+      output = results[idx].get()
+      if callback is not None:
+        callback(output)
+    outputs = [result.get() for result in results]
+  except BaseException as error:
+    if isinstance(error, KeyboardInterrupt):
+      logger.warning('Interrupted, terminating all the workers.')
+    elif isinstance(error, WorkerLost):
+      logger.error('%s Terminating all the workers.', error)
+    pool.terminate()
+    pool.join()
+    raise
+  pool.close()
+  pool.join()
+  return outputs
@@ -0,0 +1,198 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for splitting the video at the shot boundaries.
+
+Shot boundaries are found by comparing every `stride`-th frame with the
+previous sampled frame after downscaling them. The comparison is done
+on blocks of frames at once using NumPy instead of per pixel loops.
+
+Both the scores are scaled so that hard cuts score well above the
+default threshold (0.15) while motion within a shot stays well below it,
+for instance, hard cuts in the synthetic benchmark videos score above
+0.25 & their moving box below 0.05.
+"""
+
+import logging
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from vdoxa.core.trim import trim_ranges
+from vdoxa.utils.opencv import FrameReader
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+logger = logging.getLogger(__name__)
+
+# Bins per color channel, should be a power of 2.
+HISTOGRAM_BINS = 16
+# Frames are split into a grid of tiles x tiles with a histogram each.
+HISTOGRAM_TILES = 4
+# Mean absolute difference of two unrelated frames (uniform pixels).
+_UNRELATED = 255.0 / 3.0
+DEFAULT_THRESHOLD = 0.15
+
+
+def histogram_scores(block: np.ndarray,
+                     previous: Optional[np.ndarray] = None
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+  """Return color histogram difference scores for a block of frames.
+
+  Every frame is split into a grid of `HISTOGRAM_TILES` x
+  `HISTOGRAM_TILES` tiles & the histograms of the tiles are compared.
+  Unlike a histogram of the whole frame, it tells apart shots with a
+  similar overall palette while a moving object changes only a few
+  tiles. Histograms of all the tiles in the block are computed with a
+  single `np.bincount` call by offsetting the bins of every tile &
+  channel.
+
+  Args:
+    block: Array of N x H x W x 3 frames.
+    previous: Histograms (default: None) of the frame before the block.
+
+  Returns:
+    Tuple of scores in range [0, 1], one per frame, & histograms of the
+    last frame of the block. Score of the very first frame is 0.
+  """
+  num, height, width = block.shape[:3]
+  tiles = min(HISTOGRAM_TILES, height, width)
+  rows, cols = height // tiles, width // tiles
+  cells = tiles * tiles
+  # N x tiles x rows x tiles x cols x 3 -> N x tiles x tiles x pixels x 3.
+  grid = block[:, :rows * tiles, :cols * tiles].reshape(
+      num, tiles, rows, tiles, cols, 3).swapaxes(2, 3)
+  shift = 8 - int(np.log2(HISTOGRAM_BINS))
+  bins = (grid.reshape(num * cells, -1, 3) >> shift).astype(np.intp)
+  bins += np.arange(3) * HISTOGRAM_BINS
+  bins += (np.arange(num * cells) * 3 * HISTOGRAM_BINS)[:, None, None]
+  hist = np.bincount(bins.ravel(),
+                     minlength=num * cells * 3 * HISTOGRAM_BINS)
+  hist = hist.reshape(num, cells * 3 * HISTOGRAM_BINS) / float(rows * cols)
+  stacked = np.concatenate([hist[:1] if previous is None else previous[None],
+                            hist])
+  # L1 distance of each channel of a tile lies between 0 & 2.
+  scores = np.abs(np.diff(stacked, axis=0)).sum(axis=1) / (6.0 * cells)
+  return scores, hist[-1]
+
+
+def pixel_scores(block: np.ndarray,
+                 previous: Optional[np.ndarray] = None
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+  """Return mean absolute pixel difference scores for a block of frames.
+
+  Args:
+    block: Array of N x H x W x 3 frames.
+    previous: Grayscale (default: None) frame before the block.
+
+  Returns:
+    Tuple of scores in range [0, 1], one per frame, & grayscale of the
+    last frame of the block. Score of the very first frame is 0.
+
+  Note:
+    Differences are relative to that of two unrelated frames (255 / 3
+    for uniformly distributed pixels), scores are capped at 1.
+  """
+  gray = block.mean(axis=3, dtype=np.float32)
+  stacked = np.concatenate([gray[:1] if previous is None else previous[None],
+                            gray])
+  scores = np.abs(np.diff(stacked, axis=0)).mean(axis=(1, 2)) / _UNRELATED
+  return np.minimum(scores, 1.0), gray[-1]
+
+
+def detect_scenes(source: Any,
+                  threshold: float = DEFAULT_THRESHOLD,
+                  stride: int = 2,
+                  width: int = 160,
+                  method: str = 'histogram',
+                  min_length: float = 1.0,
+                  block_size: int = 64) -> Tuple[List[float], float]:
+  """Detect shot boundaries in the video.
+
+  Args:
+    source: Path of the video file.
+    threshold: Score (default: 0.15) above which a frame starts a new
+               shot.
+    stride: Compare every n-th (default: 2) frame only.
+    width: Width (default: 160) the frames are downscaled to.
+    method: Scoring method (default: histogram); pixel available.
+    min_length: Minimum length (default: 1.0) of a shot in secs.
+    block_size: Number of sampled frames (default: 64) scored at once.
+
+  Returns:
+    Tuple of shot boundary timestamps (in secs) & video duration.
+  """
+  score = pixel_scores if method == 'pixel' else histogram_scores
+  cuts, times = [], []
+  block, previous, last_cut = None, None, 0.0
+
+  def flush() -> None:
+    nonlocal previous, last_cut
+    scores, previous = score(block[:len(times)], previous)
+    # Previous features may be a view into the block which is reused.
+    previous = previous.copy()
+    for time, value in zip(times, scores):
+      if value > threshold and time - last_cut >= min_length:
+        cuts.append(time)
+        last_cut = time
+    times.clear()
+
+  # Frames are decoded & downscaled in the background while the earlier
+  # blocks are being scored.
+  with FrameReader(source, stride=stride, width=width) as reader:
+    for _, time, frame in reader:
+      if block is None:
+        block = np.empty((block_size, *frame.shape), frame.dtype)
+      np.copyto(block[len(times)], frame)
+      times.append(time)
+      if len(times) == block_size:
+        flush()
+    if times:
+      flush()
+  logger.debug('Found %d shot boundaries in %s.', len(cuts), source)
+  return cuts, reader.frames_read / reader.fps
+
+
+def trim_scenes(source: Any,
+                threshold: float = DEFAULT_THRESHOLD,
+                stride: int = 2,
+                method: str = 'histogram',
+                copy: bool = False,
+                jobs: int = 1,
+                profile: Optional[str] = None,
+                audio: str = DEFAULT_AUDIO_MODE) -> List[str]:
+  """Trim video into parts at the shot boundaries.
+
+  Args:
+    source: Path of the video file.
+    threshold: Score (default: 0.15) above which a frame starts a new
+               shot.
+    stride: Compare every n-th (default: 2) frame only.
+    method: Scoring method (default: histogram); pixel available.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    jobs: Number of parts (default: 1) to be encoded in parallel.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the parts.
+
+  Returns:
+    Paths of the trimmed video files.
+  """
+  cuts, duration = detect_scenes(source, threshold, stride, method=method)
+  boundaries = [0.0, *cuts, duration]
+  print(f'? Found {len(cuts)} shot boundaries, video will be trimmed in '
+        f'{len(cuts) + 1} parts.')
+  return trim_ranges(source, list(zip(boundaries[:-1], boundaries[1:])),
+                     copy=copy, jobs=jobs, profile=profile, audio=audio)
@@ -0,0 +1,199 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for cutting the video into fixed length segments.
+
+The whole video is cut by FFmpeg's segment muxer in a single pass. With
+copy, the packets are remuxed & a new segment starts at the first
+keyframe at or after every boundary. Otherwise, the video is encoded as
+per the profile with keyframes forced at the boundaries, so every
+segment is exactly as long as asked for.
+
+The exact start & end of every segment (as reported by the muxer) are
+written to a segment index next to the segments.
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from vdoxa.probe import probe
+from vdoxa.utils.common import parse_length
+from vdoxa.utils.encoding import is_copy, output_args
+from vdoxa.utils.ffmpeg import run
+from vdoxa.utils.file_ops import (create_directory, get_directory_name,
+                                  get_file_name)
+from vdoxa.utils.metrics import PartMetrics, ProcessUsage, emit
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+INDEX = 'segments.csv'
+
+
+def segment_args(length: float,
+                 unit: str,
+                 fps: Optional[float],
+                 frames: Optional[int],
+                 copy: bool = False,
+                 profile: Optional[str] = None,
+                 audio: str = DEFAULT_AUDIO_MODE,
+                 size: Optional[Tuple[int, int]] = None) -> List[Any]:
+  """Return FFmpeg output arguments for cutting the segments.
+
+  Args:
+    length: Length of the segments in secs or frames.
+    unit: Unit of the length; `secs` or `frames`.
+    fps: Frame rate of the video.
+    frames: Number of frames in the video.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the segments.
+    size: Width & height (default: None) of the video, used to keep the
+          encoder within the memory budget.
+
+  Raises:
+    ValueError: If the length is in frames & the frame count (or frame
+                rate) of the video is unknown.
+  """
+  if unit == 'frames':
+    if not frames or not fps:
+      raise ValueError('Frame count of the video is unknown, use a length '
+                       'in secs instead.')
+    if audio == 'only':
+      length, unit = length / fps, 'secs'
+  if audio == 'only':
+    args = ['-map', '0:a', '-vn', '-c:a', 'copy']
+  else:
+    args = ['-map', '0:v:0']
+    args += [] if audio == 'drop' else ['-map', '0:a?']
+    if copy:
+      args += ['-c', 'copy']
+    else:
+      args += output_args(profile, size=size, audio=audio)
+      # Keyframes at the boundaries, so the muxer can split right there.
+      args += ['-force_key_frames', f'expr:gte(t,n_forced*{length})'
+               if unit == 'secs' else f'expr:gte(n,n_forced*{length})']
+  if unit == 'frames':
+    boundaries = range(int(length), frames, int(length))
+    args += ['-segment_frames', ','.join(map(str, boundaries)) or frames]
+  else:
+    args += ['-segment_time', length]
+    if fps:
+      # Forced keyframes are rounded to the frames, see FFmpeg's docs on
+      # `segment_time_delta`.
+      args += ['-segment_time_delta', round(1 / (2 * fps), 6)]
+  return args + ['-f', 'segment', '-reset_timestamps', 1,
+                 '-segment_start_number', 0, '-segment_list_type', 'csv']
+
+
+def write_index(index: str, segments: List[Dict[str, Any]]) -> None:
+  """Write the segments as CSV, or JSON if the index ends with `.json`."""
+  partial = f'{index}.{os.getpid()}.tmp'
+  with open(partial, 'w', newline='') as file:
+    if index.lower().endswith('.json'):
+      json.dump(segments, file, indent=2)
+    else:
+      writer = csv.DictWriter(file, fieldnames=list(segments[0]) if segments
+                              else ['file', 'start', 'end', 'duration'])
+      writer.writeheader()
+      writer.writerows(segments)
+  os.replace(partial, index)
+
+
+def trim_segments(source: str,
+                  length: Union[float, int, str],
+                  copy: bool = False,
+                  profile: Optional[str] = None,
+                  audio: str = DEFAULT_AUDIO_MODE,
+                  index: Optional[str] = None) -> List[str]:
+  """Cut the video into segments of fixed length in a single pass.
+
+  Args:
+    source: Path of the video file.
+    length: Length of the segments like `60s`, `1.5m` or `250f` (frames).
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them. Segments then start at the first keyframe
+          at or after each boundary.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the segments.
+    index: Path (default: `segments.csv` in the output directory) of the
+           segment index; JSON if it ends with `.json`, else CSV.
+
+  Returns:
+    Paths of the segments.
+
+  Note:
+    Segments are written to a hidden directory first & moved next to
+    the other parts only once the whole video is segmented.
+  """
+  length, unit = parse_length(length)
+  copy = copy or is_copy(profile)
+  started = time.perf_counter()
+  usage = ProcessUsage()
+  info = probe(source)
+  args = segment_args(length, unit, info.fps, info.frames, copy, profile,
+                      audio, info.size)
+  create_directory(source)
+  directory = get_directory_name(source)
+  index = index or os.path.join(directory, INDEX)
+  name = get_file_name(source)
+  staging = tempfile.mkdtemp(prefix='.vdoxa-segments-', dir=directory)
+  try:
+    listing = os.path.join(staging, 'segments.csv')
+    run(['-v', 'error', '-y', '-i', source, *args, '-segment_list', listing,
+         os.path.join(staging, f'{name}_%d.mp4')])
+    with open(listing, 'r', newline='') as file:
+      rows = [row for row in csv.reader(file) if row]
+    # Muxer reports the times shifted by the decoding delay of the
+    # B-frames, hence the segments are laid end to end as per their
+    # probed durations instead.
+    segments, files, start = [], [], 0.0
+    for segment, *_ in rows:
+      file = os.path.join(directory, segment)
+      os.replace(os.path.join(staging, segment), file)
+      files.append(file)
+      media = probe(file, cache=False)
+      duration = ((media.video or {}).get('duration') or media.duration
+                  or 0.0)
+      segments.append({'file': segment, 'start': round(start, 6),
+                       'end': round(start + duration, 6),
+                       'duration': round(duration, 6)})
+      start += duration
+  finally:
+    shutil.rmtree(staging, ignore_errors=True)
+  write_index(index, segments)
+  # The segments are cut by a single FFmpeg process, it's time & bytes
+  # read are shared between them as per their durations.
+  elapsed = time.perf_counter() - started
+  total = sum(segment['duration'] for segment in segments) or 1.0
+  mode = 'audio' if audio == 'only' else 'copy' if copy else 'encode'
+  for file, segment in zip(files, segments):
+    metrics = PartMetrics(source, file, segment['start'], segment['end'],
+                          mode, usage)
+    metrics.share = segment['duration'] / total
+    share = elapsed * metrics.share
+    metrics.started -= share
+    metrics.add('encode' if mode == 'encode' else 'mux', share)
+    if audio != 'only' and info.fps:
+      metrics.frames = int(round(segment['duration'] * info.fps))
+    emit(metrics.finish(segment['duration']))
+  print(f'? Cut {source} into {len(files)} segments in {directory}. Index '
+        f'is written to {index}.')
+  return files
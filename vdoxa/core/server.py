@@ -0,0 +1,391 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for serving trim jobs from a pool of warm workers.
+
+`vdoxa serve` starts the worker processes once, imports MoviePy & looks
+up the FFmpeg binaries in each of them and then listens on a Unix socket
+(or a localhost TCP port). Clients send trim jobs as JSON lines and get
+back a stream of JSON lines for each job:
+
+  {"id": "1", "event": "accepted"}
+  {"id": "1", "event": "started", "worker": 4242}
+  {"id": "1", "event": "part", "metrics": {...}}
+  {"id": "1", "event": "done", "files": ["a/a_0.mp4"], "seconds": 0.41}
+
+A job fails with an `error` event instead of `done`, also when it's
+worker exits midway (killed or crashed), with the type `WorkerLost`.
+Jobs look like:
+
+  {"id": "1", "source": "a.mp4", "start": 0, "end": 30, "output": "a.mp4"}
+  {"source": "a.mp4", "ranges": [[0, 30], [60, 90]], "copy": true}
+  {"source": "a.mp4", "parts": 4, "audio": "copy", "profile": "fast"}
+  {"op": "ping"}
+
+Relative paths are resolved against the working directory of the
+server. Every connection may pipeline any number of jobs, the events of
+the jobs are interleaved as they happen. The connection is closed once the
+client has stopped sending and all it's jobs have finished.
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser('~'), '.cache', 'vdoxa',
+                              'vdoxa.sock')
+
+# Events queue shared with the workers & the job running in the worker.
+_events = None
+_job = None
+# Secs between the checks for the workers which have exited midway.
+_POLL = 0.5
+
+
+def _forward(record: Dict[str, Any]) -> None:
+  """Metrics hook forwarding the parts completed by the worker."""
+  _events.put((_job, {'event': 'part', 'metrics': record}))
+
+
+def _init_worker(events: multiprocessing.Queue, workers: int) -> None:
+  """Warm up the worker so that the jobs needn't wait for the imports."""
+  global _events
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  # Workers replacing the exited ones are forked after `serve` handles
+  # SIGTERM, they should still exit quietly when the pool terminates.
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  _events = events
+  from vdoxa.utils.memory import share
+  share(workers)
+  # Importing the trim module pulls in MoviePy, NumPy & imageio.
+  from vdoxa.core import trim  # noqa: F401
+  from vdoxa.utils.ffmpeg import ffmpeg_binary, ffprobe_binary
+  from vdoxa.utils.metrics import add_hook
+  ffmpeg_binary()
+  ffprobe_binary()
+  add_hook(_forward)
+
+
+def execute(job: Dict[str, Any]) -> List[str]:
+  """Run the trim job & return paths of the trimmed files.
+
+  Args:
+    job: Trim job with the `source` and either `start` & `end` (and
+         optionally `output`), `ranges` (and optionally `outputs`) or
+         `parts`. `copy`, `profile`, `audio` & `resume` are passed on
+         to the trim functions.
+
+  Raises:
+    ValueError: If the job is missing the source or the cuts.
+  """
+  from vdoxa.core.trim import trim_num_parts, trim_ranges
+  if 'source' not in job:
+    raise ValueError('Job is missing the source.')
+  options = {'copy': bool(job.get('copy', False)),
+             'profile': job.get('profile'),
+             'audio': job.get('audio', 'encode')}
+  # Workers are daemonic and can't have pools of their own, the jobs
+  # run in parallel across the workers instead.
+  if 'parts' in job:
+    return trim_num_parts(job['source'], int(job['parts']), jobs=1,
+                          **options)
+  if 'ranges' in job:
+    ranges, files = job['ranges'], job.get('outputs')
+  elif 'start' in job:
+    ranges = [(job['start'], job.get('end'))]
+    files = [job['output']] if job.get('output') else None
+  else:
+    raise ValueError('Job needs start & end, ranges or parts.')
+  ranges = [(float(start), None if end is None else float(end))
+            for start, end in ranges]
+  for file in files or []:
+    os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+  return trim_ranges(job['source'], ranges, files, jobs=1,
+                     resume=bool(job.get('resume', True)), **options)
+
+
+def _run(job_id: str, job: Dict[str, Any]) -> None:
+  """Run the job in the worker & report it's events in order."""
+  global _job
+  _job = job_id
+  started = time.perf_counter()
+  _events.put((job_id, {'event': 'started', 'worker': os.getpid()}))
+  try:
+    files = execute(job)
+  except Exception as error:
+    logger.debug('Job %s failed.', job_id, exc_info=True)
+    _events.put((job_id, {'event': 'error', 'error': str(error),
+                          'type': type(error).__name__}))
+  else:
+    _events.put((job_id, {'event': 'done', 'files': files,
+                          'seconds': round(time.perf_counter() - started,
+                                           4)}))
+  finally:
+    _job = None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+  """Reads the jobs of a connection & streams back their events."""
+
+  def handle(self) -> None:
+    events = queue.Queue()
+    writer = threading.Thread(target=self._write, args=(events,),
+                              daemon=True)
+    writer.start()
+    for line in self.rfile:
+      if not line.strip():
+        continue
+      try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+          raise ValueError('Job should be a JSON object.')
+      except ValueError as error:
+        events.put({'id': None, 'event': 'error', 'error': str(error),
+                    'type': 'ValueError'})
+        continue
+      self.server.submit(job, events)
+    events.put(None)
+    writer.join()
+
+  def _write(self, events: queue.Queue) -> None:
+    """Write events till the client is done & no job is pending."""
+    pending, eof, alive = set(), False, True
+    while not (eof and not pending):
+      event = events.get()
+      if event is None:
+        eof = True
+        continue
+      if event['event'] == 'accepted':
+        pending.add(event['id'])
+      elif event['event'] in ('done', 'error'):
+        pending.discard(event['id'])
+      if alive:
+        try:
+          self.wfile.write((json.dumps(event) + '\n').encode())
+          self.wfile.flush()
+        except OSError:
+          # Client went away, the jobs still run to completion.
+          alive = False
+
+
+class _ServerMixin(object):
+  """Routes the events reported by the workers to the connections."""
+
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def setup_pool(self, workers: int) -> None:
+    """Start the warm workers & the router of their events."""
+    self.ids = itertools.count(1)
+    self.routes = {}
+    self.workers = {}
+    self.lock = threading.Lock()
+    self.events = multiprocessing.Queue()
+    self.pool = multiprocessing.Pool(workers, _init_worker,
+                                     (self.events, workers))
+    self.router = threading.Thread(target=self._route, daemon=True)
+    self.router.start()
+
+  def submit(self, job: Dict[str, Any], events: queue.Queue) -> None:
+    """Dispatch the job to the pool."""
+    job_id = str(job.get('id') or f'job-{next(self.ids)}')
+    events.put({'id': job_id, 'event': 'accepted'})
+    if job.get('op') == 'ping':
+      events.put({'id': job_id, 'event': 'done', 'files': [],
+                  'seconds': 0.0})
+      return
+    if job.get('op', 'trim') != 'trim':
+      events.put({'id': job_id, 'event': 'error', 'type': 'ValueError',
+                  'error': f'Unknown op: {job["op"]}.'})
+      return
+    with self.lock:
+      if job_id in self.routes:
+        events.put({'id': job_id, 'event': 'error', 'type': 'ValueError',
+                    'error': f'Job {job_id} is already running.'})
+        return
+      self.routes[job_id] = events
+    logger.debug('Dispatching job %s: %s', job_id, job)
+    self.pool.apply_async(
+        _run, (job_id, job),
+        error_callback=lambda error: self._fail(job_id, str(error),
+                                                type(error).__name__))
+
+  def _route(self) -> None:
+    """Pass the events from the workers to their connections."""
+    checked = time.monotonic()
+    while True:
+      try:
+        job_id, event = self.events.get(timeout=_POLL)
+      except queue.Empty:
+        job_id = None
+      except (EOFError, OSError):
+        return
+      if job_id is not None:
+        with self.lock:
+          if event['event'] == 'started':
+            self.workers[job_id] = event['worker']
+          if event['event'] in ('done', 'error'):
+            self.workers.pop(job_id, None)
+            events = self.routes.pop(job_id, None)
+          else:
+            events = self.routes.get(job_id)
+        if events is not None:
+          events.put(dict(event, id=job_id))
+      if time.monotonic() - checked >= _POLL:
+        self._reap()
+        checked = time.monotonic()
+
+  def _reap(self) -> None:
+    """Fail the started jobs whose worker has exited midway.
+
+    Pool replaces the exited worker but drops it's job silently, which
+    would otherwise keep the connection waiting forever.
+    """
+    alive = {process.pid for process in multiprocessing.active_children()}
+    with self.lock:
+      lost = [(job_id, pid) for job_id, pid in self.workers.items()
+              if pid not in alive]
+    for job_id, pid in lost:
+      logger.warning('Worker %s exited while running job %s.', pid, job_id)
+      self._fail(job_id, f'Worker {pid} exited while running the job.',
+                 'WorkerLost')
+
+  def _fail(self, job_id: str, error: str, kind: str) -> None:
+    """Report the job as failed & stop routing it's events."""
+    with self.lock:
+      self.workers.pop(job_id, None)
+      events = self.routes.pop(job_id, None)
+    if events is not None:
+      events.put({'id': job_id, 'event': 'error', 'error': error,
+                  'type': kind})
+
+  def close_pool(self) -> None:
+    """Stop the workers, abandoning the running jobs."""
+    self.pool.terminate()
+    self.pool.join()
+
+
+class TCPServer(_ServerMixin, socketserver.ThreadingTCPServer):
+  """Trim server listening on a localhost TCP port."""
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+  class UnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+    """Trim server listening on a Unix socket."""
+else:
+  UnixServer = None
+
+
+def serve(path: Optional[str] = None,
+          port: Optional[int] = None,
+          workers: Optional[int] = None) -> None:
+  """Serve the trim jobs till interrupted.
+
+  Args:
+    path: Path (default: `~/.cache/vdoxa/vdoxa.sock`) of the Unix
+          socket to listen on.
+    port: Localhost TCP port (default: None) to listen on instead of
+          the Unix socket.
+    workers: Number of warm worker processes (default: number of CPUs).
+
+  Note:
+    The TCP server binds only to 127.0.0.1, it has no authentication &
+    must not be exposed to the network.
+  """
+  workers = workers or os.cpu_count() or 1
+  if port is not None or UnixServer is None:
+    path = None
+    server = TCPServer(('127.0.0.1', port or 0), _Handler, False)
+  else:
+    path = path or DEFAULT_SOCKET
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+      os.remove(path)
+    server = UnixServer(path, _Handler, False)
+  # Workers are forked before listening, so they don't hold the socket.
+  server.setup_pool(workers)
+  try:
+    server.server_bind()
+    server.server_activate()
+  except OSError:
+    server.server_close()
+    server.close_pool()
+    raise
+  address = (path if path is not None else
+             '{}:{}'.format(*server.server_address))
+
+  def stop(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
+
+  # Service managers stop the server with SIGTERM, handled like Ctrl+C.
+  signal.signal(signal.SIGTERM, stop)
+  print(f'? Serving trim jobs on {address} with {workers} workers. Press '
+        'Ctrl+C to stop.', flush=True)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    print('\n? Stopping the server.')
+  finally:
+    server.server_close()
+    server.close_pool()
+    if path is not None and os.path.exists(path):
+      os.remove(path)
+
+
+def submit(jobs: List[Dict[str, Any]],
+           path: Optional[str] = None,
+           port: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+  """Send the jobs to a running server & yield their events.
+
+  Args:
+    jobs: Trim jobs to be run.
+    path: Path (default: `~/.cache/vdoxa/vdoxa.sock`) of the Unix socket
+          of the server.
+    port: Localhost TCP port (default: None) of the server instead of
+          the Unix socket.
+
+  Example:
+    >>> from vdoxa.core.server import submit
+    >>> for event in submit([{'source': 'demo.mp4', 'start': 0, 'end': 5}]):
+    ...   print(event['event'])
+
+    accepted
+    started
+    part
+    done
+  """
+  if port is not None:
+    client = socket.create_connection(('127.0.0.1', port))
+  else:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path or DEFAULT_SOCKET)
+  with client, client.makefile('rb') as reader:
+    client.sendall(b''.join(json.dumps(job).encode() + b'\n'
+                            for job in jobs))
+    client.shutdown(socket.SHUT_WR)
+    for line in reader:
+      yield json.loads(line)
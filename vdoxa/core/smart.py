@@ -0,0 +1,244 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for frame accurate cuts without re-encoding the range.
+
+Copying packets is only possible from a keyframe onwards & re-encoding
+the whole range costs as much as it's length. A smart cut does both:
+
+  1. The partial GOP from the start to the first keyframe in the range
+     is re-encoded.
+  2. Whole GOPs from there to the last keyframe in the range are copied
+     as they are.
+  3. The partial GOP from the last keyframe to the end is re-encoded.
+
+The re-encoded pieces use the codec, profile & pixel format of the
+source, so the pieces are joined by FFmpeg's concat demuxer which puts
+the parameter sets of every piece in-band. Hence the cost of a cut
+depends on the number of cuts (at most two GOPs each) rather than on
+the length of the content.
+
+Note:
+  Only H.264 sources are spliced, other codecs have the whole range
+  re-encoded by FFmpeg.
+"""
+
+import logging
+import math
+import os
+from contextlib import contextmanager
+from typing import (Any, Dict, Iterator, List, Optional, Sequence, Tuple,
+                    Union)
+
+from vdoxa.core.join import ENCODER_PROFILES
+from vdoxa.probe import MediaInfo, probe
+from vdoxa.utils import memory
+from vdoxa.utils.encoding import get_profile
+from vdoxa.utils.ffmpeg import (concat_copy, mux_audio, run, smart_ranges,
+                                stream_copy)
+from vdoxa.utils.file_ops import atomic_output, temporary
+from vdoxa.utils.index import keyframe_index
+from vdoxa.utils.metrics import PartMetrics
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+logger = logging.getLogger(__name__)
+
+# Codecs whose parameter sets the concat demuxer moves in-band, so that
+# re-encoded & copied pieces can be spliced.
+SPLICEABLE = ('h264',)
+
+
+def encoder_args(info: MediaInfo,
+                 profile: Optional[str] = None,
+                 threads: Optional[int] = None) -> List[Any]:
+  """Return FFmpeg arguments encoding video the way the source is.
+
+  Args:
+    info: Metadata of the source.
+    profile: Name of the encoding profile (default: smart) used for the
+             preset & quality.
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+  """
+  settings = get_profile(profile or 'smart')
+  video = info.video
+  if video['codec'] not in SPLICEABLE:
+    # Nothing to splice with, so the profile decides the encoding.
+    codec = settings['codec'] or 'libx264'
+    args = ['-c:v', codec]
+    args += ['-pix_fmt', settings['pixel_format']] if (
+        settings['pixel_format']) else []
+  else:
+    codec = 'libx264'
+    args = ['-c:v', codec]
+    if video['profile'] in ENCODER_PROFILES:
+      args += ['-profile:v', ENCODER_PROFILES[video['profile']]]
+    args += ['-pix_fmt', video['pix_fmt']] if video['pix_fmt'] else []
+  args += ['-preset', settings['preset']] if settings['preset'] else []
+  args += ['-crf', settings['crf']] if settings['crf'] is not None else []
+  threads = memory.encoder_threads(threads or settings['threads'], info.size)
+  args += ['-threads', threads] if threads else []
+  if codec == 'libx264':
+    args += memory.encoder_params(threads, info.size)
+  return args
+
+
+def encode_range(source: str,
+                 file: str,
+                 start: Union[float, int],
+                 end: Optional[Union[float, int]],
+                 args: Sequence[Any]) -> None:
+  """Re-encode the video (without audio) between start and end.
+
+  FFmpeg decodes from the keyframe before the start & drops the frames
+  ahead of it, so the piece starts at the exact frame.
+  """
+  cmd = ['-v', 'error', '-y', '-ss', start, '-i', source]
+  cmd += [] if end is None else ['-t', round(end - start, 6)]
+  run(cmd + ['-map', '0:v:0', '-an', *args, file])
+
+
+def plan(info: MediaInfo,
+         key_frames: Sequence[float],
+         start: Union[float, int] = 0,
+         end: Optional[Union[float, int]] = None
+         ) -> Tuple[float, Optional[float], List[Tuple[str, float,
+                                                      Optional[float]]]]:
+  """Return frame aligned start & end and the pieces of the range.
+
+  Args:
+    info: Metadata of the source.
+    key_frames: Keyframe timestamps of the source.
+    start: Starting point (default: 0) in secs.
+    end: Ending point (default: None, till the end) in secs.
+  """
+  fps = info.fps or 25.0
+  # FFmpeg keeps the frame on screen at the start, the previous part has
+  # it already as it ends at the frame before the end.
+  start = round(math.ceil(start * fps - 1e-3) / fps, 6)
+  if end is not None and info.duration and end >= info.duration:
+    end = None
+  if info.codec in SPLICEABLE:
+    return start, end, smart_ranges(key_frames, start, end, 0.5 / fps)
+  logger.debug('%s can\'t be spliced, re-encoding the whole range.',
+               info.codec)
+  return start, end, [('encode', start, end)]
+
+
+@contextmanager
+def written_pieces(source: str,
+                   file: str,
+                   info: MediaInfo,
+                   pieces: Sequence[Tuple[str, float, Optional[float]]],
+                   metrics: PartMetrics,
+                   threads: Optional[int] = None,
+                   profile: Optional[str] = None) -> Iterator[List[str]]:
+  """Write the (video only) pieces next to the file & yield their paths.
+
+  Pieces are removed once the block exits.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the output the pieces are named after.
+    info: Metadata of the source.
+    pieces: Pieces of the range as planned by `plan`.
+    metrics: Metrics of the part, the time spent is added to it.
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    profile: Name of the encoding profile (default: smart).
+  """
+  args = encoder_args(info, profile, threads)
+  temps = [temporary(file, f'piece{idx}') for idx in range(len(pieces))]
+  try:
+    for temp, (mode, _start, _end) in zip(temps, pieces):
+      if mode == 'encode':
+        with metrics.phase('encode'):
+          encode_range(source, temp, _start, _end, args)
+      else:
+        with metrics.phase('mux'):
+          stream_copy(source, temp, _start, _end, 'drop', info.delay)
+    yield temps
+  finally:
+    for temp in temps:
+      if os.path.isfile(temp):
+        os.remove(temp)
+
+
+def encoded_secs(pieces: Sequence[Tuple[str, float, Optional[float]]],
+                 start: float,
+                 duration: float) -> float:
+  """Return secs of the range which are re-encoded."""
+  return sum((_end if _end is not None else start + duration) - _start
+             for mode, _start, _end in pieces if mode == 'encode')
+
+
+def trim_smart(source: str,
+               file: str,
+               start: Union[float, int] = 0,
+               end: Optional[Union[float, int]] = None,
+               key_frames: Optional[Sequence[float]] = None,
+               threads: Optional[int] = None,
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE) -> Dict[str, Any]:
+  """Cut the range at exact frames re-encoding only the partial GOPs.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the trimmed video file.
+    start: Starting point (default: 0) in secs.
+    end: Ending point (default: None, till the end) in secs.
+    key_frames: Keyframe timestamps (default: None) of the source, read
+                from the keyframe index if not provided.
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    profile: Name of the encoding profile (default: smart).
+    audio: Audio mode (default: encode); `drop` removes the audio,
+           otherwise the audio packets of the range are remuxed unless
+           the profile sets an audio codec.
+
+  Returns:
+    Metrics record of the trimmed video.
+  """
+  metrics = PartMetrics(source, file, start, end, 'smart')
+  with metrics.phase('probe'):
+    info = probe(source)
+    if key_frames is None:
+      key_frames = keyframe_index(source).times
+  start, end, pieces = plan(info, key_frames, start, end)
+  metrics.start, metrics.end = start, end
+  settings = get_profile(profile or 'smart')
+  joined = temporary(file, 'joined')
+  try:
+    with written_pieces(source, file, info, pieces, metrics, threads,
+                        profile) as temps:
+      with metrics.phase('mux'), atomic_output(file) as partial:
+        if audio == 'drop' or info.audio is None:
+          concat_copy(temps, partial)
+        else:
+          concat_copy(temps, joined)
+          codec = settings['audio_codec'] if audio == 'encode' else None
+          mux_audio(joined, source, partial, start, end, codec,
+                    settings['audio_bitrate'] if codec else None)
+  finally:
+    if os.path.isfile(joined):
+      os.remove(joined)
+  duration = (end if end is not None else info.duration or start) - start
+  encoded = encoded_secs(pieces, start, duration)
+  metrics.frames = int(round(duration * (info.fps or 25.0)))
+  print(f'? Cut {file} from {start} to {end or "the end"} secs, '
+        f're-encoding {round(encoded, 3)} secs & copying '
+        f'{round(duration - encoded, 3)} secs.')
+  return metrics.finish(duration)
@@ -0,0 +1,157 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for splitting the video in a single decoding pass."""
+
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from moviepy.editor import VideoFileClip
+from moviepy.tools import find_extension
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from vdoxa.utils.encoding import get_profile, writer_params
+from vdoxa.utils.ffmpeg import mux_audio
+from vdoxa.utils.file_ops import temporary
+from vdoxa.utils.metrics import PartMetrics, emit
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+
+def _write_audio(clip: VideoFileClip,
+                 file: str,
+                 start: float,
+                 end: float,
+                 profile: Optional[str] = None) -> Optional[str]:
+  """Write audio of the part and return path of the temporary file."""
+  settings = get_profile(profile)
+  if clip.audio is None or not settings['audio']:
+    return None
+  codec = settings['audio_codec'] or 'libmp3lame'
+  name, _ = os.path.splitext(file)
+  audio = f'{name}TEMP_MPY_wvf_snd.{find_extension(codec)}'
+  clip.audio.subclip(start, min(end, clip.duration)).write_audiofile(
+      audio, codec=codec, bitrate=settings['audio_bitrate'], logger=None)
+  return audio
+
+
+def split_clip(clip: VideoFileClip,
+               ranges: Sequence[Tuple[float, float]],
+               files: Sequence[str],
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE,
+               probe: float = 0.0,
+               callback: Callable[[Dict[str, Any]], None] = emit) -> None:
+  """Split the clip into parts by decoding it only once.
+
+  Frames are decoded in order and sent to the encoder of the part
+  they belong to. Once a frame crosses the end of the current part,
+  it's encoder is closed & the next output file is opened when the
+  next part starts. Frames outside of all the parts are dropped. Hence,
+  the source is read once irrespective of the number of parts.
+
+  Args:
+    clip: VideoFileClip object of the source video.
+    ranges: Sorted & non-overlapping (start, end) timestamps (in secs)
+            of the parts.
+    files: Paths of the output files, one per part.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode). With `copy`, every part is
+           encoded silently & the source audio packets are muxed into
+           it once it's closed, `drop` writes video only parts.
+    probe: Time (default: 0.0) in secs spent opening the clip, recorded
+           in the metrics of the first part.
+    callback: Function (default: emit) called with the metrics record
+              of every part once it's completely written.
+
+  Note:
+    Decoding starts by seeking to the first part, frames dropped before
+    the other parts are recorded as their seek phase. Parts are written
+    under temporary names & renamed once complete, a part interrupted
+    midway is removed.
+  """
+  if len(ranges) != len(files):
+    raise ValueError('Number of ranges should be same as the number of '
+                     'files.')
+  if not ranges:
+    return
+  params = writer_params(profile, size=clip.size)
+  idx, writer, audiofile, silent, metrics = -1, None, None, None, None
+  partial = None
+  skipped = 0.0
+
+  def close(complete: bool = True) -> None:
+    nonlocal writer, audiofile, silent, metrics, partial
+    if writer is not None:
+      with metrics.phase('encode'):
+        writer.close()
+      if complete:
+        if silent is not None:
+          with metrics.phase('mux'):
+            mux_audio(silent, clip.filename, partial, *ranges[idx])
+        os.replace(partial, files[idx])
+        print(f'Completed trimming {files[idx]}.', end='\r')
+        start, end = ranges[idx]
+        callback(metrics.finish(min(end, clip.duration) - start))
+    for temp in (audiofile, silent, partial):
+      if temp is not None and os.path.isfile(temp):
+        os.remove(temp)
+    writer, audiofile, silent, metrics, partial = None, None, None, None, None
+
+  # Frames before the first part aren't decoded at all.
+  offset = ranges[0][0]
+  frames = (clip.subclip(offset) if offset > 0 else clip).iter_frames(
+      with_times=True, dtype='uint8')
+  try:
+    decoded = time.perf_counter()
+    for timestamp, frame in frames:
+      timestamp += offset
+      elapsed = time.perf_counter() - decoded
+      # Roll over to the next part(s) once it starts.
+      while idx < len(files) - 1 and timestamp >= ranges[idx + 1][0]:
+        close()
+        idx += 1
+        start, end = ranges[idx]
+        metrics = PartMetrics(clip.filename, files[idx], start, end, 'encode')
+        metrics.add('probe', probe if idx == 0 else 0.0)
+        metrics.add('seek', skipped)
+        skipped = 0.0
+        partial = temporary(files[idx], 'partial')
+        with metrics.phase('encode'):
+          if audio == 'encode':
+            audiofile = _write_audio(clip, files[idx], start, end, profile)
+          elif audio == 'copy':
+            silent = temporary(files[idx], 'silent')
+          writer = FFMPEG_VideoWriter(silent or partial, clip.size,
+                                      clip.fps, audiofile=audiofile, **params)
+      if writer is not None and timestamp >= ranges[idx][1]:
+        close()
+        if idx == len(files) - 1:
+          break
+      if writer is not None:
+        metrics.add('decode', elapsed)
+        started = time.perf_counter()
+        writer.write_frame(frame)
+        metrics.add('encode', time.perf_counter() - started)
+        metrics.frames += 1
+      else:
+        skipped += elapsed
+      decoded = time.perf_counter()
+  except BaseException:
+    close(complete=False)
+    raise
+  # Last part may run till the end of the video.
+  close()
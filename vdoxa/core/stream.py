@@ -0,0 +1,219 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Core utility for streaming trims to pipes & file-like objects.
+
+Trims are otherwise written to a path & renamed once complete, so a
+program uploading them has to read them back from the disk. Here the
+cut is written by FFmpeg to a pipe & passed on to the target (standard
+output or any writable binary file-like object) as it's written.
+
+Containers which need seeking back once complete can't be written this
+way, hence the cut is muxed as either:
+
+  * `mp4`, fragmented MP4 with an empty `moov` up front & a fragment
+    per keyframe; playable by browsers (MSE) & most players.
+  * `mpegts`, MPEG-TS which needs no header at all.
+
+Copy, encode & audio only cuts never touch the disk. Smart cuts still
+write the re-encoded & copied pieces (and the audio) to a scratch
+directory, only the splice of the pieces is streamed.
+
+Example:
+  >>> import io
+  >>> from vdoxa.core.stream import trim_stream
+  >>> buffer = io.BytesIO()
+  >>> trim_stream('videos/demo.mp4', buffer, 10, 20, copy=True)['mode']
+
+  'copy'
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from vdoxa.core.smart import encoded_secs, plan, written_pieces
+from vdoxa.probe import probe
+from vdoxa.utils.encoding import get_profile, is_copy, is_smart, output_args
+from vdoxa.utils.ffmpeg import (concat_listing, copy_args, run, run_to,
+                                snapped_range)
+from vdoxa.utils.index import keyframe_index
+from vdoxa.utils.metrics import PartMetrics, emit
+from vdoxa.vars.profiles import (DEFAULT_AUDIO_MODE, DEFAULT_STREAM_FORMAT,
+                                 STREAM_FORMATS)
+
+# Muxer arguments of the stream formats. Fragments start at keyframes &
+# carry their own base offsets, so they're playable as they arrive.
+MUXERS = {
+  'mp4': ['-f', 'mp4', '-movflags',
+          'frag_keyframe+empty_moov+default_base_moof'],
+  'mpegts': ['-f', 'mpegts'],
+}
+
+
+# Seeking the input lands on the keyframe before the start, the copied
+# audio packets ahead of the start are hidden by an edit list in a regular
+# MP4. Fragments & MPEG-TS have no such thing, so the packets are dropped.
+# Output seeking applies to every stream, so it's used on audio only ones.
+_DROP_PREROLL = ['-ss', 0]
+
+
+def _say(message: str) -> None:
+  """Print message on standard error, standard output may be the cut."""
+  print(message, file=sys.stderr, flush=True)
+
+
+@contextmanager
+def _opened(target: Union[str, BinaryIO]) -> Iterator[Tuple[BinaryIO, str]]:
+  """Yield the writable target & it's name for the metrics."""
+  if target == '-':
+    yield sys.stdout.buffer, '<stdout>'
+    sys.stdout.buffer.flush()
+  elif isinstance(target, str):
+    # Written in place rather than renamed, so named pipes work too.
+    with open(target, 'wb') as file:
+      yield file, target
+  else:
+    yield target, str(getattr(target, 'name', '<stream>'))
+
+
+def _splice_args(listing: str,
+                 audio: Optional[str] = None,
+                 codec: Optional[str] = None,
+                 bitrate: Optional[str] = None) -> List[Any]:
+  """Return FFmpeg arguments splicing the pieces with the audio piece."""
+  args = ['-v', 'error', '-f', 'concat', '-safe', 0, '-i', listing]
+  if audio is None:
+    return args + ['-map', '0:v', '-c', 'copy']
+  args += ['-i', audio, '-map', '0:v', '-map', '1:a', '-c:v', 'copy']
+  if codec is None:
+    return args + ['-c:a', 'copy']
+  return args + ['-c:a', codec] + (['-b:a', bitrate] if bitrate else [])
+
+
+def trim_stream(source: str,
+                target: Union[str, BinaryIO] = '-',
+                start: Union[float, int] = 0,
+                end: Optional[Union[float, int]] = None,
+                copy: bool = False,
+                profile: Optional[str] = None,
+                audio: str = DEFAULT_AUDIO_MODE,
+                format: str = DEFAULT_STREAM_FORMAT,
+                threads: Optional[int] = None) -> Dict[str, Any]:
+  """Trim video & stream the cut to the target.
+
+  Args:
+    source: Path of the video file.
+    target: Writable binary file-like object, `-` (default) for standard
+            output or path of the file (or named pipe) to write to.
+    start: Starting point (default: 0) in secs.
+    end: Ending point (default: None, till the end) in secs.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them; start & end are snapped to the keyframes.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the cut.
+    format: Container (default: mp4) of the stream, `mp4` (fragmented)
+            or `mpegts`.
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+
+  Returns:
+    Metrics record of the cut, also emitted to the metrics hooks.
+
+  Raises:
+    ValueError: If the format isn't supported.
+    RuntimeError: If FFmpeg fails, the target may have part of the cut
+                  written to it.
+  """
+  if format not in STREAM_FORMATS:
+    raise ValueError(f'Unsupported stream format: {format}, use one of '
+                     f'{", ".join(STREAM_FORMATS)}.')
+  muxer = MUXERS[format] + ['pipe:1']
+  # Duration of the cut, unknown for the cuts till the end.
+  duration = None
+  with _opened(target) as (output, name):
+    if audio == 'only':
+      metrics = PartMetrics(source, name, start, end, 'audio')
+      with metrics.phase('mux'):
+        metrics.written = run_to(copy_args(source, start, end, audio) +
+                                 _DROP_PREROLL + muxer, output)
+      _say(f'? Streamed audio of {source} from {start} to '
+           f'{end or "the end"} secs to {name}.')
+    elif copy or is_copy(profile):
+      metrics = PartMetrics(source, name, start, end, 'copy')
+      with metrics.phase('probe'):
+        key_frames = keyframe_index(source).times
+        delay = probe(source).delay
+      with metrics.phase('seek'):
+        start, end = snapped_range(key_frames, start, end)
+      with metrics.phase('mux'):
+        metrics.written = run_to(copy_args(source, start, end, audio,
+                                           delay) + muxer, output)
+      metrics.start, metrics.end = start, end
+      _say(f'? Streamed {source} from {start} to {end or "the end"} secs '
+           f'(snapped to keyframes) to {name}.')
+    elif is_smart(profile):
+      metrics = PartMetrics(source, name, start, end, 'smart')
+      with metrics.phase('probe'):
+        info = probe(source)
+        key_frames = keyframe_index(source).times
+      start, end, pieces = plan(info, key_frames, start, end)
+      settings = get_profile(profile or 'smart')
+      codec = settings['audio_codec'] if audio == 'encode' else None
+      with tempfile.TemporaryDirectory(prefix='vdoxa-stream-') as scratch:
+        hint = os.path.join(scratch, os.path.basename(source))
+        with written_pieces(source, hint, info, pieces, metrics, threads,
+                            profile) as temps:
+          with concat_listing(temps, hint) as listing, metrics.phase('mux'):
+            sound = None
+            if audio != 'drop' and info.audio is not None:
+              sound = os.path.join(scratch, 'audio.mp4')
+              run(copy_args(source, start, end, 'only') + _DROP_PREROLL +
+                  [sound])
+            metrics.written = run_to(_splice_args(
+                listing, sound, codec,
+                settings['audio_bitrate'] if codec else None) + muxer, output)
+      metrics.start, metrics.end = start, end
+      total = info.duration
+      duration = (end if end is not None else total or start) - start
+      encoded = encoded_secs(pieces, start, duration)
+      metrics.frames = int(round(duration * (info.fps or 25.0)))
+      _say(f'? Streamed {source} from {start} to {end or "the end"} secs '
+           f'to {name}, re-encoding {round(encoded, 3)} secs & copying '
+           f'{round(duration - encoded, 3)} secs.')
+    else:
+      metrics = PartMetrics(source, name, start, end, 'encode')
+      with metrics.phase('probe'):
+        info = probe(source)
+      args = ['-v', 'error', '-ss', start, '-i', source]
+      args += [] if end is None else ['-t', round(end - start, 6)]
+      args += ['-map', '0:v:0']
+      args += [] if audio == 'drop' else ['-map', '0:a?']
+      args += output_args(profile, threads, info.size, audio)
+      with metrics.phase('encode'):
+        metrics.written = run_to(args + muxer, output)
+      total = info.duration
+      _end = total if end is None else min(end, total or end)
+      if _end is not None:
+        duration = _end - start
+        metrics.frames = int(round(duration * (info.fps or 25.0)))
+      _say(f'? Streamed {source} from {start} to {end or "the end"} secs '
+           f'to {name}.')
+  record = metrics.finish(duration)
+  emit(record)
+  return record
@@ -17,25 +17,242 @@
 """Core utility for trimming the video."""
 
 import os
-import random
+import time
+from collections import OrderedDict
 from datetime import timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from moviepy.editor import VideoFileClip as vfc
 
+from vdoxa.core.parallel import encoder_threads, run_in_pool
+from vdoxa.core.smart import trim_smart
+from vdoxa.core.split import split_clip
+from vdoxa.probe import get_duration, probe as probe_media
+from vdoxa.utils import memory
 from vdoxa.utils.common import now
-from vdoxa.utils.file_ops import filename
+from vdoxa.utils.encoding import (get_profile, is_copy, is_smart,
+                                  trim_settings, videofile_params)
+from vdoxa.utils.ffmpeg import (chunk_ranges, concat_copy, mux_audio,
+                                snapped_range, stream_copy)
+from vdoxa.utils.file_ops import (atomic_output, filename, next_filename,
+                                  temporary)
+from vdoxa.utils.index import keyframe_index
+from vdoxa.utils.journal import Ledger
+from vdoxa.utils.metrics import PartMetrics, emit
 from vdoxa.utils.options import ask_numbers, confirm
 from vdoxa.vars.cmd import TRIM_END, TRIM_START
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE
+
+
+def write_subclip(clip: vfc,
+                  file: str,
+                  start: Union[float, int],
+                  end: Optional[Union[float, int]],
+                  params: Dict[str, Any],
+                  audio: str = DEFAULT_AUDIO_MODE,
+                  metrics: Optional[PartMetrics] = None) -> None:
+  """Encode portion of the clip handling the audio as per the mode.
+
+  Args:
+    clip: Already opened clip of the source video.
+    file: Path of the trimmed video file.
+    start: Starting point in secs.
+    end: Ending point in secs; None till the end.
+    params: Keyword arguments for MoviePy's `write_videofile`.
+    audio: Audio mode (default: encode); `copy` encodes a silent video
+           and muxes the source audio packets into it, `drop` writes
+           a video only file.
+    metrics: Metrics (default: None) of the part to record the phases.
+
+  Note:
+    MoviePy decodes & encodes the frames in the same loop, hence both
+    are recorded as the encode phase. The file only appears once it's
+    completely written.
+  """
+  metrics = metrics or PartMetrics(clip.filename, file, start, end, 'encode')
+  subclip = clip.subclip(start, end)
+  metrics.frames = int(round(subclip.duration * clip.fps))
+  with atomic_output(file) as partial:
+    if audio != 'copy':
+      with metrics.phase('encode'):
+        subclip.write_videofile(partial, **dict(params, audio=(
+            params.get('audio', True) and audio == 'encode')))
+      return
+    silent = temporary(file, 'silent')
+    try:
+      with metrics.phase('encode'):
+        subclip.write_videofile(silent, **dict(params, audio=False))
+      with metrics.phase('mux'):
+        mux_audio(silent, clip.filename, partial, start, end)
+    finally:
+      if os.path.isfile(silent):
+        os.remove(silent)
 
 
 def trim_video(source: Any,
                file: str,
                start: Optional[Union[float, int]] = 0,
-               end: Optional[Union[float, int]] = 30) -> None:
-  """Trim video."""
-  trimmed_video = vfc(source, verbose=True).subclip(start, end)
-  trimmed_video.write_videofile(file, codec='libx264')
+               end: Optional[Union[float, int]] = 30,
+               copy: Optional[bool] = False,
+               key_frames: Optional[Sequence[float]] = None,
+               threads: Optional[int] = None,
+               profile: Optional[str] = None,
+               audio: str = DEFAULT_AUDIO_MODE,
+               clip: Optional[vfc] = None) -> Dict[str, Any]:
+  """Trim video.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the trimmed video file.
+    start: Starting point (default: 0) in secs.
+    end: Ending point (default: 30) in secs; None till the end.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    key_frames: Keyframe timestamps (default: None) of the source. These
+                are read from the keyframe index if not provided while
+                copying.
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    profile: Name of the encoding profile (default: default). The
+             `copy` profile is same as setting copy to True & the `smart`
+             profile cuts at exact frames re-encoding only the partial
+             GOPs at the ends (see `vdoxa.core.smart`).
+    audio: Audio mode (default: encode); `copy` remuxes the audio
+           packets, `drop` removes the audio & `only` extracts just the
+           audio packets without touching the video.
+    clip: Already opened clip (default: None) of the source to encode
+          from, left open for the next part. Opened (& closed) here if
+          not provided & the part is encoded.
+
+  Returns:
+    Metrics record of the trimmed video. It isn't emitted to the hooks
+    as this may run in a worker process.
+
+  Note:
+    Packets can only be copied from a keyframe onwards, hence in copy
+    mode both the start and end are snapped to the nearest keyframe at
+    or before them. Audio only extracts are not snapped. Outputs are
+    written under a temporary name & renamed once complete.
+  """
+  if audio == 'only':
+    metrics = PartMetrics(source, file, start, end, 'audio')
+    with metrics.phase('mux'), atomic_output(file) as partial:
+      stream_copy(source, partial, start, end, audio)
+    print(f'? Extracted audio of {file} from {start} to {end or "the end"} '
+          'secs.')
+    return metrics.finish()
+  if copy or is_copy(profile):
+    metrics = PartMetrics(source, file, start, end, 'copy')
+    with metrics.phase('probe'):
+      if key_frames is None:
+        key_frames = keyframe_index(source).times
+      delay = probe_media(source).delay
+    with metrics.phase('seek'):
+      _start, _end = snapped_range(key_frames, start, end)
+    with metrics.phase('mux'), atomic_output(file) as partial:
+      stream_copy(source, partial, _start, _end, audio, delay)
+    moved = 0 if end is None else round(end - _end, 3)
+    print(f'? Copied {file} from {_start} to {_end or "the end"} secs (start '
+          f'moved by {round(start - _start, 3)} secs, end moved by {moved} '
+          f'secs to snap to keyframes).')
+    metrics.start, metrics.end = _start, _end
+    return metrics.finish()
+  if is_smart(profile):
+    return trim_smart(source, file, start, end, key_frames, threads, profile,
+                      audio)
+  metrics = PartMetrics(source, file, start, end, 'encode')
+  opened = clip is None
+  if opened:
+    # Audio is read by MoviePy only if it needs to be re-encoded.
+    with metrics.phase('probe'):
+      clip = vfc(source, verbose=True, audio=audio == 'encode',
+                 **memory.clip_params())
+  try:
+    end = None if end is None else min(end, clip.duration)
+    write_subclip(clip, file, start, end,
+                  videofile_params(profile, threads, clip.size), audio,
+                  metrics)
+    duration = clip.duration if end is None else end
+    return metrics.finish(duration - start)
+  finally:
+    if opened:
+      clip.close()
+
+
+def decodes(copy: bool,
+            profile: Optional[str],
+            audio: str) -> bool:
+  """Return True if the parts are decoded & encoded by MoviePy."""
+  return not (copy or is_copy(profile) or is_smart(profile) or
+              audio == 'only')
+
+
+def trim_chunked(source: str,
+                 file: str,
+                 start: Union[float, int] = 0,
+                 end: Optional[Union[float, int]] = None,
+                 jobs: int = 2,
+                 profile: Optional[str] = None,
+                 audio: str = DEFAULT_AUDIO_MODE) -> Dict[str, Any]:
+  """Encode a single long part in parallel chunks.
+
+  The range is divided into keyframe aligned chunks which are encoded
+  (without audio) by a pool of workers & then joined losslessly using
+  the concat demuxer. The audio of the whole range is muxed in at the
+  end, so there are no gaps or clicks at the joins.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the trimmed video file.
+    start: Starting point (default: 0) in secs.
+    end: Ending point (default: None, till the end) in secs.
+    jobs: Number of chunks (default: 2) to be encoded in parallel.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the part, except `only`.
+
+  Returns:
+    Metrics record of the trimmed video.
+
+  Note:
+    Ranges too short to be worth splitting (see `chunk_ranges`) are
+    encoded by `trim_video` as a single part.
+  """
+  metrics = PartMetrics(source, file, start, end, 'encode')
+  with metrics.phase('probe'):
+    total = get_duration(source)
+    _end = total if end is None else min(end, total)
+    if memory.budget() is not None:
+      jobs = memory.jobs_within(jobs, probe_media(source).size)
+    chunks = chunk_ranges(keyframe_index(source).times, start, _end, jobs)
+  if len(chunks) < 2:
+    return trim_video(source, file, start, end, profile=profile, audio=audio)
+  temps = [temporary(file, f'chunk{idx}') for idx in range(len(chunks))]
+  tasks = [(source, temp, _start, _stop, False, None, encoder_threads(jobs),
+            profile, 'drop') for temp, (_start, _stop) in zip(temps, chunks)]
+  settings = get_profile(profile)
+  try:
+    with metrics.phase('encode'):
+      records = run_in_pool(trim_video, tasks, jobs)
+    metrics.frames = sum(record['frames'] for record in records)
+    with metrics.phase('mux'), atomic_output(file) as partial:
+      if audio == 'drop' or (audio == 'encode' and not settings['audio']):
+        concat_copy(temps[:len(chunks)], partial)
+      else:
+        temps.append(temporary(file, 'joined'))
+        concat_copy(temps[:len(chunks)], temps[-1])
+        if audio == 'copy':
+          mux_audio(temps[-1], source, partial, start, _end)
+        else:
+          mux_audio(temps[-1], source, partial, start, _end,
+                    settings['audio_codec'] or 'libmp3lame',
+                    settings['audio_bitrate'])
+  finally:
+    for temp in temps:
+      if os.path.isfile(temp):
+        os.remove(temp)
+  print(f'Completed trimming {file} in {len(chunks)} chunks using {jobs} '
+        'jobs.')
+  return metrics.finish(_end - start)
 
 
 def delta(value: Union[float, int], factor: str) -> timedelta:
@@ -46,10 +263,19 @@ def delta(value: Union[float, int], factor: str) -> timedelta:
     return timedelta(seconds=value)
 
 
-def trim_by(source: Any, factor: str = 'mins') -> None:
-  """Trim the video by deciding factor."""
+def trim_by(source: Any,
+            factor: str = 'mins',
+            copy: bool = False,
+            profile: Optional[str] = None,
+            audio: str = DEFAULT_AUDIO_MODE,
+            jobs: int = 1) -> None:
+  """Trim the video by deciding factor.
+
+  The cut is encoded in chunks by `jobs` (default: 1) workers, see
+  `trim_chunked`.
+  """
   _factor = 1 if factor == 'secs' else 60
-  total_limit = float(vfc(source).duration) / _factor
+  total_limit = get_duration(source) / _factor
   start = ask_numbers(TRIM_START)
   end = ask_numbers(TRIM_END)
   _start = delta(start, factor)
@@ -84,18 +310,139 @@ def trim_by(source: Any, factor: str = 'mins') -> None:
       overwrite = confirm('File with same name exists already. '
                           'Would you like to overwrite that one?')
       if not overwrite:
-        file = filename(source, random.randint(00000, 99999))
-    trim_video(source, file, start * _factor, end * _factor)
-
-
-def trim_num_parts(source: Any, num_parts: int) -> None:
-  """Trim video in number of equal parts."""
-  total_limit = float(vfc(source).duration)
-  split_part = total_limit / num_parts
-  start = 0
-  for idx in range(num_parts):
-    file = filename(source, idx)
-    start, end = start, start + split_part
-    trim_video(source, file, start, end)
-    start += split_part
-  print(f'Completed trimming {file}.', end='\r')
+        file = next_filename(source)
+    trim_ranges(source, [(start * _factor, end * _factor)], [file], copy,
+                jobs, profile=profile, audio=audio, resume=False)
+
+
+def trim_ranges(source: Any,
+                ranges: Sequence[Tuple[float, float]],
+                files: Optional[Sequence[str]] = None,
+                copy: bool = False,
+                jobs: int = 1,
+                clip: Optional[vfc] = None,
+                profile: Optional[str] = None,
+                audio: str = DEFAULT_AUDIO_MODE,
+                probe: float = 0.0,
+                resume: bool = True) -> List[str]:
+  """Trim video into parts covering the given ranges.
+
+  Args:
+    source: Path of the video file.
+    ranges: Sorted & non-overlapping (start, end) timestamps (in secs)
+            of the parts.
+    files: Paths (default: numbered files) of the output files.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    jobs: Number of parts (default: 1) to be encoded in parallel. If
+          more than 1, each part is encoded by a separate worker process
+          instead of splitting from a single decoding pass. A single
+          part is encoded in chunks by all the workers.
+    clip: Already opened clip (default: None) of the source. It's closed
+          once the parts are trimmed.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the parts.
+    probe: Time (default: 0.0) in secs the caller spent opening the
+           clip, recorded in the metrics of the first part.
+    resume: Boolean (default: True) to skip the parts completed by an
+            earlier run with the same settings, as per the journal of
+            the output directory.
+
+  Note:
+    If the output cache is enabled (see `vdoxa.utils.cache`), parts
+    trimmed earlier with the same settings are linked from the cache
+    and newly trimmed parts are added to it.
+
+  Returns:
+    Paths of the trimmed video files.
+  """
+  files = files or [filename(source, idx) for idx in range(len(ranges))]
+  copy = copy or is_copy(profile)
+  # Smart cuts are mostly copied, they neither share a decoding pass nor
+  # are worth chunking.
+  encode = decodes(copy, profile, audio)
+  if jobs > 1 and memory.budget() is not None:
+    jobs = memory.jobs_within(jobs, probe_media(source).size)
+  ledger = Ledger(source, trim_settings(copy, profile, audio), resume)
+  pending = OrderedDict(
+      (file, (start, end)) for file, (start, end) in zip(files, ranges)
+      if not ledger.done(file, start, end))
+  if len(pending) < len(files):
+    print(f'? Skipping {len(files) - len(pending)} of {len(files)} parts '
+          'completed by an earlier run.')
+  hits = [file for file in pending if ledger.fetch(file, *pending[file])]
+  for file in hits:
+    del pending[file]
+  if hits:
+    print(f'? Reused {len(hits)} parts from the cache.')
+
+  def completed(record: Dict[str, Any]) -> None:
+    emit(record)
+    ledger.complete(record['file'], *pending[record['file']])
+
+  if len(pending) == 1 and encode and jobs > 1:
+    # A lone part would keep just one worker busy, it's chunked instead.
+    if clip is not None:
+      clip.close()
+    (file, (start, end)), = pending.items()
+    completed(trim_chunked(source, file, start, end, jobs, profile, audio))
+    return files
+  if pending and encode and jobs <= 1:
+    # Parts are encoded from a single decoding pass over the source.
+    if clip is None:
+      started = time.perf_counter()
+      clip = vfc(source, audio=audio == 'encode', **memory.clip_params())
+      probe += time.perf_counter() - started
+    try:
+      split_clip(clip, list(pending.values()), list(pending), profile, audio,
+                 probe, completed)
+    finally:
+      clip.close()
+    return files
+  if clip is not None:
+    clip.close()
+  if not pending:
+    return files
+  # Keyframes are looked up once & shared by all the parts while copying.
+  if not encode and audio != 'only':
+    key_frames = keyframe_index(source).times
+  else:
+    key_frames = None
+  tasks = [(source, file, start, end, copy, key_frames, encoder_threads(jobs),
+            profile, audio) for file, (start, end) in pending.items()]
+  if jobs > 1:
+    run_in_pool(trim_video, tasks, jobs, callback=completed)
+    print(f'Completed trimming {len(tasks)} parts using {jobs} jobs.')
+    return files
+  for task in tasks:
+    completed(trim_video(*task))
+    print(f'Completed trimming {task[1]}.', end='\r')
+  return files
+
+
+def trim_num_parts(source: Any,
+                   num_parts: int,
+                   copy: bool = False,
+                   jobs: int = 1,
+                   profile: Optional[str] = None,
+                   audio: str = DEFAULT_AUDIO_MODE) -> List[str]:
+  """Trim video in number of equal parts.
+
+  Args:
+    source: Path of the video file.
+    num_parts: Number of parts to split the video in.
+    copy: Boolean (default: False) to remux the packets instead of
+          re-encoding them.
+    jobs: Number of parts (default: 1) to be encoded in parallel.
+    profile: Name of the encoding profile (default: default).
+    audio: Audio mode (default: encode) of the parts.
+
+  Returns:
+    Paths of the trimmed video files.
+  """
+  started = time.perf_counter()
+  total_limit = get_duration(source)
+  boundaries = [total_limit * idx / num_parts for idx in range(num_parts + 1)]
+  return trim_ranges(source, list(zip(boundaries[:-1], boundaries[1:])),
+                     copy=copy, jobs=jobs, profile=profile, audio=audio,
+                     probe=time.perf_counter() - started)
@@ -0,0 +1,55 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Join videos subparser command.
+
+Like the trim commands, the join module is imported only when the
+videos are actually joined and not while building the parser.
+"""
+
+import argparse
+import os
+from typing import List
+
+from vdoxa.cli import strings
+from vdoxa.cli.formatter import VdoXAHelpFormatter as HelpFormatter
+from vdoxa.cli.options import join_args
+
+
+def subparser(subparsers: argparse._SubParsersAction,
+              parents: List[argparse.ArgumentParser]) -> None:
+  """Creates subparser object."""
+  title = os.path.basename(__file__).split('_')[0].capitalize()
+  parser = subparsers.add_parser('join',
+                                 usage=strings.join_usage,
+                                 help=strings.join_help,
+                                 formatter_class=HelpFormatter,
+                                 parents=parents,
+                                 description=strings.join_description)
+  join_args(parser)
+  parser._positionals.title = f'{title} Options'
+  parser._optionals.title = f'{title} Arguments'
+  parser.set_defaults(function=join)
+
+
+def join(args: argparse.Namespace) -> None:
+  """Join videos end to end.
+
+  Args:
+    args: Arguments for storing attributes.
+  """
+  from vdoxa.core.join import join_files
+  join_files(args.files, args.output, args.profile)
@@ -29,10 +29,11 @@ Todo:
 """
 
 import argparse
+import sys
 
 from vdoxa.cli import strings
 from vdoxa.cli.arguments import add_logging_options
-from vdoxa import trim_parser
+from vdoxa import join_parser, serve_parser, trim_parser
 from vdoxa.cli.formatter import VdoXAHelpFormatter as HelpFormatter
 from vdoxa.utils.common import check_version, set_log_level
 from vdoxa.vars.dev import PROJECT_NAME
@@ -54,7 +55,9 @@ def global_parser() -> argparse.ArgumentParser:
 
     ArgumentParser(prog='vdoxa', usage='vdoxa <command> [options] ...
   """
-  print()
+  # Only on a terminal, stdout may be a video streamed by `trim cut`.
+  if sys.stdout.isatty():
+    print()
   prog = PROJECT_NAME.lower()
   usage = f'{prog} <command> [options]'
   parser = argparse.ArgumentParser(prog=prog, usage=usage,
@@ -75,6 +78,8 @@ def global_parser() -> argparse.ArgumentParser:
   parent_parsers = [parent_parser]
   subparsers = parser.add_subparsers(prog=prog)
   trim_parser.subparser(subparsers, parents=parent_parsers)
+  join_parser.subparser(subparsers, parents=parent_parsers)
+  serve_parser.subparser(subparsers, parents=parent_parsers)
   return parser
 
 
@@ -93,6 +98,8 @@ def main() -> None:
 
     Commands:
       trim       Trims the video for further processing ...
+      join       Joins videos end to end without re-encoding ...
+      serve      Serves trim jobs from a pool of warm workers ...
 
     Extra Options:
     -h, --help     Show help.
@@ -108,7 +115,23 @@ def main() -> None:
   log_level = cmd_args.loglevel if hasattr(cmd_args, 'loglevel') else None
   set_log_level(log_level)
   if hasattr(cmd_args, 'function'):
-    cmd_args.function(cmd_args)
+    if getattr(cmd_args, 'cache', False):
+      from vdoxa.utils.cache import enable
+      enable(max_size=cmd_args.cache_size)
+    if getattr(cmd_args, 'max_memory', None):
+      from vdoxa.utils.memory import limit
+      limit(cmd_args.max_memory)
+    if getattr(cmd_args, 'metrics', None):
+      from vdoxa.utils.metrics import JsonLinesHook, add_hook, remove_hook
+      hook = JsonLinesHook(cmd_args.metrics)
+      add_hook(hook)
+      try:
+        cmd_args.function(cmd_args)
+      finally:
+        remove_hook(hook)
+        hook.close()
+    else:
+      cmd_args.function(cmd_args)
   elif hasattr(cmd_args, 'version'):
     check_version(PROJECT_NAME.lower())
   else:
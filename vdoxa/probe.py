@@ -0,0 +1,304 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Lightweight probe of the video metadata.
+
+Duration, frame rate, resolution, codecs & stream layout are read by
+FFprobe from the container headers. Unlike `VideoFileClip`, no reader
+process is left running & no frame is decoded, hence planning a trim
+doesn't cost more than a stat once the source has been probed.
+
+Results are memoized per path, size & modification time; in memory
+for the process and as small JSON files in `VDOXA_PROBE_DIR` (default:
+`~/.cache/vdoxa/probe`) for the later runs. An edited source is probed
+again automatically.
+
+Example:
+  >>> from vdoxa.probe import probe
+  >>> info = probe('videos/demo.mp4')
+  >>> info.duration, info.fps, info.size, info.codec
+
+  (120.04, 29.97, (1920, 1080), 'h264')
+"""
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from vdoxa.utils.ffmpeg import ffprobe_binary, run
+from vdoxa.utils.file_ops import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the normalized layout of the metadata changes.
+_VERSION = 2
+_ENTRIES = ('format=duration,size,bit_rate,format_name:'
+            'stream=index,codec_type,codec_name,profile,width,height,'
+            'has_b_frames,pix_fmt,avg_frame_rate,r_frame_rate,sample_rate,'
+            'channels,channel_layout,duration,nb_frames,bit_rate:'
+            'stream_tags=language,rotate:stream_side_data=rotation')
+
+_memo: Dict[Tuple[str, int, int], 'MediaInfo'] = {}
+
+
+def cache_directory() -> str:
+  """Return directory where the probed metadata is kept."""
+  return os.environ.get('VDOXA_PROBE_DIR', os.path.join(
+      os.path.expanduser('~'), '.cache', 'vdoxa', 'probe'))
+
+
+def _number(value: Any, cast: type = float) -> Optional[Any]:
+  """Return value as a number, None if FFprobe didn't report it."""
+  try:
+    return cast(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def _rate(value: Optional[str]) -> Optional[float]:
+  """Return frame rate like `30000/1001` as a float."""
+  try:
+    rate = Fraction(value)
+  except (TypeError, ValueError, ZeroDivisionError):
+    return None
+  return round(float(rate), 3) if rate else None
+
+
+def _stream(stream: Dict[str, Any]) -> Dict[str, Any]:
+  """Return normalized metadata of a single stream."""
+  rotation = _number(stream.get('tags', {}).get('rotate'), int)
+  for side_data in stream.get('side_data_list', []):
+    if 'rotation' in side_data:
+      rotation = _number(side_data['rotation'], int)
+  return {
+    'index': stream.get('index'),
+    'type': stream.get('codec_type'),
+    'codec': stream.get('codec_name'),
+    'profile': stream.get('profile'),
+    'width': _number(stream.get('width'), int),
+    'height': _number(stream.get('height'), int),
+    'pix_fmt': stream.get('pix_fmt'),
+    'b_frames': _number(stream.get('has_b_frames'), int),
+    'fps': (_rate(stream.get('avg_frame_rate')) or
+            _rate(stream.get('r_frame_rate'))),
+    'rotation': rotation,
+    'sample_rate': _number(stream.get('sample_rate'), int),
+    'channels': _number(stream.get('channels'), int),
+    'channel_layout': stream.get('channel_layout'),
+    'duration': _number(stream.get('duration')),
+    'frames': _number(stream.get('nb_frames'), int),
+    'bit_rate': _number(stream.get('bit_rate'), int),
+    'language': stream.get('tags', {}).get('language'),
+  }
+
+
+class MediaInfo(object):
+  """Metadata of a video file as reported by FFprobe.
+
+  Args:
+    info: Normalized metadata with `format` & `streams` of the file.
+  """
+
+  def __init__(self, info: Dict[str, Any]) -> None:
+    self.info = info
+    self.streams = info['streams']
+    self.video = next((stream for stream in self.streams
+                       if stream['type'] == 'video'), None)
+    self.audio = next((stream for stream in self.streams
+                       if stream['type'] == 'audio'), None)
+
+  def __repr__(self) -> str:
+    return (f'MediaInfo(duration={self.duration}, fps={self.fps}, '
+            f'size={self.size}, codec={self.codec!r}, '
+            f'audio_codec={self.audio_codec!r})')
+
+  @classmethod
+  def from_ffprobe(cls, output: Dict[str, Any]) -> 'MediaInfo':
+    """Build metadata from the JSON output of FFprobe."""
+    fmt = output.get('format', {})
+    return cls({
+      'format': {
+        'name': fmt.get('format_name'),
+        'duration': _number(fmt.get('duration')),
+        'size': _number(fmt.get('size'), int),
+        'bit_rate': _number(fmt.get('bit_rate'), int),
+      },
+      'streams': [_stream(stream) for stream in output.get('streams', [])],
+    })
+
+  @property
+  def duration(self) -> Optional[float]:
+    """Duration (in secs) of the container, else of the video stream."""
+    return self.info['format']['duration'] or (
+        self.video['duration'] if self.video else None)
+
+  @property
+  def fps(self) -> Optional[float]:
+    """Average frame rate of the video stream."""
+    return self.video['fps'] if self.video else None
+
+  @property
+  def size(self) -> Optional[Tuple[int, int]]:
+    """Width & height of the video stream as displayed.
+
+    Note:
+      Frames of videos recorded in portrait are stored in landscape
+      with a rotation, the dimensions are swapped the way MoviePy does.
+    """
+    if not self.video or self.video['width'] is None:
+      return None
+    width, height = self.video['width'], self.video['height']
+    if self.video['rotation'] in (90, -90, 270, -270):
+      return height, width
+    return width, height
+
+  @property
+  def delay(self) -> float:
+    """Secs by which the video packets are decoded ahead of display.
+
+    With B-frames, a packet is decoded before the frames displayed
+    earlier than it, so the decoding timestamps lag the presentation
+    timestamps by the reordering depth.
+    """
+    if not self.video or not self.video['b_frames'] or not self.fps:
+      return 0.0
+    return round(self.video['b_frames'] / self.fps, 6)
+
+  @property
+  def codec(self) -> Optional[str]:
+    """Codec of the video stream."""
+    return self.video['codec'] if self.video else None
+
+  @property
+  def audio_codec(self) -> Optional[str]:
+    """Codec of the audio stream."""
+    return self.audio['codec'] if self.audio else None
+
+  @property
+  def frames(self) -> Optional[int]:
+    """Number of video frames, counted or estimated from the duration."""
+    if not self.video:
+      return None
+    if self.video['frames']:
+      return self.video['frames']
+    if self.duration and self.fps:
+      return int(round(self.duration * self.fps))
+    return None
+
+  def to_dict(self) -> Dict[str, Any]:
+    """Return the metadata as a JSON serializable dictionary."""
+    return self.info
+
+
+def _cache_file(key: Tuple[str, int, int]) -> str:
+  """Return path of the on-disk cache entry of the fingerprint."""
+  digest = hashlib.sha1(json.dumps([_VERSION, *key]).encode()).hexdigest()
+  return os.path.join(cache_directory(), digest[:2], f'{digest}.json')
+
+
+def _load(key: Tuple[str, int, int]) -> Optional[MediaInfo]:
+  """Return the cached metadata, None if missing or stale."""
+  try:
+    with open(_cache_file(key), 'r') as file:
+      cached = json.load(file)
+    if cached.get('key') != list(key):
+      return None
+    return MediaInfo(cached['info'])
+  except FileNotFoundError:
+    return None
+  except (OSError, ValueError, KeyError):
+    logger.debug('Probe cache of %s is unreadable.', key[0])
+    return None
+
+
+def _save(key: Tuple[str, int, int], info: MediaInfo) -> None:
+  """Write the metadata to the on-disk cache atomically."""
+  file = _cache_file(key)
+  temp = f'{file}.{os.getpid()}.tmp'
+  try:
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(temp, 'w') as cache:
+      json.dump({'key': list(key), 'info': info.to_dict()}, cache)
+    os.replace(temp, file)
+  except OSError as error:
+    # Cache is only an optimization, read-only home directories are fine.
+    logger.debug('Could not cache probe of %s: %s', key[0], error)
+    if os.path.isfile(temp):
+      os.remove(temp)
+
+
+def probe(source: str, cache: bool = True) -> MediaInfo:
+  """Return metadata of the video file.
+
+  Args:
+    source: Path of the video file.
+    cache: Boolean (default: True) to use the memoized metadata of an
+           unchanged source.
+
+  Raises:
+    RuntimeError: If FFprobe can't read the file.
+  """
+  key = fingerprint(source)
+  if cache:
+    info = _memo.get(key) or _load(key)
+    if info is not None:
+      _memo[key] = info
+      return info
+  output = run(['-v', 'error', '-show_entries', _ENTRIES, '-of', 'json',
+                source], binary=ffprobe_binary())
+  info = MediaInfo.from_ffprobe(json.loads(output))
+  _memo[key] = info
+  if cache:
+    _save(key, info)
+  return info
+
+
+def probe_many(sources: Sequence[str],
+               workers: int = 8) -> List[Optional[MediaInfo]]:
+  """Return metadata of all the video files, probing them in parallel.
+
+  Sources which can't be probed are returned as None instead of
+  failing the whole lot.
+
+  Args:
+    sources: Paths of the video files.
+    workers: Number of FFprobe processes (default: 8) run at a time.
+  """
+  def _probe(source: str) -> Optional[MediaInfo]:
+    try:
+      return probe(source)
+    except (OSError, RuntimeError, ValueError) as error:
+      logger.warning('Could not probe %s: %s', source, error)
+      return None
+
+  with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+    return list(executor.map(_probe, sources))
+
+
+def get_duration(source: str) -> float:
+  """Return duration (in secs) of the video file.
+
+  Raises:
+    ValueError: If the duration isn't known from the headers.
+  """
+  value = probe(source).duration
+  if value is None:
+    raise ValueError(f'Duration of {source} is unknown.')
+  return value
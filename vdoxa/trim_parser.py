@@ -14,17 +14,24 @@
 # limitations under the License.
 #
 # ======================================================================
-"""Trim video subparser command."""
+"""Trim video subparser command.
+
+The `vdoxa.core` modules pull in MoviePy (and through it NumPy, imageio
+and the FFmpeg lookup), hence they are imported by the trim functions
+only when a trim actually runs and not while building the parser.
+"""
 
 import argparse
 import os
+import sys
 from typing import List
 
 from vdoxa.cli import strings
 from vdoxa.cli.formatter import VdoXAHelpFormatter as HelpFormatter
-from vdoxa.cli.options import trim_args, trim_auto_args, trim_custom_args
-from vdoxa.core.trim import trim_by, trim_num_parts
-from vdoxa.utils.options import select_file
+from vdoxa.cli.options import (trim_args, trim_auto_args, trim_batch_args,
+                               trim_custom_args, trim_cut_args,
+                               trim_faces_args, trim_motion_args,
+                               trim_scenes_args)
 from vdoxa.vars.dev import PROJECT_NAME
 
 prog = PROJECT_NAME.lower()
@@ -64,9 +71,64 @@ def subparser(subparsers: argparse._SubParsersAction,
   trim_custom_parser.set_defaults(function=trim_custom)
   trim_custom_parser._positionals.title = f'{title} Custom Options'
   trim_custom_parser._optionals.title = f'{title} Custom Arguments'
+
+  trim_cut_parser = trim.add_parser('cut',
+                                    usage=strings.cut_usage,
+                                    help=strings.cut_help,
+                                    formatter_class=HelpFormatter,
+                                    parents=parents,
+                                    description=(strings.cut_description))
+  trim_cut_parser.set_defaults(function=trim_cut)
+  trim_cut_parser._positionals.title = f'{title} Cut Options'
+  trim_cut_parser._optionals.title = f'{title} Cut Arguments'
+
+  trim_batch_parser = trim.add_parser('batch',
+                                      usage=strings.batch_usage,
+                                      help=strings.batch_help,
+                                      formatter_class=HelpFormatter,
+                                      parents=parents,
+                                      description=(strings.batch_description))
+  trim_batch_parser.set_defaults(function=trim_batch)
+  trim_batch_parser._positionals.title = f'{title} Batch Options'
+  trim_batch_parser._optionals.title = f'{title} Batch Arguments'
+
+  trim_scenes_parser = trim.add_parser('scenes',
+                                       usage=strings.scenes_usage,
+                                       help=strings.scenes_help,
+                                       formatter_class=HelpFormatter,
+                                       parents=parents,
+                                       description=(strings.scenes_description))
+  trim_scenes_parser.set_defaults(function=trim_scenes)
+  trim_scenes_parser._positionals.title = f'{title} Scenes Options'
+  trim_scenes_parser._optionals.title = f'{title} Scenes Arguments'
+
+  trim_motion_parser = trim.add_parser('motion',
+                                       usage=strings.motion_usage,
+                                       help=strings.motion_help,
+                                       formatter_class=HelpFormatter,
+                                       parents=parents,
+                                       description=(strings.motion_description))
+  trim_motion_parser.set_defaults(function=trim_motion)
+  trim_motion_parser._positionals.title = f'{title} Motion Options'
+  trim_motion_parser._optionals.title = f'{title} Motion Arguments'
+
+  trim_faces_parser = trim.add_parser('faces',
+                                      usage=strings.faces_usage,
+                                      help=strings.faces_help,
+                                      formatter_class=HelpFormatter,
+                                      parents=parents,
+                                      description=(strings.faces_description))
+  trim_faces_parser.set_defaults(function=trim_faces)
+  trim_faces_parser._positionals.title = f'{title} Faces Options'
+  trim_faces_parser._optionals.title = f'{title} Faces Arguments'
   parser.set_defaults(function=trim_auto_24)
   trim_auto_args(trim_auto_parser)
   trim_custom_args(trim_custom_parser)
+  trim_cut_args(trim_cut_parser)
+  trim_batch_args(trim_batch_parser)
+  trim_scenes_args(trim_scenes_parser)
+  trim_motion_args(trim_motion_parser)
+  trim_faces_args(trim_faces_parser)
 
 
 def trim_auto_24(args: argparse.Namespace,
@@ -79,7 +141,11 @@ def trim_auto_24(args: argparse.Namespace,
           trimmed.
   """
   path = path or args.path
-  trim_num_parts(path, 24)
+  if args.segment_length:
+    trim_segments(args, path)
+    return
+  from vdoxa.core.trim import trim_num_parts
+  trim_num_parts(path, 24, args.copy, args.jobs, args.profile, args.audio)
 
 
 def trim_auto(args: argparse.Namespace,
@@ -94,8 +160,31 @@ def trim_auto(args: argparse.Namespace,
           trimmed.
   """
   path = path or args.path
+  if args.segment_length:
+    trim_segments(args, path)
+    return
+  from vdoxa.core.trim import trim_num_parts
   parts = parts or args.parts
-  trim_num_parts(path, int(parts))
+  trim_num_parts(path, int(parts), args.copy, args.jobs, args.profile,
+                 args.audio)
+
+
+def trim_segments(args: argparse.Namespace,
+                  path: str = None,
+                  length: str = None) -> None:
+  """Trim videos in segments of fixed length.
+
+  Args:
+    args: Arguments for storing attributes.
+    path: Path (default: current directory) of the video file to be
+          trimmed.
+    length: Length of the segments like 60s or 250f (frames).
+  """
+  from vdoxa.core.segment import trim_segments as _trim_segments
+  path = path or args.path
+  length = length or args.segment_length
+  _trim_segments(path, length, args.copy, args.profile, args.audio,
+                 args.segment_index)
 
 
 def trim_custom(args: argparse.Namespace,
@@ -109,6 +198,91 @@ def trim_custom(args: argparse.Namespace,
           trimmed.
     by: Trimming by (default: mins); secs available.
   """
+  from vdoxa.core.trim import trim_by
   path = path or args.path
   by = by or args.by
-  trim_by(path, by)
+  trim_by(path, by, args.copy, args.profile, args.audio, args.jobs)
+
+
+def trim_cut(args: argparse.Namespace,
+             path: str = None) -> None:
+  """Cut a portion of videos & stream it to stdout or a file.
+
+  Args:
+    args: Arguments for storing attributes.
+    path: Path (default: current directory) of the video file to be
+          cut.
+  """
+  if args.output == '-' and args.metrics == '-':
+    print('? Metrics can\'t be written to stdout while the cut is streamed '
+          'to it.', file=sys.stderr)
+    exit(1)
+  from vdoxa.core.stream import trim_stream
+  path = path or args.path
+  try:
+    trim_stream(path, args.output, args.start, args.end, args.copy,
+                args.profile, args.audio, args.format)
+  except BrokenPipeError:
+    # Reader went away (`| head`), stdout can't even be flushed at exit.
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    exit(1)
+
+
+def trim_batch(args: argparse.Namespace,
+               manifest: str = None) -> None:
+  """Trim videos listed in a manifest.
+
+  Args:
+    args: Arguments for storing attributes.
+    manifest: Path of the JSON lines manifest with the cuts.
+  """
+  from vdoxa.core.batch import trim_batch as _trim_batch
+  manifest = manifest or args.manifest
+  _trim_batch(manifest, args.results, args.jobs, args.copy, args.profile,
+              args.audio)
+
+
+def trim_scenes(args: argparse.Namespace,
+                path: str = None) -> None:
+  """Trim videos at the shot boundaries.
+
+  Args:
+    args: Arguments for storing attributes.
+    path: Path (default: current directory) of the video file to be
+          trimmed.
+  """
+  from vdoxa.core.scenes import trim_scenes as _trim_scenes
+  path = path or args.path
+  _trim_scenes(path, args.threshold, args.stride, args.method, args.copy,
+               args.jobs, args.profile, args.audio)
+
+
+def trim_motion(args: argparse.Namespace,
+                path: str = None) -> None:
+  """Trim only the portions of videos with motion.
+
+  Args:
+    args: Arguments for storing attributes.
+    path: Path (default: current directory) of the video file to be
+          trimmed.
+  """
+  from vdoxa.core.motion import trim_motion as _trim_motion
+  path = path or args.path
+  _trim_motion(path, args.threshold, args.stride, args.padding, args.copy,
+               args.jobs, args.profile, args.audio, args.hysteresis)
+
+
+def trim_faces(args: argparse.Namespace,
+               path: str = None) -> None:
+  """Trim the portions of videos with faces.
+
+  Args:
+    args: Arguments for storing attributes.
+    path: Path (default: current directory) of the video file to be
+          trimmed.
+  """
+  from vdoxa.core.faces import trim_faces as _trim_faces
+  path = path or args.path
+  _trim_faces(path, args.prototxt, args.model, args.stride, args.batch_size,
+              args.threshold, args.padding, args.manifest, args.copy,
+              args.jobs, args.profile, args.audio)
@@ -0,0 +1,327 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for caching the trimmed outputs by their content.
+
+Every trimmed part is stored under a key derived from the hash of the
+whole content of the source and the normalized trim parameters (range,
+copy, encoding settings & audio mode), irrespective of where the source lives or what
+the output is called. A later request for the same cut is served by
+linking the stored file to the new output instead of trimming again:
+
+  1. Hardlink, if the output is on the same filesystem.
+  2. Reflink (copy-on-write clone), if the filesystem supports it.
+  3. Plain copy otherwise.
+
+The cache is bounded by size & least recently used parts are evicted
+first. It lives in `VDOXA_CACHE_DIR` (default: `~/.cache/vdoxa/outputs`)
+and is disabled unless enabled using `enable` or `--cache` on the CLI.
+
+The hash of a source is memoized by it's device, inode, size &
+modification time (in memory and next to the cached outputs), so an
+unchanged source is read in full only once.
+
+Note:
+  A hardlinked output shares the data with the cached file, hence an
+  output edited in place changes the cached copy as well. Such entries
+  are detected by their size and discarded.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from vdoxa.utils.common import parse_size
+from vdoxa.utils.file_ops import temporary
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the outputs for the same parameters change.
+_VERSION = 1
+# `FICLONE` ioctl request on Linux, clones the data of one file into
+# another on copy-on-write filesystems (Btrfs, XFS, ...).
+_FICLONE = 0x40049409
+# Bytes of the source read at a time while hashing it.
+_CHUNK = 1024 ** 2
+
+DEFAULT_MAX_SIZE = '10G'
+
+_active = None
+_fingerprints: Dict[Tuple[int, int, int, int], str] = {}
+
+
+def _identity(source: str) -> Tuple[int, int, int, int]:
+  """Return device, inode, size & modification time (in ns) of file."""
+  stat = os.stat(source)
+  return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def content_fingerprint(source: str) -> str:
+  """Return SHA-256 hash of the whole content of the source.
+
+  Copies of the source share the fingerprint while any edit changes it.
+  The hash is memoized by the identity of the file, hence an unchanged
+  source is read only once in the process.
+
+  Raises:
+    OSError: If the source was modified while being hashed.
+  """
+  identity = _identity(source)
+  if identity in _fingerprints:
+    return _fingerprints[identity]
+  digest = hashlib.sha256()
+  with open(source, 'rb') as file:
+    for chunk in iter(lambda: file.read(_CHUNK), b''):
+      digest.update(chunk)
+  if _identity(source) != identity:
+    raise OSError(f'{source} was modified while being hashed.')
+  _fingerprints[identity] = digest.hexdigest()
+  return _fingerprints[identity]
+
+
+def _reflink(source: str, destination: str) -> bool:
+  """Clone the file using copy-on-write & return True if it worked."""
+  if fcntl is None:
+    return False
+  try:
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+      fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    return True
+  except OSError:
+    if os.path.isfile(destination):
+      os.remove(destination)
+    return False
+
+
+def link(source: str, destination: str) -> str:
+  """Link or copy the file atomically & return the method used.
+
+  Args:
+    source: Path of the existing file.
+    destination: Path of the file to be created or replaced.
+  """
+  partial = temporary(destination, 'partial')
+  if os.path.isfile(partial):
+    os.remove(partial)
+  try:
+    try:
+      os.link(source, partial)
+      method = 'hardlink'
+    except OSError:
+      if _reflink(source, partial):
+        method = 'reflink'
+      else:
+        shutil.copyfile(source, partial)
+        method = 'copy'
+    os.replace(partial, destination)
+  finally:
+    if os.path.isfile(partial):
+      os.remove(partial)
+  return method
+
+
+class OutputCache(object):
+  """Size bounded, least recently used cache of the trimmed outputs.
+
+  Args:
+    directory: Directory (default: `VDOXA_CACHE_DIR` or
+               `~/.cache/vdoxa/outputs`) of the cache.
+    max_size: Size (default: 10G) above which the least recently used
+              outputs are evicted, in bytes or like `512M`.
+
+  Example:
+    >>> from vdoxa.utils.cache import OutputCache
+    >>> from vdoxa.utils.encoding import trim_settings
+    >>> cache = OutputCache(max_size='1G')
+    >>> key = cache.key('demo.mp4', 0, 30, trim_settings(True, None,
+    ...                                                  'copy'))
+    >>> cache.fetch(key, 'demo/demo_0.mp4')
+
+    False
+  """
+
+  def __init__(self,
+               directory: Optional[str] = None,
+               max_size: Union[int, str] = DEFAULT_MAX_SIZE) -> None:
+    self.directory = directory or os.environ.get(
+        'VDOXA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache',
+                                        'vdoxa', 'outputs'))
+    self.max_size = parse_size(max_size)
+
+  def key(self,
+          source: str,
+          start: float,
+          end: Optional[float],
+          settings: Dict[str, Any]) -> str:
+    """Return key of the cut of the source with the settings."""
+    params = {'version': _VERSION, 'source': self.fingerprint(source),
+              'start': round(start, 3),
+              'end': None if end is None else round(end, 3),
+              'settings': settings}
+    return hashlib.sha256(json.dumps(params, sort_keys=True)
+                          .encode()).hexdigest()
+
+  def fingerprint(self, source: str) -> str:
+    """Return content fingerprint of the source, hashing it once.
+
+    Fingerprints are persisted next to the cached outputs, so that later
+    runs (and the other workers) skip hashing the unchanged sources.
+    """
+    identity = _identity(source)
+    if identity in _fingerprints:
+      return _fingerprints[identity]
+    file = os.path.join(self.directory, 'fingerprints',
+                        '{}-{}.json'.format(*identity[:2]))
+    try:
+      with open(file, 'r') as handle:
+        cached = json.load(handle)
+      if cached['identity'] == list(identity):
+        _fingerprints[identity] = cached['fingerprint']
+        return cached['fingerprint']
+    except (OSError, ValueError, KeyError):
+      pass
+    fingerprint = content_fingerprint(source)
+    partial = f'{file}.{os.getpid()}.tmp'
+    try:
+      os.makedirs(os.path.dirname(file), exist_ok=True)
+      with open(partial, 'w') as handle:
+        json.dump({'identity': list(identity), 'fingerprint': fingerprint,
+                   'source': os.path.abspath(source)}, handle)
+      os.replace(partial, file)
+    except OSError:
+      logger.debug('Couldn\'t persist fingerprint of %s.', source)
+      self._remove(partial)
+    return fingerprint
+
+  def _paths(self, key: str, extension: str = '.mp4') -> Tuple[str, str]:
+    """Return paths of the cached output & it's metadata."""
+    directory = os.path.join(self.directory, key[:2])
+    return (os.path.join(directory, f'{key}{extension}'),
+            os.path.join(directory, f'{key}.json'))
+
+  def fetch(self, key: str, file: str) -> bool:
+    """Link the cached output to the file & return True on a hit."""
+    extension = os.path.splitext(file)[1]
+    cached, meta = self._paths(key, extension)
+    try:
+      with open(meta, 'r') as handle:
+        size = json.load(handle)['size']
+      if os.path.getsize(cached) != size:
+        logger.warning('Cached %s was modified, discarding it.', cached)
+        self._remove(cached, meta)
+        return False
+      method = link(cached, file)
+    except (OSError, ValueError, KeyError):
+      return False
+    self._touch(cached)
+    logger.debug('Cache hit for %s, %s %s.', file, method, cached)
+    return True
+
+  def store(self, key: str, file: str) -> None:
+    """Add the trimmed file to the cache & evict the old outputs."""
+    cached, meta = self._paths(key, os.path.splitext(file)[1])
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    try:
+      link(file, cached)
+      size = os.path.getsize(cached)
+      partial = f'{meta}.{os.getpid()}.tmp'
+      with open(partial, 'w') as handle:
+        json.dump({'size': size, 'file': os.path.basename(file)}, handle)
+      os.replace(partial, meta)
+    except OSError:
+      logger.warning('Couldn\'t cache %s.', file, exc_info=True)
+      return
+    self._touch(cached)
+    self.evict()
+
+  def _entries(self) -> Iterator[Tuple[float, int, str]]:
+    """Yield last use, size & path of every cached output."""
+    if not os.path.isdir(self.directory):
+      return
+    for shard in os.scandir(self.directory):
+      if not shard.is_dir() or shard.name == 'fingerprints':
+        continue
+      for entry in os.scandir(shard.path):
+        if (entry.name.endswith(('.json', '.tmp')) or
+            'TEMP_VDOXA_' in entry.name):
+          continue
+        try:
+          stat = entry.stat()
+        except FileNotFoundError:
+          continue
+        yield stat.st_atime, stat.st_size, entry.path
+
+  def size(self) -> int:
+    """Return total size (in bytes) of the cached outputs."""
+    return sum(size for _, size, _ in self._entries())
+
+  def evict(self) -> None:
+    """Remove the least recently used outputs above the size limit."""
+    entries = sorted(self._entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+      if total <= self.max_size:
+        break
+      self._remove(path, f'{os.path.splitext(path)[0]}.json')
+      total -= size
+      logger.debug('Evicted %s from the cache.', path)
+
+  @staticmethod
+  def _touch(path: str) -> None:
+    """Mark the output as used now.
+
+    Only the access time is set, modification time is left as is so that
+    hardlinked outputs still match their journal entries.
+    """
+    stat = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+
+  @staticmethod
+  def _remove(*paths: str) -> None:
+    """Remove the files, ignoring the ones already removed."""
+    for path in paths:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+
+
+def enable(directory: Optional[str] = None,
+           max_size: Union[int, str] = DEFAULT_MAX_SIZE) -> OutputCache:
+  """Enable the output cache for all the trims in this process."""
+  global _active
+  _active = OutputCache(directory, max_size)
+  return _active
+
+
+def disable() -> None:
+  """Disable the output cache."""
+  global _active
+  _active = None
+
+
+def active() -> Optional[OutputCache]:
+  """Return the enabled output cache, if any."""
+  return _active
@@ -21,7 +21,7 @@ import logging
 import os
 import subprocess
 import sys
-from typing import Union
+from typing import List, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -88,3 +88,65 @@ def set_log_level(log_level: Union[int, str] = None) -> None:
     log_level = logging.getLevelName(log_level)
 
   logging.getLogger('vdoxa').setLevel(log_level)
+
+
+def merge_intervals(intervals: Sequence[Tuple[float, float]],
+                    padding: float,
+                    duration: float) -> List[Tuple[float, float]]:
+  """Pad the intervals & merge the ones which overlap.
+
+  Args:
+    intervals: Sorted (start, end) timestamps (in secs).
+    padding: Time (in secs) added on both the sides of the intervals.
+    duration: Duration of the video, padded intervals are clamped to it.
+  """
+  merged = []
+  for start, end in intervals:
+    start, end = max(0.0, start - padding), min(duration, end + padding)
+    if merged and start <= merged[-1][1]:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
+  return merged
+
+
+def parse_size(size: Union[int, str]) -> int:
+  """Return size like `512M` or `10G` (powers of 1024) in bytes.
+
+  Raises:
+    ValueError: If the size can't be parsed.
+  """
+  units = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+  value = str(size).strip().upper().rstrip('IB')
+  unit = value[-1:] if value[-1:] in units else ''
+  try:
+    return int(float(value[:len(value) - len(unit)]) * units[unit])
+  except ValueError:
+    raise ValueError(f'Invalid size "{size}", use bytes or a suffix like '
+                     '512M or 10G.') from None
+
+
+def parse_length(length: Union[float, int, str]) -> Tuple[float, str]:
+  """Return length like `60s`, `1.5m`, `1h` or `250f` with it's unit.
+
+  Lengths without a suffix are in secs. Time based lengths are returned
+  in secs with the unit `secs` & frame counts with the unit `frames`.
+
+  Raises:
+    ValueError: If the length can't be parsed or isn't positive.
+  """
+  units = {'s': 1, 'm': 60, 'h': 3600}
+  value = str(length).strip().lower()
+  try:
+    if value.endswith('f'):
+      amount, unit = int(value[:-1]), 'frames'
+    else:
+      scale = units.get(value[-1:], 1)
+      amount = float(value.rstrip('smh')) * scale
+      unit = 'secs'
+  except ValueError:
+    amount = 0
+  if amount <= 0:
+    raise ValueError(f'Invalid length "{length}", use secs like 60s, 1.5m '
+                     'or a number of frames like 250f.')
+  return amount, unit
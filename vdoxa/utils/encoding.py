@@ -0,0 +1,166 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for turning encoding profiles into encoder settings."""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from vdoxa.utils import memory
+from vdoxa.vars.profiles import DEFAULT_AUDIO_MODE, DEFAULT_PROFILE, PROFILES
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+  """Return settings of the encoding profile.
+
+  Args:
+    name: Name of the profile (default: default).
+
+  Raises:
+    ValueError: If the profile doesn't exist.
+  """
+  name = name or DEFAULT_PROFILE
+  if name not in PROFILES:
+    raise ValueError(f'Unknown encoding profile "{name}". Choose from: '
+                     f'{", ".join(PROFILES)}.')
+  profile = dict(PROFILES[DEFAULT_PROFILE], copy=False)
+  profile.update(PROFILES[name])
+  return profile
+
+
+def is_copy(name: Optional[str] = None) -> bool:
+  """Return True if the profile remuxes packets instead of encoding."""
+  return get_profile(name)['copy']
+
+
+def is_smart(name: Optional[str] = None) -> bool:
+  """Return True if the profile re-encodes only the partial GOPs."""
+  return get_profile(name).get('smart', False)
+
+
+def ffmpeg_params(profile: Dict[str, Any]) -> List[str]:
+  """Return extra FFmpeg output parameters for the profile."""
+  params = []
+  if profile['crf'] is not None:
+    params += ['-crf', str(profile['crf'])]
+  if profile['pixel_format']:
+    params += ['-pix_fmt', profile['pixel_format']]
+  return params
+
+
+def writer_params(name: Optional[str] = None,
+                  threads: Optional[int] = None,
+                  size: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+  """Return keyword arguments for MoviePy's `FFMPEG_VideoWriter`.
+
+  Args:
+    name: Name of the profile (default: default).
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    size: Width & height (default: None) of the frames, used to keep the
+          encoder within the memory budget (see `vdoxa.utils.memory`).
+  """
+  profile = get_profile(name)
+  threads = memory.encoder_threads(threads or profile['threads'], size)
+  params = ffmpeg_params(profile)
+  if profile['codec'] == 'libx264':
+    params += memory.encoder_params(threads, size)
+  return {
+    'codec': profile['codec'],
+    'preset': profile['preset'],
+    'threads': threads,
+    'ffmpeg_params': params or None,
+  }
+
+
+def videofile_params(name: Optional[str] = None,
+                     threads: Optional[int] = None,
+                     size: Optional[Tuple[int, int]] = None
+                     ) -> Dict[str, Any]:
+  """Return keyword arguments for MoviePy's `write_videofile`.
+
+  Args:
+    name: Name of the profile (default: default).
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    size: Width & height (default: None) of the frames, used to keep the
+          encoder within the memory budget.
+  """
+  profile = get_profile(name)
+  return dict(writer_params(name, threads, size),
+              audio=profile['audio'],
+              audio_codec=profile['audio_codec'],
+              audio_bitrate=profile['audio_bitrate'])
+
+
+def output_args(name: Optional[str] = None,
+                threads: Optional[int] = None,
+                size: Optional[Tuple[int, int]] = None,
+                audio: str = DEFAULT_AUDIO_MODE) -> List[Any]:
+  """Return FFmpeg output arguments encoding as per the profile.
+
+  Streams aren't mapped, that's left to the caller. Audio is copied,
+  encoded as per the profile or dropped as per the audio mode.
+
+  Args:
+    name: Name of the profile (default: default).
+    threads: Number of threads (default: None, as per the profile) the
+             encoder is allowed to use.
+    size: Width & height (default: None) of the frames, used to keep the
+          encoder within the memory budget.
+    audio: Audio mode (default: encode) of the output.
+  """
+  profile = get_profile(name)
+  codec = profile['codec'] or 'libx264'
+  args = ['-c:v', codec]
+  args += ['-preset', profile['preset']] if profile['preset'] else []
+  threads = memory.encoder_threads(threads or profile['threads'], size)
+  args += ['-threads', threads] if threads else []
+  args += ffmpeg_params(profile)
+  if codec == 'libx264':
+    args += memory.encoder_params(threads, size)
+  if audio == 'copy':
+    args += ['-c:a', 'copy']
+  elif audio == 'encode' and profile['audio']:
+    args += ['-c:a', profile['audio_codec'] or 'libmp3lame']
+    args += ['-b:a', profile['audio_bitrate']] if (
+        profile['audio_bitrate']) else []
+  else:
+    args += ['-an']
+  return args
+
+
+def trim_settings(copy: bool,
+                  profile: Optional[str],
+                  audio: str) -> Dict[str, Any]:
+  """Return normalized settings which decide the trimmed output.
+
+  Args:
+    copy: Boolean to remux the packets instead of re-encoding them.
+    profile: Name of the encoding profile.
+    audio: Audio mode of the output.
+
+  Note:
+    Encoder threads don't change what is encoded, hence they're ignored.
+    Copied parts don't depend on the profile & audio only parts don't
+    depend on anything else.
+  """
+  if audio == 'only':
+    return {'audio': audio}
+  if copy:
+    return {'copy': True, 'audio': audio}
+  settings = get_profile(profile)
+  settings.pop('threads', None)
+  return {'copy': False, 'profile': settings, 'audio': audio}
@@ -0,0 +1,392 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for talking to the FFmpeg binaries directly.
+
+MoviePy decodes every frame before handing it back to us. Operations
+which only move packets around (stream copy, remuxing) are cheaper when
+FFmpeg is called directly, so those live here.
+"""
+
+import bisect
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import (Any, BinaryIO, Iterator, List, Optional, Sequence, Tuple,
+                    Union)
+
+from vdoxa.utils.metrics import reap, track
+
+logger = logging.getLogger(__name__)
+
+# Bytes of the FFmpeg output passed on to a file-like target at a time.
+CHUNK_SIZE = 256 * 1024
+
+
+def ffmpeg_binary() -> str:
+  """Return path of the FFmpeg binary.
+
+  The lookup order matches MoviePy's: `FFMPEG_BINARY` environment
+  variable first, then the binary bundled with imageio and lastly
+  whatever `ffmpeg` is available on the `PATH`.
+  """
+  binary = os.environ.get('FFMPEG_BINARY')
+  if binary and binary != 'auto-detect':
+    return binary
+  try:
+    from moviepy.config import get_setting
+    return get_setting('FFMPEG_BINARY')
+  except ImportError:
+    return shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def ffprobe_binary() -> str:
+  """Return path of the FFprobe binary.
+
+  FFprobe is not bundled with imageio, so if it isn't set using the
+  `FFPROBE_BINARY` environment variable or available on the `PATH`, the
+  one sitting next to the FFmpeg binary is used.
+  """
+  binary = os.environ.get('FFPROBE_BINARY') or shutil.which('ffprobe')
+  if binary:
+    return binary
+  ffmpeg = ffmpeg_binary()
+  return os.path.join(os.path.dirname(ffmpeg),
+                      os.path.basename(ffmpeg).replace('ffmpeg', 'ffprobe'))
+
+
+def run(args: Sequence[str], binary: Optional[str] = None) -> str:
+  """Run FFmpeg (or FFprobe) command and return it's standard output.
+
+  Args:
+    args: Arguments to be passed to the binary.
+    binary: Binary (default: FFmpeg) to be executed.
+
+  Raises:
+    RuntimeError: If the command exits with a non-zero status.
+  """
+  cmd = [binary or ffmpeg_binary(), '-hide_banner', *map(str, args)]
+  logger.debug('Running: %s', ' '.join(cmd))
+  process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, text=True)
+  track(process)
+  # Pipes are drained before reaping the process (unlike `communicate`),
+  # so that it's usage is recorded by the metrics of the part.
+  errors = []
+  drain = threading.Thread(target=lambda: errors.append(
+      process.stderr.read()), daemon=True)
+  drain.start()
+  try:
+    output = process.stdout.read()
+  except BaseException:
+    process.kill()
+    raise
+  finally:
+    process.stdout.close()
+    reap(process)
+    drain.join()
+  if process.returncode != 0:
+    raise RuntimeError(f'{os.path.basename(cmd[0])} failed with exit status '
+                       f'{process.returncode}:\n{"".join(errors).strip()}')
+  return output
+
+
+def run_to(args: Sequence[Any],
+           target: BinaryIO,
+           chunk_size: int = CHUNK_SIZE) -> int:
+  """Run FFmpeg command writing it's output to the file-like target.
+
+  The output of the command should be `pipe:1`. Output is passed on as
+  soon as FFmpeg writes it, at most a chunk is held in memory.
+
+  Args:
+    args: Arguments to be passed to FFmpeg.
+    target: Writable binary file-like object.
+    chunk_size: Bytes (default: 256K) read from FFmpeg at a time.
+
+  Returns:
+    Number of bytes written to the target.
+
+  Raises:
+    RuntimeError: If the command exits with a non-zero status.
+  """
+  cmd = [ffmpeg_binary(), '-hide_banner', *map(str, args)]
+  logger.debug('Running: %s', ' '.join(cmd))
+  process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+  track(process)
+  # Drained alongside, FFmpeg would block on a full stderr pipe otherwise.
+  errors = []
+  drain = threading.Thread(target=lambda: errors.append(
+      process.stderr.read()), daemon=True)
+  drain.start()
+  written = 0
+  try:
+    for chunk in iter(lambda: process.stdout.read1(chunk_size), b''):
+      target.write(chunk)
+      written += len(chunk)
+  except BaseException:
+    process.kill()
+    raise
+  finally:
+    process.stdout.close()
+    reap(process)
+    drain.join()
+  if process.returncode != 0:
+    raise RuntimeError(f'{os.path.basename(cmd[0])} failed with exit status '
+                       f'{process.returncode}:\n'
+                       f'{b"".join(errors).decode(errors="replace").strip()}')
+  return written
+
+
+def keyframes(source: str) -> List[float]:
+  """Return sorted timestamps (in secs) of the video keyframes.
+
+  Only the packet headers are read, no frame is decoded.
+
+  Args:
+    source: Path of the video file.
+  """
+  output = run(['-v', 'error', '-select_streams', 'v:0',
+                '-show_entries', 'packet=pts_time,flags',
+                '-of', 'csv=print_section=0', source],
+               binary=ffprobe_binary())
+  timestamps = []
+  for line in output.splitlines():
+    pts_time, _, flags = line.partition(',')
+    if 'K' in flags and pts_time not in ('', 'N/A'):
+      timestamps.append(float(pts_time))
+  return sorted(timestamps)
+
+
+def snap(timestamps: Sequence[float], value: Union[float, int]) -> float:
+  """Snap value to the nearest keyframe at or before it.
+
+  Args:
+    timestamps: Sorted keyframe timestamps.
+    value: Timestamp (in secs) to be snapped.
+  """
+  idx = bisect.bisect_right(timestamps, value + 1e-6)
+  return timestamps[idx - 1] if idx else 0.0
+
+
+def copy_args(source: str,
+              start: Union[float, int],
+              end: Optional[Union[float, int]] = None,
+              audio: str = 'copy',
+              delay: float = 0.0) -> List[Any]:
+  """Return FFmpeg arguments remuxing the packets between start and end.
+
+  Arguments end just before the output, see `stream_copy` for the rest.
+  """
+  args = ['-v', 'error', '-y', '-ss', start, '-i', source]
+  if end is not None:
+    cut = end - start if audio == 'only' else end - start - delay
+    args += ['-t', round(max(cut, 0.0), 6)]
+  if audio == 'only':
+    # Audio packets before the start are kept by the container's edit
+    # list, shifting them to zero would put the audio out of place.
+    return args + ['-map', '0:a', '-vn', '-c', 'copy']
+  streams = ['0:v'] if audio == 'drop' else ['0:v', '0:a?']
+  for stream in streams:
+    args += ['-map', stream]
+  return args + ['-c', 'copy', '-avoid_negative_ts', 'make_zero']
+
+
+def stream_copy(source: str,
+                file: str,
+                start: Union[float, int],
+                end: Optional[Union[float, int]] = None,
+                audio: str = 'copy',
+                delay: float = 0.0) -> None:
+  """Remux the packets between start and end without decoding them.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the output file.
+    start: Starting point (in secs); should be a keyframe unless only
+           the audio is copied.
+    end: Ending point (default: None, till the end) in secs.
+    audio: Audio mode (default: copy); `drop` copies only the video &
+           `only` copies only the audio packets.
+    delay: Secs (default: 0.0) by which the decoding timestamps of the
+           video lag the presentation timestamps (see
+           `vdoxa.probe.MediaInfo.delay`).
+
+  Note:
+    Packets are cut by their decoding timestamps. With B-frames, the
+    keyframe at the end is decoded before the frames displayed just
+    ahead of it, hence the cut is moved back by the delay so that the
+    part doesn't end with frames of the next one.
+  """
+  run(copy_args(source, start, end, audio, delay) + [file])
+
+
+def mux_audio(video: str,
+              source: str,
+              file: str,
+              start: Union[float, int] = 0,
+              end: Optional[Union[float, int]] = None,
+              codec: Optional[str] = None,
+              bitrate: Optional[str] = None) -> None:
+  """Mux the video with the source audio between start and end.
+
+  The video is always copied. The audio is copied as well unless a
+  codec is given, so it's neither decoded nor re-encoded by default.
+  Sources without audio produce a video only file.
+
+  Args:
+    video: Path of the (silent) encoded video file.
+    source: Path of the file to take the audio from.
+    file: Path of the output file.
+    start: Starting point (default: 0) of the audio in secs.
+    end: Ending point (default: None, till the end) in secs.
+    codec: Audio codec (default: None, copy) to re-encode the audio.
+    bitrate: Bitrate (default: None, as per FFmpeg) of the re-encoded
+             audio.
+  """
+  args = ['-v', 'error', '-y', '-i', video, '-ss', start]
+  if end is not None:
+    args += ['-t', round(end - start, 6)]
+  args += ['-i', source, '-map', '0:v', '-map', '1:a?']
+  if codec is None:
+    args += ['-c', 'copy', file]
+  else:
+    args += ['-c:v', 'copy', '-c:a', codec]
+    args += ['-b:a', bitrate] if bitrate else []
+    args.append(file)
+  run(args)
+
+
+@contextmanager
+def concat_listing(files: Sequence[str], file: str) -> Iterator[str]:
+  """Write listing of the files for the concat demuxer & yield it's path.
+
+  Args:
+    files: Paths of the files to be joined, in order.
+    file: Path of the joined output, the listing is kept next to it.
+  """
+  listing = f'{os.path.splitext(file)[0]}.{os.getpid()}.concat.txt'
+  with open(listing, 'w') as concat:
+    for path in files:
+      escaped = os.path.abspath(path).replace("'", "'\\''")
+      concat.write(f"file '{escaped}'\n")
+  try:
+    yield listing
+  finally:
+    os.remove(listing)
+
+
+def concat_copy(files: Sequence[str], file: str) -> None:
+  """Join the files end to end without re-encoding them.
+
+  Uses FFmpeg's concat demuxer, so all the files should have the same
+  streams encoded with the same codec parameters.
+
+  Args:
+    files: Paths of the files to be joined, in order.
+    file: Path of the joined output file.
+  """
+  with concat_listing(files, file) as listing:
+    run(['-v', 'error', '-y', '-f', 'concat', '-safe', 0, '-i', listing,
+         '-map', 0, '-c', 'copy', file])
+
+
+def snapped_range(timestamps: Sequence[float],
+                  start: Union[float, int],
+                  end: Optional[Union[float, int]]
+                  ) -> Tuple[float, Optional[float]]:
+  """Return keyframe aligned range for start and end.
+
+  The end is snapped the same way as the start so that consecutive
+  parts neither overlap nor leave gaps between them. If no keyframe
+  follows the end (last GOP of the video), it is left untouched.
+
+  Args:
+    timestamps: Sorted keyframe timestamps.
+    start: Starting point (in secs) of the range.
+    end: Ending point (in secs) of the range; None till the end.
+  """
+  _start = snap(timestamps, start)
+  if not timestamps or end is None or end >= timestamps[-1]:
+    return _start, end
+  return _start, max(snap(timestamps, end), _start)
+
+
+def chunk_ranges(timestamps: Sequence[float],
+                 start: Union[float, int],
+                 end: Union[float, int],
+                 chunks: int,
+                 min_length: float = 10.0) -> List[Tuple[float, float]]:
+  """Return keyframe aligned chunks covering the range from start to end.
+
+  The range is divided into roughly equal chunks whose inner boundaries
+  are snapped to the keyframe at or before them, so every chunk can be
+  decoded from a keyframe without dropping any frames on the way.
+
+  Args:
+    timestamps: Sorted keyframe timestamps.
+    start: Starting point (in secs) of the range.
+    end: Ending point (in secs) of the range.
+    chunks: Number of chunks wanted.
+    min_length: Secs (default: 10.0) below which a chunk isn't worth
+                the startup of an extra encoder.
+  """
+  chunks = max(1, min(chunks, int((end - start) // max(min_length, 1e-6))))
+  boundaries = [start]
+  for idx in range(1, chunks):
+    boundary = snap(timestamps, start + (end - start) * idx / chunks)
+    if (boundary - boundaries[-1] >= min_length and
+        end - boundary >= min_length):
+      boundaries.append(boundary)
+  boundaries.append(end)
+  return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def smart_ranges(timestamps: Sequence[float],
+                 start: Union[float, int],
+                 end: Optional[Union[float, int]],
+                 tolerance: float = 0.0
+                 ) -> List[Tuple[str, float, Optional[float]]]:
+  """Return pieces of the range to be re-encoded & to be copied.
+
+  Only the partial GOPs at either end of the range need to be decoded,
+  whole GOPs in between can be copied as they are. Pieces are returned
+  in order as (`encode` or `copy`, start, end), an end of None being
+  the end of the video.
+
+  Args:
+    timestamps: Sorted keyframe timestamps.
+    start: Starting point (in secs) of the range.
+    end: Ending point (in secs) of the range; None till the end.
+    tolerance: Secs (default: 0.0) by which the range may be off from a
+               keyframe & still be cut there, usually half a frame.
+  """
+  first = bisect.bisect_left(timestamps, start - tolerance)
+  if first == len(timestamps):
+    return [('encode', start, end)]
+  head = timestamps[first]
+  tail = None if end is None else snap(timestamps, end + tolerance)
+  if tail is not None and tail <= head:
+    return [('encode', start, end)]
+  pieces = [('encode', start, head)] if head - start > tolerance else []
+  pieces.append(('copy', head, tail))
+  if tail is not None and end - tail > tolerance:
+    pieces.append(('encode', tail, end))
+  return pieces
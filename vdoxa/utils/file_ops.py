@@ -17,6 +17,8 @@
 """Utility for simplifying file operations."""
 
 import os
+from contextlib import contextmanager
+from typing import Iterator, Tuple
 
 
 def get_file_name(path: str) -> str:
@@ -43,3 +45,44 @@ def filename(path:str, video_number: int) -> str:
   create_directory(path)
   return os.path.join(get_directory_name(path),
                       f'{get_file_name(path)}_{video_number}.mp4')
+
+
+def next_filename(path: str) -> str:
+  """Return the first numbered file of the video which doesn't exist."""
+  idx = 0
+  while os.path.exists(filename(path, idx)):
+    idx += 1
+  return filename(path, idx)
+
+
+def temporary(path: str, tag: str) -> str:
+  """Return path of a temporary file sitting next to the file."""
+  name, extension = os.path.splitext(path)
+  return f'{name}TEMP_VDOXA_{tag}{extension}'
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+  """Yield temporary path which replaces the file once it's written.
+
+  If writing fails, the temporary file is removed and the file (if any)
+  is left untouched. Hence, a crash never leaves a half-written file
+  under the final name.
+
+  Example:
+    >>> with atomic_output('video_0.mp4') as partial:
+    ...   write_video(partial)
+  """
+  partial = temporary(path, 'partial')
+  try:
+    yield partial
+    os.replace(partial, path)
+  finally:
+    if os.path.isfile(partial):
+      os.remove(partial)
+
+
+def fingerprint(path: str) -> Tuple[str, int, int]:
+  """Return absolute path, size & modification time (in ns) of file."""
+  stat = os.stat(path)
+  return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
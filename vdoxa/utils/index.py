@@ -0,0 +1,141 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for building and storing keyframe index of the videos.
+
+The index is built once per source and stored next to it as a hidden
+sidecar file (`.<video file>.vdxi`). The sidecar is keyed on the path,
+size and modification time of the source, hence it's rebuilt
+automatically whenever the source changes.
+"""
+
+import logging
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+
+from vdoxa.utils.ffmpeg import keyframes
+from vdoxa.utils.file_ops import fingerprint
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'VDXI'
+# Version 1 sidecars also stored the byte offsets of the keyframes.
+_VERSION = 2
+# Magic, version, byteorder, size, mtime, number of keyframes & length
+# of the path.
+_HEADER = struct.Struct('<4sHcQqQH')
+
+
+def sidecar(source: str) -> str:
+  """Return path of the index sidecar file for the source."""
+  directory, name = os.path.split(os.path.abspath(source))
+  return os.path.join(directory, f'.{name}.vdxi')
+
+
+class KeyframeIndex(object):
+  """Array backed index of keyframe timestamps.
+
+  Args:
+    times: Sorted keyframe timestamps (in secs).
+
+  Example:
+    >>> from vdoxa.utils.index import keyframe_index
+    >>> index = keyframe_index('video.mp4')
+    >>> index.times[:3]
+
+    array('d', [0.0, 2.0, 4.0])
+  """
+
+  def __init__(self, times: array) -> None:
+    self.times = times
+
+  def __len__(self) -> int:
+    return len(self.times)
+
+  @classmethod
+  def build(cls, source: str) -> 'KeyframeIndex':
+    """Build index by reading the packet headers of the source."""
+    return cls(array('d', keyframes(source)))
+
+  @classmethod
+  def load(cls, source: str) -> Optional['KeyframeIndex']:
+    """Load index from the sidecar file.
+
+    Returns None if the sidecar doesn't exist, can't be read or was
+    built for a different version of the source.
+    """
+    path, size, mtime = fingerprint(source)
+    try:
+      with open(sidecar(source), 'rb') as file:
+        header = file.read(_HEADER.size)
+        (magic, version, byteorder, _size, _mtime,
+         count, length) = _HEADER.unpack(header)
+        _path = file.read(length).decode('utf-8')
+        if ((magic, version, _path, _size, _mtime) !=
+            (_MAGIC, _VERSION, path, size, mtime)):
+          logger.debug('Keyframe index of %s is stale.', source)
+          return None
+        times = array('d')
+        times.fromfile(file, count)
+    except (OSError, EOFError, struct.error, UnicodeDecodeError):
+      return None
+    if byteorder.decode() != sys.byteorder[0]:
+      times.byteswap()
+    return cls(times)
+
+  def save(self, source: str) -> None:
+    """Save index to the sidecar file of the source.
+
+    The file is written to a temporary name first & then renamed, so
+    a concurrent reader never sees a partially written index.
+    """
+    path, size, mtime = fingerprint(source)
+    encoded = path.encode('utf-8')
+    file = sidecar(source)
+    temp = f'{file}.{os.getpid()}.tmp'
+    try:
+      with open(temp, 'wb') as index:
+        index.write(_HEADER.pack(_MAGIC, _VERSION,
+                                 sys.byteorder[0].encode(), size, mtime,
+                                 len(self), len(encoded)))
+        index.write(encoded)
+        self.times.tofile(index)
+      os.replace(temp, file)
+    except OSError as error:
+      # Index is only an optimization, read-only directories are fine.
+      logger.debug('Could not save keyframe index of %s: %s', source, error)
+      if os.path.isfile(temp):
+        os.remove(temp)
+
+
+def keyframe_index(source: str) -> KeyframeIndex:
+  """Return keyframe index of the source.
+
+  The sidecar is used if it is still valid, otherwise the index is
+  rebuilt and saved for the later runs.
+
+  Args:
+    source: Path of the video file.
+  """
+  index = KeyframeIndex.load(source)
+  if index is None:
+    logger.debug('Building keyframe index of %s.', source)
+    index = KeyframeIndex.build(source)
+    index.save(source)
+  return index
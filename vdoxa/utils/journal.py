@@ -0,0 +1,211 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for journaling the parts written to an output directory.
+
+Every output directory gets a hidden journal per source
+(`.vdoxa-journal-<hash of the source path>.json`) recording the
+fingerprint of the source and, for every completed part, it's range,
+encoding settings, size & modification time. Sources sharing an output
+directory keep separate journals, so they don't replace each other's.
+A rerun of the same job skips the parts which are still exactly as they
+were written and redoes only the missing or modified (corrupt) ones.
+
+The journal is rewritten atomically after every part, so it's never
+ahead of the files on disk. Processes trimming the parts of a source in
+parallel share it's journals, each one writes only the parts it
+completed. `Ledger` keeps the journals of all the
+output directories of a source along with the output cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from vdoxa.utils.cache import active as active_cache
+from vdoxa.utils.file_ops import fingerprint
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL = '.vdoxa-journal-{}.json'
+_VERSION = 1
+
+
+class Journal(object):
+  """Journal of the parts completed in an output directory.
+
+  Args:
+    directory: Output directory of the parts.
+    source: Path of the video file the parts are trimmed from.
+    settings: Encoding settings shared by all the parts, parts trimmed
+              with other settings are redone.
+
+  Example:
+    >>> from vdoxa.utils.journal import Journal
+    >>> journal = Journal('videos/demo', 'videos/demo.mp4', {'copy': True})
+    >>> journal.done('videos/demo/demo_0.mp4', 0.0, 30.0)
+
+    False
+  """
+
+  def __init__(self,
+               directory: str,
+               source: str,
+               settings: Dict[str, Any]) -> None:
+    self.source = list(fingerprint(source))
+    digest = hashlib.sha1(self.source[0].encode()).hexdigest()[:16]
+    self.path = os.path.join(directory, JOURNAL.format(digest))
+    self.settings = settings
+    self.parts = self._read()
+    self.completed = {}
+
+  def _read(self) -> Dict[str, Any]:
+    """Return parts recorded in the journal of the unchanged source."""
+    try:
+      with open(self.path, 'r') as file:
+        journal = json.load(file)
+      if (journal.get('version') == _VERSION and
+          journal.get('source') == self.source):
+        return journal['parts']
+      logger.debug('Source has changed, ignoring %s.', self.path)
+    except FileNotFoundError:
+      pass
+    except (OSError, ValueError, KeyError):
+      logger.warning('Journal %s is unreadable, starting afresh.', self.path)
+    return {}
+
+  def _entry(self,
+             start: float,
+             end: Optional[float],
+             file: Optional[str] = None) -> Dict[str, Any]:
+    """Return journal entry of the part."""
+    entry = {'start': round(start, 6),
+             'end': None if end is None else round(end, 6),
+             'settings': self.settings}
+    if file is not None:
+      stat = os.stat(file)
+      entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    return entry
+
+  def done(self, file: str, start: float, end: Optional[float]) -> bool:
+    """Return True if the part was completed & is unchanged since."""
+    entry = self.parts.get(os.path.basename(file))
+    if entry is None or not os.path.isfile(file):
+      return False
+    try:
+      return entry == self._entry(start, end, file)
+    except OSError:
+      return False
+
+  def complete(self, file: str, start: float, end: Optional[float]) -> None:
+    """Record the part as completed & save the journal."""
+    self.completed[os.path.basename(file)] = self._entry(start, end, file)
+    self.save()
+
+  @contextmanager
+  def _locked(self) -> Iterator[None]:
+    """Hold the lock of the journal, where supported."""
+    if fcntl is None:
+      yield
+      return
+    with open(f'{self.path}.lock', 'a') as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      yield
+
+  def save(self) -> None:
+    """Write the journal atomically.
+
+    The journal is read again under a lock & only the parts completed
+    here are written over it, keeping the parts recorded meanwhile by
+    the other processes sharing it.
+    """
+    with self._locked():
+      self.parts = dict(self._read(), **self.completed)
+      partial = f'{self.path}.{os.getpid()}.tmp'
+      with open(partial, 'w') as file:
+        json.dump({'version': _VERSION, 'source': self.source,
+                   'parts': self.parts}, file, indent=2)
+      os.replace(partial, self.path)
+
+
+class Ledger(object):
+  """Journals & output cache of the parts trimmed from a source.
+
+  Parts completed by an earlier run are skipped & parts trimmed earlier
+  with the same settings are linked from the output cache, if enabled
+  (see `vdoxa.utils.cache`).
+
+  Args:
+    source: Path of the video file the parts are trimmed from.
+    settings: Encoding settings shared by all the parts (see
+              `vdoxa.utils.encoding.trim_settings`).
+    resume: Boolean (default: True) to keep the journals of the output
+            directories.
+  """
+
+  def __init__(self,
+               source: str,
+               settings: Dict[str, Any],
+               resume: bool = True) -> None:
+    self.source = source
+    self.settings = settings
+    self.resume = resume
+    self.cache = active_cache()
+    self.journals = {}
+
+  def journal(self, file: str) -> Optional[Journal]:
+    """Return journal of the directory of the part, if resuming."""
+    if not self.resume:
+      return None
+    directory = os.path.dirname(os.path.abspath(file))
+    if directory not in self.journals:
+      self.journals[directory] = Journal(directory, self.source,
+                                         self.settings)
+    return self.journals[directory]
+
+  def done(self, file: str, start: float, end: Optional[float]) -> bool:
+    """Return True if an earlier run completed the part."""
+    journal = self.journal(file)
+    return journal is not None and journal.done(file, start, end)
+
+  def fetch(self, file: str, start: float, end: Optional[float]) -> bool:
+    """Link the part from the cache & return True on a hit."""
+    if self.cache is None or not self.cache.fetch(
+        self.cache.key(self.source, start, end, self.settings), file):
+      return False
+    self._record(file, start, end)
+    return True
+
+  def complete(self, file: str, start: float, end: Optional[float]) -> None:
+    """Add the newly trimmed part to the cache & the journal."""
+    if self.cache is not None:
+      self.cache.store(self.cache.key(self.source, start, end,
+                                      self.settings), file)
+    self._record(file, start, end)
+
+  def _record(self, file: str, start: float, end: Optional[float]) -> None:
+    """Record the part as completed in the journal, if resuming."""
+    journal = self.journal(file)
+    if journal is not None:
+      journal.complete(file, start, end)
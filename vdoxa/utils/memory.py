@@ -0,0 +1,157 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for keeping the trims within a memory budget.
+
+Memory used by a trim barely depends on the length of the source; frames
+and audio are streamed through pipes & fixed size buffers. It depends on
+the resolution and on how many frames are held at once, by the workers
+encoding in parallel, the lookahead & threads of the encoder, the queue
+of decoded frames and the audio buffers. Once a budget is set (using
+`limit` or `--max-memory` on the CLI), these are sized so that the
+estimated footprint fits in it:
+
+  footprint = workers * (WORKER_BASE + frames held * frame size)
+
+Frames are counted as packed RGB, the way MoviePy & OpenCV hand them
+over. Workers of a pool share the budget equally.
+
+Note:
+  The budget is an estimate used for sizing the buffers, not a hard
+  limit enforced on the process.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from vdoxa.utils.common import parse_size
+
+logger = logging.getLogger(__name__)
+
+# Resident memory of a worker without any frames; the interpreter,
+# MoviePy, NumPy & the FFmpeg processes it spawns.
+WORKER_BASE = 160 * 1024 ** 2
+# Frames every worker holds at the least; the decoder pipe, the frame
+# being encoded & the reference frames of the encoder.
+MIN_FRAMES = 8
+# Frames held by every frame thread of the encoder.
+FRAMES_PER_THREAD = 2
+# Lookahead (in frames) of x264 with the medium preset.
+MAX_LOOKAHEAD = 40
+# Audio samples buffered by MoviePy's reader by default & at the least.
+AUDIO_BUFFER = 200000
+MIN_AUDIO_BUFFER = 20000
+# Bytes per buffered audio sample; 2 channels of 64-bit floats.
+AUDIO_SAMPLE = 16
+
+_budget = None
+
+
+def limit(max_memory: Optional[Union[int, str]]) -> Optional[int]:
+  """Set the memory budget of this process & return it in bytes.
+
+  Args:
+    max_memory: Budget in bytes or like `512M` or `1G`; None lifts it.
+  """
+  global _budget
+  _budget = None if max_memory is None else parse_size(max_memory)
+  return _budget
+
+
+def budget() -> Optional[int]:
+  """Return the memory budget in bytes, None if there is none."""
+  return _budget
+
+
+def share(workers: int) -> None:
+  """Take a worker's share of the budget, called in the worker."""
+  global _budget
+  if _budget is not None:
+    _budget //= max(1, workers)
+
+
+def frame_bytes(size: Tuple[int, int]) -> int:
+  """Return bytes of a packed RGB frame of the size (width, height)."""
+  return max(1, size[0] * size[1] * 3)
+
+
+def frames_within(size: Optional[Tuple[int, int]]) -> Optional[int]:
+  """Return number of frames of the size this process may hold.
+
+  Returns None if there is no budget or the size isn't known.
+  """
+  if _budget is None or not size:
+    return None
+  return max(0, (_budget - WORKER_BASE) // frame_bytes(size))
+
+
+def jobs_within(jobs: int, size: Optional[Tuple[int, int]]) -> int:
+  """Return number of workers (at most jobs) fitting in the budget."""
+  if _budget is None or not size or jobs <= 1:
+    return jobs
+  fitting = max(1, _budget // (WORKER_BASE + MIN_FRAMES * frame_bytes(size)))
+  if fitting < jobs:
+    logger.info('Running %d instead of %d jobs to stay within %d bytes.',
+                fitting, jobs, _budget)
+  return min(jobs, fitting)
+
+
+def queue_within(queue_size: int, size: Optional[Tuple[int, int]]) -> int:
+  """Return length (at most queue_size) of a queue of decoded frames."""
+  frames = frames_within(size)
+  if frames is None:
+    return queue_size
+  return max(1, min(queue_size, frames - MIN_FRAMES))
+
+
+def encoder_threads(threads: Optional[int],
+                    size: Optional[Tuple[int, int]]) -> Optional[int]:
+  """Return number of encoder threads (at most threads) within budget.
+
+  Every frame thread of x264 holds frames of it's own, so the threads
+  are reduced before the lookahead is.
+  """
+  frames = frames_within(size)
+  if frames is None:
+    return threads
+  fitting = max(1, (frames - MIN_FRAMES) // (2 * FRAMES_PER_THREAD))
+  return min(threads or os.cpu_count() or 1, fitting)
+
+
+def encoder_params(threads: Optional[int],
+                   size: Optional[Tuple[int, int]]) -> List[str]:
+  """Return x264 parameters bounding the frames held by the encoder.
+
+  Args:
+    threads: Number of encoder threads, as returned by `encoder_threads`.
+    size: Width & height of the encoded frames.
+  """
+  frames = frames_within(size)
+  if frames is None:
+    return []
+  spare = frames - MIN_FRAMES - (threads or 1) * FRAMES_PER_THREAD
+  return ['-rc-lookahead', str(max(0, min(MAX_LOOKAHEAD, spare)))]
+
+
+def clip_params() -> Dict[str, Any]:
+  """Return keyword arguments bounding the buffers of `VideoFileClip`."""
+  if _budget is None:
+    return {}
+  # Audio gets a small slice of the budget, it's read in chunks anyway.
+  samples = _budget // 64 // AUDIO_SAMPLE
+  return {'audio_buffersize': max(MIN_AUDIO_BUFFER,
+                                  min(AUDIO_BUFFER, samples))}
@@ -0,0 +1,392 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Utility for measuring the performance of trim jobs.
+
+Every trimmed part is measured by a `PartMetrics` object which records
+the time spent in each of the phases along with frames, bytes & memory
+used. Bytes read & peak memory of this process and it's FFmpeg children
+are measured per part from `/proc` (see `ProcessUsage`). Finished
+records are plain dictionaries passed to the hooks registered using
+`add_hook`:
+
+  >>> from vdoxa.utils import metrics
+  >>> metrics.add_hook(lambda record: print(record['fps']))
+
+Records are always emitted from the process which started the trim, so
+the hooks needn't be picklable & are called for the parts encoded by
+the worker processes too. `vdoxa trim ... --metrics <path>` writes the
+records as JSON lines to the path (or standard output if `-`).
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# probe: opening the source & reading it's metadata or keyframe index.
+# seek: getting to the start of the part, including decoding the frames
+#       which are dropped on the way.
+# decode: decoding the frames of the part.
+# encode: encoding the frames (and audio) of the part.
+# mux: remuxing the packets into the output file.
+PHASES = ('probe', 'seek', 'decode', 'encode', 'mux')
+
+# Secs between the samples of the FFmpeg children while a phase runs.
+SAMPLE_INTERVAL = 0.02
+# Secs between the samples of a child run by `track` till it exits.
+TRACK_INTERVAL = 0.005
+
+Hook = Callable[[Dict[str, Any]], None]
+
+_hooks: List[Hook] = []
+_usages = weakref.WeakSet()
+
+
+def add_hook(hook: Hook) -> None:
+  """Register a function to be called with every metrics record."""
+  _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+  """Unregister the function added using `add_hook`."""
+  if hook in _hooks:
+    _hooks.remove(hook)
+
+
+def emit(record: Optional[Dict[str, Any]]) -> None:
+  """Pass the metrics record to all the registered hooks.
+
+  A failing hook is logged & skipped, it never interrupts the trim.
+  """
+  if record is None:
+    return
+  logger.debug('Metrics: %s', json.dumps(record))
+  for hook in list(_hooks):
+    try:
+      hook(record)
+    except Exception:
+      logger.warning('Metrics hook %r failed.', hook, exc_info=True)
+
+
+def _proc(pid: Union[int, str], name: str) -> Optional[str]:
+  """Return contents of the `/proc` file of the process, if readable."""
+  try:
+    with open(f'/proc/{pid}/{name}', 'r') as file:
+      return file.read()
+  except OSError:
+    return None
+
+
+def bytes_read(pid: Union[int, str] = 'self') -> Optional[int]:
+  """Return bytes read by the process so far.
+
+  This is `rchar` of the process, all the bytes read by it's system
+  calls including the ones served from the page cache & pipes.
+  """
+  io = _proc(pid, 'io')
+  for line in (io or '').splitlines():
+    if line.startswith('rchar:'):
+      return int(line.split()[1])
+  return None
+
+
+def peak_rss(pid: Union[int, str] = 'self') -> Optional[int]:
+  """Return peak resident set size (in bytes) of the running process."""
+  status = _proc(pid, 'status')
+  for line in (status or '').splitlines():
+    if line.startswith('VmHWM:'):
+      return int(line.split()[1]) * 1024
+  return None
+
+
+def _reset_peak(pid: Union[int, str] = 'self') -> None:
+  """Reset peak resident set size of the process to it's current size."""
+  try:
+    with open(f'/proc/{pid}/clear_refs', 'w') as file:
+      file.write('5')
+  except OSError:
+    pass
+
+
+def ffmpeg_children() -> List[int]:
+  """Return process ids of the running FFmpeg (or FFprobe) children."""
+  pids = []
+  try:
+    tasks = os.listdir('/proc/self/task')
+  except OSError:
+    return pids
+  for task in tasks:
+    for pid in (_proc(f'self/task/{task}', 'children') or '').split():
+      if (_proc(pid, 'comm') or '').startswith(('ffmpeg', 'ffprobe')):
+        pids.append(int(pid))
+  return pids
+
+
+def track(process: subprocess.Popen) -> None:
+  """Sample peak memory of the child in background till it exits.
+
+  Peaks are recorded by the parts being measured, if any. Short lived
+  FFmpeg commands would otherwise exit between the samples of a phase.
+
+  Note:
+    Peak memory reported for a reaped child (`wait4`) includes this
+    process it was forked from, hence it's sampled while running.
+  """
+  if not _usages:
+    return
+
+  def sample() -> None:
+    while True:
+      # Exited children have no memory left, reaped ones no entry.
+      peak = peak_rss(process.pid)
+      if peak is None or process.returncode is not None:
+        return
+      for usage in list(_usages):
+        usage.update(process.pid, None, peak)
+      time.sleep(TRACK_INTERVAL)
+
+  threading.Thread(target=sample, daemon=True).start()
+
+
+def reap(process: subprocess.Popen) -> int:
+  """Wait for the child to exit & return it's exit status.
+
+  Bytes read by the child are taken once it has exited but isn't reaped
+  yet (while it's `/proc` entry is still around) & recorded by the parts
+  being measured.
+  """
+  if _usages and hasattr(os, 'waitid'):
+    try:
+      os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    except ChildProcessError:
+      pass
+    else:
+      read = bytes_read(process.pid)
+      for usage in list(_usages):
+        usage.update(process.pid, read, None)
+  return process.wait()
+
+
+class ProcessUsage(object):
+  """Measures bytes read & peak memory of this process & it's FFmpeg.
+
+  Peak memory of this process & the FFmpeg children alive at the start
+  (like the readers of an already opened clip) is reset & bytes read
+  are counted from then on. FFmpeg children are sampled every
+  `SAMPLE_INTERVAL` secs while a phase runs & once more at the end, the
+  ones run by vdoXA are sampled more often (see `track`) & record their
+  exact bytes read as they exit (see `reap`).
+
+  Note:
+    Everything is read from `/proc`, hence measured only on Linux (None
+    elsewhere). Resetting the peak memory of the process means the parts
+    measured by a process should run one at a time.
+  """
+
+  def __init__(self) -> None:
+    self.available = bytes_read() is not None
+    self.lock = threading.Lock()
+    # Bytes read (at the start & as last seen) & peak memory by pid.
+    self.children = {}
+    if not self.available:
+      return
+    _reset_peak()
+    self.read = bytes_read()
+    for pid in ffmpeg_children():
+      _reset_peak(pid)
+      read = bytes_read(pid)
+      if read is not None:
+        self.children[pid] = [read, read, peak_rss(pid)]
+    _usages.add(self)
+
+  def update(self,
+             pid: int,
+             read: Optional[int],
+             peak: Optional[int]) -> None:
+    """Record bytes read & peak memory of the FFmpeg child."""
+    with self.lock:
+      entry = self.children.setdefault(pid, [0, 0, None])
+      if read is not None:
+        entry[1] = max(entry[1], read)
+      if peak is not None:
+        entry[2] = max(entry[2] or 0, peak)
+
+  def sample(self) -> None:
+    """Record the usage of the running FFmpeg children."""
+    for pid in ffmpeg_children():
+      self.update(pid, bytes_read(pid), peak_rss(pid))
+
+  @contextmanager
+  def sampling(self) -> Iterator[None]:
+    """Sample the FFmpeg children in background while the block runs."""
+    if not self.available:
+      yield
+      return
+    done = threading.Event()
+
+    def sample() -> None:
+      self.sample()
+      while not done.wait(SAMPLE_INTERVAL):
+        self.sample()
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+      yield
+    finally:
+      done.set()
+      thread.join()
+
+  def result(self, share: float = 1.0) -> Dict[str, Optional[int]]:
+    """Return bytes read & peak memory (in bytes) so far.
+
+    Args:
+      share: Fraction (default: 1.0) of the bytes read to be reported,
+             for parts cut together by a single FFmpeg command.
+    """
+    if not self.available:
+      return dict.fromkeys(('bytes_read', 'ffmpeg_bytes_read',
+                            'peak_rss_bytes', 'ffmpeg_peak_rss_bytes'))
+    self.sample()
+    with self.lock:
+      read = sum(last - first for first, last, _ in self.children.values())
+      peaks = [peak for _, _, peak in self.children.values() if peak]
+    return {
+      'bytes_read': int((bytes_read() - self.read) * share),
+      'ffmpeg_bytes_read': int(read * share),
+      'peak_rss_bytes': peak_rss(),
+      'ffmpeg_peak_rss_bytes': max(peaks, default=None),
+    }
+
+
+class PartMetrics(object):
+  """Measures a single trimmed part.
+
+  Args:
+    source: Path of the video file.
+    file: Path of the trimmed file.
+    start: Starting point (in secs) of the part.
+    end: Ending point (in secs) of the part; None till the end.
+    mode: How the part is produced; `encode`, `copy` (remuxed), `smart`
+          (re-encoded only at the ends) or `audio` (audio only remux).
+    usage: Usage (default: None, measured from now on) of the processes
+           shared by the parts cut together, see `share`.
+  """
+
+  def __init__(self,
+               source: str,
+               file: str,
+               start: Union[float, int],
+               end: Optional[Union[float, int]],
+               mode: str,
+               usage: Optional[ProcessUsage] = None) -> None:
+    self.source = source
+    self.file = file
+    self.start = start
+    self.end = end
+    self.mode = mode
+    self.phases = dict.fromkeys(PHASES, 0.0)
+    self.frames = 0
+    # Set for outputs streamed to pipes & file-like objects.
+    self.written = None
+    self.usage = usage or ProcessUsage()
+    # Fraction of the bytes read by the shared usage owed to the part.
+    self.share = 1.0
+    self.started = time.perf_counter()
+
+  @contextmanager
+  def phase(self, name: str) -> Iterator[None]:
+    """Add time spent inside the block to the phase.
+
+    FFmpeg children are sampled while the block runs.
+    """
+    started = time.perf_counter()
+    try:
+      with self.usage.sampling():
+        yield
+    finally:
+      self.phases[name] += time.perf_counter() - started
+
+  def add(self, name: str, seconds: float) -> None:
+    """Add seconds to the phase, cheaper than `phase` in tight loops."""
+    self.phases[name] += seconds
+
+  def finish(self, duration: Optional[float] = None) -> Dict[str, Any]:
+    """Return the metrics record of the part.
+
+    Args:
+      duration: Duration (default: end - start) of the part in secs.
+
+    Note:
+      `bytes_read` & `peak_rss_bytes` are of this process while trimming
+      the part, `ffmpeg_bytes_read` is the total of it's FFmpeg children
+      & `ffmpeg_peak_rss_bytes` the peak of the largest one. Bytes read
+      include the frames piped between the processes, hence a decoded &
+      re-encoded part counts them more than once.
+    """
+    wall = time.perf_counter() - self.started
+    if duration is None and self.end is not None:
+      duration = self.end - self.start
+    if self.written is not None:
+      written = self.written
+    else:
+      written = os.path.getsize(self.file) if os.path.isfile(self.file) else 0
+    return dict({
+      'source': self.source,
+      'file': self.file,
+      'start': self.start,
+      'end': self.end,
+      'mode': self.mode,
+      'phases': {name: round(secs, 4) for name, secs in self.phases.items()},
+      'seconds': round(wall, 4),
+      'frames': self.frames,
+      'fps': round(self.frames / wall, 2) if self.frames and wall else None,
+      'realtime_factor': round(duration / wall, 2) if duration and wall
+                         else None,
+      'bytes_written': written,
+    }, **self.usage.result(self.share))
+
+
+class JsonLinesHook(object):
+  """Hook writing the metrics records as JSON lines.
+
+  Args:
+    path: Path of the file to append the records to; `-` for standard
+          output.
+  """
+
+  def __init__(self, path: str) -> None:
+    self.path = path
+    self.file = sys.stdout if path == '-' else open(path, 'a')
+
+  def __call__(self, record: Dict[str, Any]) -> None:
+    """Write the record as a single line."""
+    self.file.write(json.dumps(record) + '\n')
+    self.file.flush()
+
+  def close(self) -> None:
+    """Close the file unless it's the standard output."""
+    if self.file is not sys.stdout:
+      self.file.close()
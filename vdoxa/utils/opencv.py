@@ -16,13 +16,16 @@
 # ======================================================================
 """Utility for making convenient use of OpenCV."""
 
-from typing import List, Optional, Tuple, Union
+import queue
+import threading
+from typing import Any, Iterator, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 
 # TODO(xames3): Remove suppressed pylint warnings.
 # pyright: reportMissingImports=false
+from vdoxa.utils import memory
 from vdoxa.vars.colors import green, yellow
 
 
@@ -61,20 +64,268 @@ def rescale(frame: np.ndarray,
     >>> cv2.destroyAllWindows()
     >>>
   """
-  dimensions = None
-  frame_height, frame_width = frame.shape[:2]
   # If both width & height are None, then return the original frame.
   if width is None and height is None:
     return frame
+  dimensions = target_size(frame.shape, width, height)
+  return cv2.resize(frame, dimensions, interpolation=interpolation)
+
+
+def target_size(shape: Tuple,
+                width: Optional[int] = None,
+                height: Optional[int] = None) -> Tuple[int, int]:
+  """Return (width, height) the frame of given shape is rescaled to.
+
+  Args:
+    shape: Shape of the frame as returned by `frame.shape`.
+    width: Width (default: None) to be rescaled to.
+    height: Height (default: None) to be rescaled to.
+
+  Note:
+    If only one of width or height is provided, the other one is
+    calculated by maintaining the aspect ratio.
+  """
+  frame_height, frame_width = shape[:2]
+  if width is None and height is None:
+    return frame_width, frame_height
   if width and height:
-    dimensions = (width, height)
-  elif width is None:
+    return width, height
+  if width is None:
     ratio = height / float(frame_height)
-    dimensions = (int(frame_width * ratio), height)
-  else:
-    ratio = width / float(frame_width)
-    dimensions = (width, int(frame_height * ratio))
-  return cv2.resize(frame, dimensions, interpolation=interpolation)
+    return int(frame_width * ratio), height
+  ratio = width / float(frame_width)
+  return width, int(frame_height * ratio)
+
+
+class Rescaler(object):
+  """Rescale the frames of a stream into reused buffers.
+
+  Target dimensions are calculated once for the stream (and again only
+  if the shape of the incoming frames changes). Frames are resized into
+  the given destination buffers instead of new arrays, which keeps the
+  memory of `FrameReader` bounded. It isn't any faster than `rescale`,
+  the resize itself takes almost all the time.
+
+  Args:
+    width: Width (default: None) to be rescaled to.
+    height: Height (default: None) to be rescaled to.
+    interpolation: Interpolation algorithm (default: INTER_AREA) to be
+                   used.
+
+  Example:
+    >>> import cv2
+    >>> from vdoxa.utils.opencv import Rescaler
+    >>>
+    >>> stream = cv2.VideoCapture('video.mp4')
+    >>> rescaler = Rescaler(width=300)
+    >>>
+    >>> while True:
+    ...   grabbed, frame = stream.read()
+    ...   if not grabbed:
+    ...     break
+    ...   frame = rescaler(frame)
+    >>> stream.release()
+
+  Note:
+    Without an explicit `dst`, the same internal buffer is returned on
+    every call. Copy it if the frame needs to outlive the next call.
+  """
+
+  def __init__(self,
+               width: Optional[int] = None,
+               height: Optional[int] = None,
+               interpolation: Optional[object] = cv2.INTER_AREA) -> None:
+    self.width = width
+    self.height = height
+    self.interpolation = interpolation
+    self._shape = None
+    self._size = None
+    self._buffer = None
+
+  def size(self, shape: Tuple) -> Tuple[int, int]:
+    """Return (width, height) for the frames of given shape."""
+    if shape != self._shape:
+      self._shape = shape
+      self._size = target_size(shape, self.width, self.height)
+      self._buffer = None
+    return self._size
+
+  def output_shape(self, shape: Tuple) -> Tuple:
+    """Return shape of the rescaled frame for the frames of given shape."""
+    width, height = self.size(shape)
+    return (height, width, *shape[2:])
+
+  def __call__(self,
+               frame: np.ndarray,
+               dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rescale frame into dst (default: internal buffer) & return it."""
+    size = self.size(frame.shape)
+    if dst is None:
+      if self._buffer is None:
+        self._buffer = np.empty(self.output_shape(frame.shape), frame.dtype)
+      dst = self._buffer
+    cv2.resize(frame, size, dst=dst, interpolation=self.interpolation)
+    return dst
+
+
+class FrameReader(object):
+  """Read frames lazily from a background decoding thread.
+
+  Frames are decoded by a thread & handed over through a bounded queue
+  so that decoding overlaps with the processing of the frames. Stride,
+  region of interest & downscaling are applied in the decoding thread.
+  Frames are written into a fixed pool of recycled buffers, hence the
+  memory stays bounded irrespective of the length of the video.
+
+  Args:
+    source: Path of the video file (or anything `cv2.VideoCapture`
+            accepts).
+    stride: Yield every n-th (default: 1) frame only. Skipped frames are
+            only grabbed, not converted to arrays.
+    roi: Region of interest (default: None) as (x, y, width, height).
+    width: Width (default: None) to be rescaled to.
+    height: Height (default: None) to be rescaled to.
+    queue_size: Maximum number of decoded frames (default: 16) waiting
+                to be processed, fewer if they don't fit in the memory
+                budget (see `vdoxa.utils.memory`).
+    interpolation: Interpolation algorithm (default: INTER_AREA) to be
+                   used.
+
+  Example:
+    >>> from vdoxa.utils.opencv import FrameReader
+    >>>
+    >>> with FrameReader('video.mp4', stride=5, width=160) as reader:
+    ...   for idx, time, frame in reader:
+    ...     process(frame)
+
+  Note:
+    The yielded frame is a recycled buffer. It is valid only till the
+    next frame is requested, copy it if it needs to be kept longer.
+  """
+
+  def __init__(self,
+               source: Any,
+               stride: int = 1,
+               roi: Optional[Tuple[int, int, int, int]] = None,
+               width: Optional[int] = None,
+               height: Optional[int] = None,
+               queue_size: int = 16,
+               interpolation: Optional[object] = cv2.INTER_AREA) -> None:
+    self.source = source
+    self.stride = max(1, stride)
+    self.roi = roi
+    self.rescaler = (Rescaler(width, height, interpolation)
+                     if width or height else None)
+    self.capture = cv2.VideoCapture(source)
+    if not self.capture.isOpened():
+      raise IOError(f'Could not open {source} for reading.')
+    size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    self.queue_size = max(1, memory.queue_within(queue_size, size))
+    self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 25.0
+    self.frames_read = 0
+    self._frames = queue.Queue(self.queue_size)
+    # One buffer more than the queue for the frame being decoded & one
+    # for the frame being processed.
+    self._pool = queue.Queue(self.queue_size + 2)
+    self._pool_size = 0
+    self._stop = threading.Event()
+    self._thread = None
+
+  def _buffer(self, shape: Tuple, dtype: Any) -> Optional[np.ndarray]:
+    """Return a free buffer from the pool, allocating till it's full.
+
+    Returns None if the reader is closed while waiting for a buffer.
+    """
+    buffer = None
+    if self._pool_size < self.queue_size + 2 and self._pool.empty():
+      self._pool_size += 1
+    else:
+      while buffer is None:
+        if self._stop.is_set():
+          return None
+        try:
+          buffer = self._pool.get(timeout=0.1)
+        except queue.Empty:
+          continue
+    if buffer is None or buffer.shape != shape:
+      buffer = np.empty(shape, dtype)
+    return buffer
+
+  def _put(self, item: Any) -> bool:
+    """Put item in the queue unless the reader is closed."""
+    while not self._stop.is_set():
+      try:
+        self._frames.put(item, timeout=0.1)
+        return True
+      except queue.Full:
+        continue
+    return False
+
+  def _decode(self) -> None:
+    """Decode the frames & queue them, runs in the background thread."""
+    raw, idx = None, 0
+    try:
+      while not self._stop.is_set():
+        if idx % self.stride:
+          if not self.capture.grab():
+            break
+          idx += 1
+          continue
+        grabbed, raw = self.capture.read(raw)
+        if not grabbed:
+          break
+        frame = raw
+        if self.roi is not None:
+          x, y, w, h = self.roi
+          frame = frame[y:y + h, x:x + w]
+        shape = (self.rescaler.output_shape(frame.shape)
+                 if self.rescaler is not None else frame.shape)
+        buffer = self._buffer(shape, frame.dtype)
+        if buffer is None:
+          break
+        if self.rescaler is not None:
+          self.rescaler(frame, buffer)
+        else:
+          np.copyto(buffer, frame)
+        if not self._put((idx, idx / self.fps, buffer)):
+          break
+        idx += 1
+      self.frames_read = idx
+      self._put(None)
+    except Exception as error:
+      self._put(error)
+
+  def __iter__(self) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (frame index, timestamp in secs, frame) tuples."""
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._decode, daemon=True)
+      self._thread.start()
+    previous = None
+    while True:
+      item = self._frames.get()
+      # The frame handed out earlier isn't used anymore, recycle it.
+      if previous is not None:
+        self._pool.put(previous)
+      if item is None:
+        return
+      if isinstance(item, Exception):
+        raise item
+      previous = item[2]
+      yield item
+
+  def close(self) -> None:
+    """Stop the decoding thread & release the video."""
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+    self.capture.release()
+
+  def __enter__(self) -> 'FrameReader':
+    return self
+
+  def __exit__(self, *args: Any) -> None:
+    self.close()
 
 
 def disconnect(stream: np.ndarray) -> None:
@@ -0,0 +1,85 @@
+# Copyright 2020 XAMES3. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# ======================================================================
+"""Module to define encoding profiles used while trimming.
+
+Every profile sets the video codec, x264 preset, constant rate factor
+(CRF), encoder threads, pixel format and the audio handling. A value of
+None leaves the setting to FFmpeg's (or MoviePy's) default, except for
+the codecs of the smart profile which follow the source.
+"""
+
+DEFAULT_PROFILE = 'default'
+
+PROFILES = {
+  # Same settings vdoXA always used, MoviePy defaults with libx264.
+  'default': {
+    'codec': 'libx264',
+    'preset': 'medium',
+    'crf': None,
+    'threads': None,
+    'pixel_format': None,
+    'audio': True,
+    'audio_codec': None,
+    'audio_bitrate': None,
+  },
+  # Small & quick to encode previews, trades quality for speed.
+  'fast-proxy': {
+    'codec': 'libx264',
+    'preset': 'ultrafast',
+    'crf': 28,
+    'threads': None,
+    'pixel_format': 'yuv420p',
+    'audio': True,
+    'audio_codec': 'aac',
+    'audio_bitrate': '96k',
+  },
+  # Visually lossless long term storage, trades speed for size.
+  'archive': {
+    'codec': 'libx264',
+    'preset': 'slow',
+    'crf': 18,
+    'threads': None,
+    'pixel_format': 'yuv420p',
+    'audio': True,
+    'audio_codec': 'aac',
+    'audio_bitrate': '192k',
+  },
+  # No encoding at all, packets are remuxed between keyframes.
+  'copy': {
+    'copy': True,
+  },
+  # Frame accurate cuts re-encoding only the partial GOPs at the ends of
+  # the range (in the codec & pixel format of the source), packets in
+  # between are remuxed. Audio is remuxed as well.
+  'smart': {
+    'smart': True,
+    'codec': None,
+    'preset': 'medium',
+    'crf': 16,
+  },
+}
+
+# Ways of handling the audio track irrespective of the profile; `encode`
+# re-encodes it as per the profile, `copy` remuxes the source packets,
+# `drop` writes video only files and `only` extracts just the audio.
+AUDIO_MODES = ('encode', 'copy', 'drop', 'only')
+DEFAULT_AUDIO_MODE = 'encode'
+
+# Containers trims can be streamed in, both are written front to back
+# without seeking; `mp4` is fragmented MP4 & `mpegts` is MPEG-TS.
+STREAM_FORMATS = ('mp4', 'mpegts')
+DEFAULT_STREAM_FORMAT = 'mp4'